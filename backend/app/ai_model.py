@@ -9,15 +9,28 @@ import os
 import re
 from pathlib import Path
 
-import requests
 from dotenv import load_dotenv
 
+from .cache import LLM_CACHE, llm_key
+from .llm_client import ChatClient, CircuitOpenError, LLMError, RateLimitError
+from .metrics import LLM_REQUESTS
+from .traci.network import load_network
+
 # Load .env from project root
 load_dotenv(Path(__file__).resolve().parents[2] / ".env")
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# URL is overridable so both models can be pointed at a local stub server
+GROQ_API_URL = os.environ.get("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
 MODEL_NAME = "qwen/qwen3-32b"
+REQUEST_TIMEOUT = 30
+
+# Stream replies and stop them once all five fields are in (see FieldScanner)
+LLM_STREAM = os.environ.get("GENVANET_LLM_STREAM", "") not in ("", "0", "false")
+
+# Shared client for both models: keep-alive connections, rate limiting,
+# retries and circuit breaking (see llm_client.py)
+LLM_CLIENT = ChatClient(GROQ_API_URL, lambda: GROQ_API_KEY)
 
 # ── Route definitions mapped to actual SUMO edges ─────────────
 ROUTES = {
@@ -55,10 +68,11 @@ Only output these 5 lines. Nothing else."""
 def _calc_route_stats(edges_data):
     """
     Calculate per-route stats (avg speed, total vehicles, total wait)
-    from actual SUMO edge data.
+    from actual SUMO edge data. Route lengths come from the network file.
     """
     # Build lookup: edge_id -> edge data
     edge_lookup = {e["id"]: e for e in edges_data}
+    network = load_network()
 
     route_stats = {}
     for route_label, route_info in ROUTES.items():
@@ -80,6 +94,7 @@ def _calc_route_stats(edges_data):
             "vehicles": total_vehicles,
             "waiting_time": round(total_wait, 1),
             "edge_count": len(route_info["edges"]),
+            "length": round(network.route_length(route_info["edges"]), 1),
         }
 
     return route_stats
@@ -111,8 +126,8 @@ def _pick_best_route(route_stats, objective="fast"):
 def _estimate_delay(route_stats, route_label):
     """
     Estimate travel delay in seconds from real data.
-    delay = (edges * avg_edge_length) / speed + waiting_time
-    Assumes ~150m per edge.
+    delay = route_length / speed + waiting_time
+    Falls back to ~150m per edge if the route length is unknown.
     """
     stats = route_stats.get(route_label, {})
     speed = stats.get("avg_speed", 5)
@@ -120,7 +135,7 @@ def _estimate_delay(route_stats, route_label):
         speed = 1
     edge_count = stats.get("edge_count", 4)
     wait = stats.get("waiting_time", 0)
-    distance = edge_count * 150  # ~150m per edge
+    distance = stats.get("length") or edge_count * 150
     return round((distance / speed) + wait)
 
 
@@ -158,43 +173,84 @@ Which route is best? Give prediction now."""
     return prompt
 
 
-def query_model(prompt):
+def chat_completion(model, prompt, timeout=REQUEST_TIMEOUT):
     """
-    Send a prompt to Groq API using Gemma 2 9B.
+    Send a prompt to `model` on the Groq API and return the reply text,
+    or an "ERROR: ..." string. Identical prompts to the same model reuse
+    a recent reply (see cache.py). Shared by both models; `timeout`
+    covers rate-limit waits and retries too. With GENVANET_LLM_STREAM
+    set the reply is streamed and cut off once every field is parsed.
     """
     if not GROQ_API_KEY:
+        LLM_REQUESTS.inc((model, "error"))
         return "ERROR: GROQ_API_KEY not set. Export it as an environment variable."
 
+    # Identical prompts to the same model reuse a recent reply
+    key = llm_key(model, SYSTEM_PROMPT, prompt)
+    reply = LLM_CACHE.get(key)
+    if reply is not None:
+        LLM_REQUESTS.inc((model, "cached"))
+        return reply
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+    outcome = "error"
     try:
-        response = requests.post(
-            GROQ_API_URL,
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": MODEL_NAME,
-                "messages": [
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt},
-                ],
-                "temperature": 0.7,
-                "max_tokens": 300,
-            },
-            timeout=30,
-        )
-        if response.status_code != 200:
-            error_body = response.text
-            print(f"[Groq API Error] {response.status_code}: {error_body}")
-            return f"ERROR: Groq API {response.status_code} - {error_body}"
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
-    except requests.ConnectionError:
-        return "ERROR: Cannot connect to Groq API. Check your internet connection."
-    except requests.Timeout:
-        return "ERROR: Groq API took too long to respond."
+        reply = LLM_CLIENT.chat(model, messages, timeout, consumer=FieldScanner() if LLM_STREAM else None)
+        LLM_CACHE.put(key, reply)
+        outcome = "ok"
+    except CircuitOpenError as e:
+        reply, outcome = f"ERROR: Groq {e}", "circuit_open"
+    except RateLimitError as e:
+        reply, outcome = f"ERROR: Groq {e}", "rate_limited"
+    except LLMError as e:
+        reply = f"ERROR: Groq {e}"
     except Exception as e:
-        return f"ERROR: {str(e)}"
+        reply = f"ERROR: {str(e)}"
+    LLM_REQUESTS.inc((model, outcome))
+    return reply
+
+
+def query_model(prompt, timeout=REQUEST_TIMEOUT):
+    """
+    Send a prompt to Groq API using Qwen3 32B.
+    """
+    return chat_completion(MODEL_NAME, prompt, timeout)
+
+
+# Use regex for flexible matching (handles extra spaces, numbering, etc.)
+FIELD_PATTERNS = {
+    "prediction": r"PREDICTION\s*:\s*(.+)",
+    "congestion": r"CONGESTION\s*:\s*(.+)",
+    "recommended_route": r"RECOMMENDED[_\s]ROUTE\s*:\s*(.+)",
+    "expected_delay": r"EXPECTED[_\s]DELAY\s*:\s*(.+)",
+    "explanation": r"EXPLANATION\s*:\s*(.+)",
+}
+
+
+class FieldScanner:
+    """
+    Incremental counterpart of parse_response for streamed replies.
+
+    Feed it the reply as it arrives; it returns True once every field
+    in FIELD_PATTERNS has matched a complete (newline-terminated) line,
+    at which point parse_response on the text so far gives the same
+    result as on the full reply, so the stream can be closed.
+    """
+
+    def __init__(self):
+        self._line = ""
+        self._missing = dict(FIELD_PATTERNS)
+
+    def __call__(self, text):
+        *lines, self._line = (self._line + text).split("\n")
+        for line in lines:
+            for key, pattern in list(self._missing.items()):
+                if re.search(pattern, line, re.IGNORECASE):
+                    del self._missing[key]
+        return not self._missing
 
 
 def parse_response(raw_response):
@@ -211,16 +267,7 @@ def parse_response(raw_response):
         "raw_response": raw_response,
     }
 
-    # Use regex for flexible matching (handles extra spaces, numbering, etc.)
-    patterns = {
-        "prediction": r"PREDICTION\s*:\s*(.+)",
-        "congestion": r"CONGESTION\s*:\s*(.+)",
-        "recommended_route": r"RECOMMENDED[_\s]ROUTE\s*:\s*(.+)",
-        "expected_delay": r"EXPECTED[_\s]DELAY\s*:\s*(.+)",
-        "explanation": r"EXPLANATION\s*:\s*(.+)",
-    }
-
-    for key, pattern in patterns.items():
+    for key, pattern in FIELD_PATTERNS.items():
         match = re.search(pattern, raw_response, re.IGNORECASE)
         if match:
             value = match.group(1).strip()
@@ -234,20 +281,11 @@ def parse_response(raw_response):
     return result
 
 
-def generate_prediction(traffic_data, vehicle_type="car", objective="fast"):
+def apply_fallbacks(parsed, traffic_data, route_stats, objective="fast"):
     """
-    Main function: takes traffic data + user inputs, returns AI prediction.
-    Uses real SUMO data for analytical fallbacks when AI gives bad output.
+    Fill in any field the model left empty or unusable with an
+    analytical answer computed from the real SUMO data.
     """
-    edges = traffic_data.get("edges", [])
-    route_stats = _calc_route_stats(edges)
-
-    # Get AI prediction
-    prompt = build_prompt(traffic_data, vehicle_type, objective)
-    raw_response = query_model(prompt)
-    parsed = parse_response(raw_response)
-
-    # Analytical fallback: fill in blanks with real data
     best_route = _pick_best_route(route_stats, objective)
 
     if not parsed["recommended_route"] or "route" not in parsed["recommended_route"].lower():
@@ -283,3 +321,27 @@ def generate_prediction(traffic_data, vehicle_type="car", objective="fast"):
     parsed["route_stats"] = route_stats
 
     return parsed
+
+
+def fallback_prediction(traffic_data, objective="fast", reason="no model response"):
+    """Purely analytical prediction, used when a model can't answer in time."""
+    route_stats = _calc_route_stats(traffic_data.get("edges", []))
+    parsed = parse_response(f"ERROR: {reason}")
+    return apply_fallbacks(parsed, traffic_data, route_stats, objective)
+
+
+def generate_prediction(traffic_data, vehicle_type="car", objective="fast", timeout=REQUEST_TIMEOUT):
+    """
+    Main function: takes traffic data + user inputs, returns AI prediction.
+    Uses real SUMO data for analytical fallbacks when AI gives bad output.
+    """
+    edges = traffic_data.get("edges", [])
+    route_stats = _calc_route_stats(edges)
+
+    # Get AI prediction
+    prompt = build_prompt(traffic_data, vehicle_type, objective)
+    raw_response = query_model(prompt, timeout=timeout)
+    parsed = parse_response(raw_response)
+
+    # Analytical fallback: fill in blanks with real data
+    return apply_fallbacks(parsed, traffic_data, route_stats, objective)
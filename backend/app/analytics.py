@@ -0,0 +1,243 @@
+"""
+Vectorized route analytics over a whole run.
+
+A run becomes (steps x edges) arrays of vehicle count, mean speed,
+occupancy and waiting time. Routes are rows of a (routes x edges)
+incidence matrix built once per network, so every per-route time
+series for every route in scenario.ROUTES comes out of one matrix
+product per metric instead of a Python loop per step per route.
+
+Per-step route metrics follow ai_model._calc_route_stats:
+    vehicles      - vehicles on the route's edges
+    waiting_time  - summed waiting time on the route's edges
+    avg_speed     - mean speed over the route's edges that reported a
+                    speed above zero (0 if none did)
+    occupancy     - mean occupancy of the route's edges, in %
+    travel_time   - length / max(avg_speed, 1) + waiting_time, in s
+"""
+
+import numpy as np
+
+from .traci.network import load_network
+from .traci.scenario import ALL_ROUTES
+
+EDGE_FIELDS = ("vehicle_count", "mean_speed", "occupancy", "waiting_time")
+ROUTE_METRICS = ("vehicles", "waiting_time", "avg_speed", "occupancy", "travel_time")
+DEFAULT_PERCENTILES = (50, 90, 95)
+
+# (net_file, edge IDs) -> RouteIncidence
+_incidences = {}
+
+
+class RouteIncidence:
+    """
+    Route-edge incidence for one network and edge ordering.
+
+    Attributes:
+        route_ids:  Route IDs, in scenario.ALL_ROUTES order.
+        edge_ids:   Edge IDs the matrix columns follow.
+        matrix:     (routes x edges) float array, 1 where the route uses the edge.
+        edge_count: Edges per route.
+        length:     Route length in metres (from the network file).
+    """
+
+    def __init__(self, edge_ids, routes=ALL_ROUTES, network=None):
+        network = network or load_network()
+        column = {eid: i for i, eid in enumerate(edge_ids)}
+        self.route_ids = [route_id for route_id, _ in routes]
+        self.edge_ids = list(edge_ids)
+        self.matrix = np.zeros((len(routes), len(edge_ids)))
+        self.length = np.zeros(len(routes))
+        for r, (_, edges) in enumerate(routes):
+            edges = edges.split() if isinstance(edges, str) else edges
+            for eid in edges:
+                if eid in column:
+                    self.matrix[r, column[eid]] = 1.0
+            self.length[r] = network.route_length(edges)
+        self.edge_count = self.matrix.sum(axis=1)
+
+
+def route_incidence(edge_ids, network=None):
+    """Shared RouteIncidence for scenario.ALL_ROUTES over edge_ids."""
+    network = network or load_network()
+    key = (network.net_file, tuple(edge_ids))
+    incidence = _incidences.get(key)
+    if incidence is None:
+        incidence = _incidences[key] = RouteIncidence(edge_ids, network=network)
+    return incidence
+
+
+def _view(column):
+    """NumPy array over a typed memoryview, sharing its memory."""
+    return np.frombuffer(column, dtype=column.format)
+
+
+class RunArrays:
+    """
+    A run as NumPy arrays.
+
+    Attributes:
+        edge_ids: Edge IDs, in column order.
+        time:     (steps,) simulation time of each step.
+        active:   (steps,) active vehicles per step.
+        fields:   EDGE_FIELDS name -> (steps x edges) array.
+    """
+
+    def __init__(self, edge_ids, time, active, fields):
+        self.edge_ids = list(edge_ids)
+        self.time = time
+        self.active = active
+        self.fields = fields
+
+    @classmethod
+    def from_steps(cls, steps):
+        """Build from row-format steps (every step reports the same edges)."""
+        edge_ids = [e["id"] for e in steps[0]["edges"]] if steps else []
+        fields = {
+            name: np.array([[e[name] for e in step["edges"]] for step in steps], dtype=float)
+            .reshape(len(steps), len(edge_ids))
+            for name in EDGE_FIELDS
+        }
+        return cls(
+            edge_ids,
+            np.array([step["time"] for step in steps], dtype=float),
+            np.array([step["stats"]["active_vehicles"] for step in steps], dtype=float),
+            fields,
+        )
+
+    @classmethod
+    def from_stored(cls, run):
+        """
+        Build from a store.StoredRun without copying: the arrays are
+        views onto its memory-mapped columns.
+        """
+        shape = (run.steps, len(run.edge_ids))
+        fields = {name: _view(run.edge_rows(name)).reshape(shape) for name in EDGE_FIELDS}
+        return cls(run.edge_ids, _view(run.column("steps.time")), _view(run.column("steps.active")), fields)
+
+    def mean_snapshot(self):
+        """
+        A step-shaped dict whose edge values are averages over the whole
+        run, for code that takes a single snapshot (prompts, route stats).
+        """
+        means = {name: self.fields[name].mean(axis=0) for name in EDGE_FIELDS}
+        return {
+            "time": float(self.time[-1]) if len(self.time) else 0.0,
+            "vehicles": [],
+            "edges": [
+                {
+                    "id": eid,
+                    "vehicle_count": round(float(means["vehicle_count"][i]), 2),
+                    "mean_speed": round(float(means["mean_speed"][i]), 2),
+                    "occupancy": round(float(means["occupancy"][i]), 2),
+                    "waiting_time": round(float(means["waiting_time"][i]), 2),
+                }
+                for i, eid in enumerate(self.edge_ids)
+            ],
+            "traffic_lights": [],
+            "stats": {
+                "active_vehicles": round(float(self.active.mean()), 1) if len(self.active) else 0,
+                "departed": 0,
+                "arrived": 0,
+            },
+        }
+
+
+def route_series(arrays, incidence=None):
+    """
+    Per-route time series for every metric in ROUTE_METRICS.
+
+    Returns metric -> (steps x routes) array, columns in
+    incidence.route_ids order.
+    """
+    incidence = incidence or route_incidence(arrays.edge_ids)
+    m = incidence.matrix.T
+    f = arrays.fields
+
+    moving = (f["mean_speed"] > 0).astype(float)
+    speed_sum = (f["mean_speed"] * moving) @ m
+    speed_n = moving @ m
+    avg_speed = np.divide(speed_sum, speed_n, out=np.zeros_like(speed_sum), where=speed_n > 0)
+
+    vehicles = f["vehicle_count"] @ m
+    waiting = f["waiting_time"] @ m
+    edge_count = np.maximum(incidence.edge_count, 1)
+    occupancy = (f["occupancy"] @ m) / edge_count
+    travel_time = incidence.length / np.maximum(avg_speed, 1) + waiting
+
+    return {
+        "vehicles": vehicles,
+        "waiting_time": waiting,
+        "avg_speed": avg_speed,
+        "occupancy": occupancy,
+        "travel_time": travel_time,
+    }
+
+
+def rolling_mean(values, window):
+    """
+    Trailing rolling mean along the first axis; the first window-1
+    rows average over the rows available so far.
+    """
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    totals = np.cumsum(values, axis=0, dtype=float)
+    totals[window:] = totals[window:] - totals[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return totals / counts.reshape((-1,) + (1,) * (values.ndim - 1))
+
+
+def route_summary(arrays, window=30, percentiles=DEFAULT_PERCENTILES, include_series=False, incidence=None):
+    """
+    Summarize every route over the whole run.
+
+    Args:
+        arrays:         RunArrays for the run.
+        window:         Rolling-average window in steps.
+        percentiles:    Percentiles reported for each metric.
+        include_series: Also return the raw and rolling per-step series.
+        incidence:      RouteIncidence to use (default: scenario.ALL_ROUTES).
+
+    Returns {"time": [...] (with series only), "routes": {route_id: {...}}}.
+    """
+    incidence = incidence or route_incidence(arrays.edge_ids)
+    series = route_series(arrays, incidence)
+    steps = len(arrays.time)
+
+    stats = {}
+    for metric, values in series.items():
+        if steps == 0:
+            stats[metric] = None
+            continue
+        stats[metric] = {
+            "mean": values.mean(axis=0),
+            "max": values.max(axis=0),
+            "percentiles": np.percentile(values, percentiles, axis=0),
+            "rolling": rolling_mean(values, window) if include_series else None,
+        }
+
+    routes = {}
+    for r, route_id in enumerate(incidence.route_ids):
+        route = {
+            "length": round(float(incidence.length[r]), 1),
+            "edge_count": int(incidence.edge_count[r]),
+        }
+        for metric, s in stats.items():
+            if s is None:
+                route[metric] = None
+                continue
+            route[metric] = {
+                "mean": round(float(s["mean"][r]), 2),
+                "max": round(float(s["max"][r]), 2),
+            }
+            for q, value in zip(percentiles, s["percentiles"][:, r]):
+                route[metric][f"p{q:g}"] = round(float(value), 2)
+            if include_series:
+                route[metric]["series"] = np.round(series[metric][:, r], 2).tolist()
+                route[metric]["rolling"] = np.round(s["rolling"][:, r], 2).tolist()
+        routes[route_id] = route
+
+    result = {"steps": steps, "window": window, "routes": routes}
+    if include_series:
+        result["time"] = arrays.time.tolist()
+    return result
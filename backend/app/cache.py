@@ -0,0 +1,226 @@
+"""
+Content-addressed result cache.
+
+Simulation results are fully determined by the scenario parameters,
+the generated route XML and the network file, so they can be reused
+across /simulate and /predict calls. An in-memory LRU sits in front
+of an optional on-disk store (gzipped JSON, one file per key).
+
+Model replies are cached the same way, keyed by model, system prompt
+and user prompt, but expire after a TTL since models sample and
+change over time.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import CallbackCounter
+from .traci.network import NET_FILE
+
+SIM_CACHE_SIZE = int(os.environ.get("GENVANET_SIM_CACHE_SIZE", "32"))
+SIM_CACHE_DIR = os.environ.get("GENVANET_SIM_CACHE_DIR", "")
+
+LLM_CACHE_SIZE = int(os.environ.get("GENVANET_LLM_CACHE_SIZE", "256"))
+LLM_CACHE_TTL = float(os.environ.get("GENVANET_LLM_CACHE_TTL", "3600"))  # seconds, 0 = never expire
+LLM_CACHE_DIR = os.environ.get("GENVANET_LLM_CACHE_DIR", "")
+
+# (path, mtime, size) -> sha256, so the net file is hashed once per change
+_file_digests = {}
+
+
+def file_digest(path):
+    """sha256 of a file's contents, memoized on its mtime and size."""
+    st = os.stat(path)
+    stamp = (path, st.st_mtime_ns, st.st_size)
+    digest = _file_digests.get(stamp)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _file_digests[stamp] = digest
+    return digest
+
+
+class HashingWriter:
+    """
+    Text writer that forwards everything to `out` while keeping a
+    sha256 of it, so a route file can be hashed as it is generated.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self._hash = hashlib.sha256()
+
+    def write(self, text):
+        self._hash.update(text.encode())
+        return self.out.write(text)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def simulation_key(params, route_digest, net_file=NET_FILE, backend="sumo"):
+    """
+    Build the cache key for one simulation run.
+
+    Args:
+        params:       Scenario parameters (density, vehicle_mix, pattern, seed, ...).
+        route_digest: sha256 hex digest of the generated route XML.
+        net_file:     Path to the SUMO network the run uses.
+        backend:      Simulation backend that produced the result, so fake
+                      or replayed runs never stand in for real SUMO ones.
+    """
+    key = {
+        "params": params,
+        "routes": route_digest,
+        "net": file_digest(net_file),
+    }
+    if backend != "sumo":
+        key["backend"] = backend
+    payload = json.dumps(key, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def llm_key(model, system_prompt, prompt):
+    """
+    Build the cache key for one model reply. Whitespace in the user
+    prompt is normalized, so formatting-only differences still hit.
+    """
+    payload = json.dumps({
+        "model": model,
+        "system": hashlib.sha256(system_prompt.encode()).hexdigest(),
+        "prompt": " ".join(prompt.split()),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with an optional disk tier.
+
+    Values must be JSON-serializable. Cached values are shared between
+    callers, so treat anything returned by get() as read-only. With a
+    ttl (seconds), entries older than that count as misses.
+    """
+
+    def __init__(self, max_entries=SIM_CACHE_SIZE, disk_dir=None, ttl=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir or None
+        self.ttl = ttl or None
+        # key -> (value, time.time() when stored)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json.gz")
+
+    def get(self, key):
+        """Return the cached value for key, or None."""
+        with self._lock:
+            if key in self._entries:
+                value, stored = self._entries[key]
+                if not self._expired(stored):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            try:
+                stored = os.path.getmtime(self._disk_path(key))
+                if self._expired(stored):
+                    value = None
+                else:
+                    with gzip.open(self._disk_path(key), "rt", encoding="utf-8") as f:
+                        value = json.load(f)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, value, stored)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Store value in memory and, if configured, on disk."""
+        self._remember(key, value)
+
+        if self.disk_dir:
+            # Write to a temp file first so readers never see a partial entry
+            fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            try:
+                with gzip.open(os.fdopen(fd, "wb"), "wt", encoding="utf-8") as f:
+                    json.dump(value, f, separators=(",", ":"))
+                os.replace(tmp, self._disk_path(key))
+            except OSError:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+
+    def _expired(self, stored):
+        return self.ttl is not None and time.time() - stored > self.ttl
+
+    def _remember(self, key, value, stored=None):
+        with self._lock:
+            self._entries[key] = (value, time.time() if stored is None else stored)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all in-memory entries (the disk tier is left alone)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+# Shared cache for simulation step lists
+SIM_CACHE = ResultCache(SIM_CACHE_SIZE, disk_dir=SIM_CACHE_DIR)
+
+# Shared cache for model replies (raw text, before parsing)
+LLM_CACHE = ResultCache(LLM_CACHE_SIZE, disk_dir=LLM_CACHE_DIR, ttl=LLM_CACHE_TTL)
+
+
+def _lookups():
+    counts = {}
+    for name, cache in (("simulation", SIM_CACHE), ("llm", LLM_CACHE)):
+        stats = cache.stats()
+        counts[(name, "hit")] = stats["hits"]
+        counts[(name, "disk_hit")] = stats["disk_hits"]
+        counts[(name, "miss")] = stats["misses"]
+    return counts
+
+
+CACHE_LOOKUPS = CallbackCounter(
+    "genvanet_cache_lookups_total", "Result cache lookups by cache and result", ("cache", "result"), _lookups,
+)
@@ -0,0 +1,237 @@
+"""
+Alternative encodings for /simulate step data.
+
+"rows" (the default) is the list of per-step dicts produced by
+traci.main. "columnar" sends everything static once per run - vehicle
+types and routes, edge IDs, traffic light IDs and programs - and turns
+each step into parallel arrays of numbers indexing into those tables.
+Traffic lights are delta-encoded: a step only lists lights whose phase,
+state or program changed since the previous step.
+
+ColumnarEncoder/ColumnarDecoder do the same thing one step at a time
+(each encoded step carries only the static entries it introduced),
+which is what trace files use.
+
+Vehicles are assumed to keep the route they departed with (nothing in
+this project reroutes), so only the first route seen per vehicle is kept.
+"""
+
+FORMATS = ("rows", "columnar")
+
+
+def _empty_static():
+    return {
+        "edges": [],
+        "roads": [],
+        "vehicles": {"ids": [], "types": [], "routes": []},
+        "traffic_lights": {"ids": [], "programs": []},
+    }
+
+
+def _extend_static(static, new):
+    """Append the entries in `new` to the static tables in `static`."""
+    static["edges"].extend(new.get("edges", ()))
+    static["roads"].extend(new.get("roads", ()))
+    for key in ("ids", "types", "routes"):
+        static["vehicles"][key].extend(new.get("vehicles", {}).get(key, ()))
+    for key in ("ids", "programs"):
+        static["traffic_lights"][key].extend(new.get("traffic_lights", {}).get(key, ()))
+
+
+class ColumnarEncoder:
+    """
+    Encodes row-format steps one at a time.
+
+    encode(step) returns (record, new_static): the step's numeric
+    columns and the static table entries first seen in this step
+    (empty lists when nothing new appeared). The full tables so far
+    are in `static`.
+    """
+
+    def __init__(self):
+        self.static = _empty_static()
+        self._edge_index = {}
+        self._road_index = {}
+        self._vehicle_index = {}
+        self._tls_index = {}
+        self._last_tls = {}
+
+    def _add_edge(self, eid, new):
+        self._edge_index[eid] = len(self.static["edges"])
+        self.static["edges"].append(eid)
+        new["edges"].append(eid)
+        return self._edge_index[eid]
+
+    def encode(self, step):
+        new = _empty_static()
+        static = self.static
+
+        # Edges: arrays aligned with the static edge ID list
+        for e in step["edges"]:
+            if e["id"] not in self._edge_index:
+                self._add_edge(e["id"], new)
+        n = len(static["edges"])
+        ecols = {
+            "vehicle_count": [0] * n,
+            "mean_speed": [0] * n,
+            "occupancy": [0] * n,
+            "waiting_time": [0] * n,
+        }
+        for e in step["edges"]:
+            ei = self._edge_index[e["id"]]
+            ecols["vehicle_count"][ei] = e["vehicle_count"]
+            ecols["mean_speed"][ei] = e["mean_speed"]
+            ecols["occupancy"][ei] = e["occupancy"]
+            ecols["waiting_time"][ei] = e["waiting_time"]
+
+        # Vehicles: index into the static vehicle table + numeric columns
+        vcols = {"index": [], "speed": [], "x": [], "y": [], "road": [], "lane_position": []}
+        for v in step["vehicles"]:
+            vi = self._vehicle_index.get(v["id"])
+            if vi is None:
+                route = []
+                for eid in v["route"]:
+                    ei = self._edge_index.get(eid)
+                    route.append(ei if ei is not None else self._add_edge(eid, new))
+                vi = self._vehicle_index[v["id"]] = len(static["vehicles"]["ids"])
+                for table in (static["vehicles"], new["vehicles"]):
+                    table["ids"].append(v["id"])
+                    table["types"].append(v["type"])
+                    table["routes"].append(route)
+
+            ri = self._road_index.get(v["road"])
+            if ri is None:
+                ri = self._road_index[v["road"]] = len(static["roads"])
+                static["roads"].append(v["road"])
+                new["roads"].append(v["road"])
+
+            vcols["index"].append(vi)
+            vcols["speed"].append(v["speed"])
+            vcols["x"].append(v["position"]["x"])
+            vcols["y"].append(v["position"]["y"])
+            vcols["road"].append(ri)
+            vcols["lane_position"].append(v["lane_position"])
+
+        # Traffic lights: only the ones that changed since the last step
+        tcols = {"index": [], "phase": [], "state": [], "program": []}
+        for t in step["traffic_lights"]:
+            ti = self._tls_index.get(t["id"])
+            if ti is None:
+                ti = self._tls_index[t["id"]] = len(static["traffic_lights"]["ids"])
+                for table in (static["traffic_lights"], new["traffic_lights"]):
+                    table["ids"].append(t["id"])
+                    table["programs"].append(t["program"])
+            current = (t["phase"], t["state"], t["program"])
+            if self._last_tls.get(ti) != current:
+                self._last_tls[ti] = current
+                tcols["index"].append(ti)
+                tcols["phase"].append(t["phase"])
+                tcols["state"].append(t["state"])
+                tcols["program"].append(t["program"])
+
+        record = {
+            "time": step["time"],
+            "active_vehicles": step["stats"]["active_vehicles"],
+            "departed": step["stats"]["departed"],
+            "arrived": step["stats"]["arrived"],
+            "vehicles": vcols,
+            "edges": ecols,
+            "traffic_lights": tcols,
+        }
+        return record, new
+
+
+class ColumnarDecoder:
+    """
+    Inverse of ColumnarEncoder. Feed it static table additions with
+    add_static() (or a full table set up front) and records in order.
+    """
+
+    def __init__(self, static=None):
+        self.static = _empty_static()
+        if static:
+            _extend_static(self.static, static)
+        self._tls_state = {}
+
+    def add_static(self, new):
+        _extend_static(self.static, new)
+
+    def decode(self, record):
+        edge_ids = self.static["edges"]
+        roads = self.static["roads"]
+        vehicles = self.static["vehicles"]
+        tls_ids = self.static["traffic_lights"]["ids"]
+
+        vcols = record["vehicles"]
+        step_vehicles = []
+        for j, vi in enumerate(vcols["index"]):
+            step_vehicles.append({
+                "id": vehicles["ids"][vi],
+                "speed": vcols["speed"][j],
+                "position": {"x": vcols["x"][j], "y": vcols["y"][j]},
+                "road": roads[vcols["road"][j]],
+                "lane_position": vcols["lane_position"][j],
+                "route": [edge_ids[ei] for ei in vehicles["routes"][vi]],
+                "type": vehicles["types"][vi],
+            })
+
+        ecols = record["edges"]
+        step_edges = []
+        for ei in range(len(ecols["vehicle_count"])):
+            step_edges.append({
+                "id": edge_ids[ei],
+                "vehicle_count": ecols["vehicle_count"][ei],
+                "mean_speed": ecols["mean_speed"][ei],
+                "occupancy": ecols["occupancy"][ei],
+                "waiting_time": ecols["waiting_time"][ei],
+            })
+
+        tcols = record["traffic_lights"]
+        for j, ti in enumerate(tcols["index"]):
+            self._tls_state[ti] = (tcols["phase"][j], tcols["state"][j], tcols["program"][j])
+        step_tls = [
+            {"id": tls_ids[ti], "phase": phase, "state": state, "program": program}
+            for ti, (phase, state, program) in sorted(self._tls_state.items())
+        ]
+
+        return {
+            "time": record["time"],
+            "vehicles": step_vehicles,
+            "edges": step_edges,
+            "traffic_lights": step_tls,
+            "stats": {
+                "active_vehicles": record["active_vehicles"],
+                "departed": record["departed"],
+                "arrived": record["arrived"],
+            },
+        }
+
+
+def to_columnar(steps):
+    """Encode a list of row-format steps into the columnar payload."""
+    encoder = ColumnarEncoder()
+    cols = {
+        "time": [],
+        "active_vehicles": [],
+        "departed": [],
+        "arrived": [],
+        "vehicles": [],
+        "edges": [],
+        "traffic_lights": [],
+    }
+    for step in steps:
+        record, _ = encoder.encode(step)
+        for key, col in cols.items():
+            col.append(record[key])
+
+    return dict({"format": "columnar"}, **encoder.static, steps=cols)
+
+
+def from_columnar(payload):
+    """Decode a columnar payload back into the list of row-format steps."""
+    decoder = ColumnarDecoder(payload)
+    cols = payload["steps"]
+    steps = []
+    for i in range(len(cols["time"])):
+        steps.append(decoder.decode({key: col[i] for key, col in cols.items()}))
+    return steps
@@ -0,0 +1,186 @@
+"""
+Background job queue for long-running simulations.
+
+A job wraps a function that takes the Job itself. Jobs run on a
+bounded worker pool; the Job doubles as a simulation recorder (see
+SimulationSession), so every collected step updates its progress and
+a cancelled job stops the TraCI loop at the next step.
+
+Submissions beyond max_pending (queued + running) are refused with
+JobQueueFull so callers can push back instead of piling up work.
+Finished jobs are kept for keep_seconds, then forgotten.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .traci.main import SIM_WORKERS
+
+JOB_WORKERS = int(os.environ.get("GENVANET_JOB_WORKERS", "0")) or SIM_WORKERS
+MAX_PENDING_JOBS = int(os.environ.get("GENVANET_MAX_PENDING_JOBS", "64"))
+JOB_KEEP_SECONDS = float(os.environ.get("GENVANET_JOB_KEEP_SECONDS", "3600"))
+
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+
+
+class JobQueueFull(Exception):
+    """Raised by JobQueue.submit when max_pending jobs are already waiting or running."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's run once it has been cancelled."""
+
+
+class Job:
+    """
+    One submitted unit of work and its status.
+
+    Attributes:
+        id:       Job ID (random hex).
+        kind:     Free-form label ("simulate", "predict", ...).
+        status:   One of JOB_STATES.
+        progress: {"time": last simulated second, "duration": end time}.
+        result:   The function's return value once status is "done".
+        error:    Error message once status is "failed".
+    """
+
+    def __init__(self, kind, fn, duration=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.progress = {"time": 0.0, "duration": duration}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._fn = fn
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def write(self, step):
+        """Recorder hook: note the step's time, and stop the run if cancelled."""
+        self.progress["time"] = step["time"]
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def run(self):
+        if self._cancel.is_set():
+            return
+        self.status = "running"
+        self.started = time.time()
+        try:
+            result = self._fn(self)
+            if self._cancel.is_set():
+                self.status = "cancelled"
+            else:
+                self.result = result
+                self.status = "done"
+        except JobCancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            if self._cancel.is_set():
+                self.status = "cancelled"
+            else:
+                print(f"[Job Error] {self.kind} {self.id}: {e}")
+                self.error = str(e) or type(e).__name__
+                self.status = "failed"
+        finally:
+            self.finished = time.time()
+
+    def to_dict(self, include_result=True):
+        info = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.error is not None:
+            info["error"] = self.error
+        if include_result and self.status == "done":
+            info["result"] = self.result
+        return info
+
+
+class JobQueue:
+    """Bounded worker pool plus a registry of recent jobs."""
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=MAX_PENDING_JOBS, keep_seconds=JOB_KEEP_SECONDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.keep_seconds = keep_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.submitted = 0
+        self.rejected = 0
+
+    def _pending(self):
+        return sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, kind, fn, duration=None):
+        """
+        Queue fn(job) and return the Job. Raises JobQueueFull when
+        max_pending jobs are already queued or running.
+        """
+        with self._lock:
+            self._prune()
+            if self._pending() >= self.max_pending:
+                self.rejected += 1
+                raise JobQueueFull(f"{self.max_pending} jobs already pending")
+            job = Job(kind, fn, duration)
+            self._jobs[job.id] = job
+            self.submitted += 1
+        self._executor.submit(job.run)
+        return job
+
+    def get(self, job_id):
+        """The Job for job_id, or None if unknown (or already forgotten)."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: a queued job never starts, a running one stops at
+        its next simulation step. Returns the Job, or None if unknown.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job._cancel.set()
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.finished = time.time()
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": counts["queued"] + counts["running"],
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "jobs": counts,
+            }
+
+
+# Shared queue used by the API
+JOB_QUEUE = JobQueue()
@@ -0,0 +1,392 @@
+"""
+Shared client for OpenAI-compatible chat completion APIs.
+
+Every model query goes through one ChatClient per endpoint, which adds
+what a bare HTTP call lacks:
+
+    Rate limiting    - a token bucket per model, for requests and for
+                       tokens, resynced from the provider's
+                       x-ratelimit-* headers after every response. A
+                       429's Retry-After pauses the model's bucket.
+    Retries          - 429, 5xx, connection errors and timeouts are
+                       retried with full-jitter exponential backoff,
+                       within the caller's timeout.
+    Circuit breaking - after BREAKER_FAILURES consecutive failed
+                       queries the endpoint is considered down and
+                       queries fail at once (callers fall back to the
+                       analytical prediction) until BREAKER_COOLDOWN
+                       has passed; then one trial query decides.
+    Concurrency cap  - at most MAX_IN_FLIGHT requests to the endpoint
+                       at once; the rest wait for a slot.
+    Streaming        - with a consumer, the reply is requested with
+                       "stream": true and read as server-sent events;
+                       the consumer sees each piece of text and can end
+                       the stream early (see ai_model.FieldScanner).
+
+Failures raise LLMError (or a subclass); ai_model.chat_completion
+turns them into the "ERROR: ..." replies the parsers expect.
+
+python -m backend.bench.stub_llm can return rate-limit headers, 429s
+and 5xx errors, so all of this can be exercised locally.
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import LLM_EARLY_CLOSES, LLM_RETRIES, LLM_SECONDS, Span
+
+# HTTP requests to one endpoint in flight at once
+MAX_IN_FLIGHT = int(os.environ.get("GENVANET_LLM_MAX_IN_FLIGHT", "8"))
+# Retries per query after the first attempt (429, 5xx, network errors)
+MAX_RETRIES = int(os.environ.get("GENVANET_LLM_RETRIES", "2"))
+# Consecutive failed queries that open the circuit, and seconds it stays open
+BREAKER_FAILURES = int(os.environ.get("GENVANET_LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("GENVANET_LLM_BREAKER_COOLDOWN", "30"))
+
+# Backoff before retry n (from 0) is uniform in [0, min(BACKOFF_CAP, BACKOFF_BASE * 2**n)]
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """A model query that failed; the message is shown in the ERROR reply."""
+
+
+class CircuitOpenError(LLMError):
+    """The endpoint failed repeatedly and is not being called for now."""
+
+
+class RateLimitError(LLMError):
+    """
+    The query could not be sent within its timeout because of rate
+    limits or because max_in_flight queries were already running.
+    """
+
+
+def parse_duration(value):
+    """
+    Seconds in a rate-limit reset header: "7.66s", "2m59.56s", "1h2m",
+    "120ms" or a bare number of seconds. None if unparseable.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+    scale = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(n) * scale[u] for n, u in parts)
+
+
+# ── Rate limiting ─────────────────────────────────────────────
+
+class TokenBucket:
+    """
+    Classic token bucket. Unlimited (capacity None) until the first
+    sync() from response headers tells it the provider's limit.
+    """
+
+    def __init__(self, capacity=None, refill_per_second=0.0):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now):
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` can be taken (0 if now)."""
+        self._refill(now)
+        pause = max(0.0, self._paused_until - now)
+        if self.capacity is None:
+            return pause
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return pause
+        if self.refill_per_second <= 0:
+            return float("inf")
+        return max(pause, (amount - self.tokens) / self.refill_per_second)
+
+    def take(self, amount, now):
+        self._refill(now)
+        if self.capacity is not None:
+            self.tokens -= min(amount, self.capacity)
+
+    def sync(self, limit, remaining, reset, now):
+        """
+        Adopt the provider's view: `limit` per window, `remaining` now,
+        back to full after `reset` seconds.
+        """
+        self._refill(now)
+        self.capacity = float(limit)
+        self.tokens = float(remaining)
+        missing = limit - remaining
+        if reset and reset > 0 and missing > 0:
+            self.refill_per_second = missing / reset
+        elif not self.refill_per_second:
+            # Nothing to learn the rate from yet; assume a one-minute window
+            self.refill_per_second = limit / 60.0
+
+    def pause(self, seconds, now):
+        """Hand out nothing for `seconds` (a 429's Retry-After)."""
+        self._paused_until = max(self._paused_until, now + seconds)
+
+
+class RateLimiter:
+    """Request and token buckets for one model."""
+
+    def __init__(self):
+        self.requests = TokenBucket()
+        self.tokens = TokenBucket()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens, deadline):
+        """Block until one request of `tokens` may be sent; RateLimitError past the deadline."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                if wait <= 0:
+                    self.requests.take(1, now)
+                    self.tokens.take(tokens, now)
+                    return
+            if now + wait > deadline:
+                raise RateLimitError(f"rate limited for another {wait:.1f}s")
+            time.sleep(min(wait, 1.0))
+
+    def update(self, headers):
+        """Resync from x-ratelimit-{limit,remaining,reset}-{requests,tokens} headers."""
+        with self._lock:
+            now = time.monotonic()
+            for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                try:
+                    limit = float(headers[f"x-ratelimit-limit-{kind}"])
+                    remaining = float(headers[f"x-ratelimit-remaining-{kind}"])
+                except (KeyError, ValueError):
+                    continue
+                bucket.sync(limit, remaining, parse_duration(headers.get(f"x-ratelimit-reset-{kind}")), now)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.requests.pause(seconds, time.monotonic())
+
+
+# ── Circuit breaker ───────────────────────────────────────────
+
+class CircuitBreaker:
+    """
+    closed -> (failures consecutive failures) -> open -> (cooldown) ->
+    half-open: one trial query; success closes, failure reopens for
+    another cooldown. A trial that proves nothing (rate limited, ok=None)
+    goes back to open without a new cooldown, so the next query is the
+    trial.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a query may go ahead."""
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+                return
+            raise CircuitOpenError("model API is failing; skipping it for now")
+
+    def record(self, ok):
+        """Count a query's outcome; ok=None means it proved nothing either way."""
+        with self._lock:
+            if ok is None:
+                if self.state == "half_open":
+                    # _opened_at is left as it is: the cooldown is over and
+                    # the next query becomes the trial straight away
+                    self.state = "open"
+                return
+            if ok:
+                self.state = "closed"
+                self._consecutive = 0
+                return
+            self._consecutive += 1
+            if self.state == "half_open" or self._consecutive >= self.failures:
+                if self.state != "open":
+                    print(f"[LLM Client Error] circuit open after {self._consecutive} failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+# ── Client ────────────────────────────────────────────────────
+
+def _estimate_tokens(messages, max_tokens):
+    """Rough prompt size (4 characters per token) plus the completion budget."""
+    return sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+
+class ChatClient:
+    """
+    Chat completions against one endpoint (see module docstring).
+
+    The API key is read through a callable so it can change after
+    import (e.g. a .env loaded later, or tests).
+    """
+
+    def __init__(self, url, api_key, max_in_flight=MAX_IN_FLIGHT, max_retries=MAX_RETRIES,
+                 breaker=None, session=None):
+        self.url = url
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._limiters = {}
+        self._lock = threading.Lock()
+        if session is None:
+            # Keep-alive pool: queries reuse TLS connections
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=max_in_flight))
+            session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=max_in_flight))
+        self.session = session
+
+    def limiter(self, model):
+        with self._lock:
+            limiter = self._limiters.get(model)
+            if limiter is None:
+                limiter = self._limiters[model] = RateLimiter()
+            return limiter
+
+    def chat(self, model, messages, timeout, max_tokens=300, temperature=0.7, consumer=None):
+        """
+        Return the reply text for `messages`, spending at most `timeout`
+        seconds on it (queueing, rate-limit waits and retries included).
+
+        With a consumer the reply is streamed: consumer(text) is called
+        with each new piece, and returning True closes the stream; the
+        text received so far is the reply.
+        """
+        self.breaker.allow()
+        deadline = time.monotonic() + timeout
+        ok = None
+        try:
+            reply = self._chat(model, messages, deadline, max_tokens, temperature, consumer)
+            ok = True
+            return reply
+        except RateLimitError:
+            # Rate limited or out of slots, by the provider or locally: says nothing about the endpoint
+            raise
+        except LLMError:
+            ok = False
+            raise
+        finally:
+            self.breaker.record(ok)
+
+    def _chat(self, model, messages, deadline, max_tokens, temperature, consumer):
+        limiter = self.limiter(model)
+        body = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+        if consumer is not None:
+            body["stream"] = True
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire(_estimate_tokens(messages, max_tokens), deadline)
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                # Saturated here, not at the endpoint: keep it out of the breaker
+                raise RateLimitError("too many model queries in flight")
+            try:
+                with Span("llm") as span:
+                    response = self.session.post(
+                        self.url,
+                        headers={"Authorization": f"Bearer {self.api_key()}", "Content-Type": "application/json"},
+                        json=body,
+                        timeout=max(0.1, deadline - time.monotonic()),
+                        stream=consumer is not None,
+                    )
+                    if response.status_code == 200:
+                        reply = self._read_reply(response, model, consumer, deadline)
+                LLM_SECONDS.observe(span.elapsed, (model,))
+                limiter.update(response.headers)
+                if response.status_code == 200:
+                    return reply
+                retry_after = parse_duration(response.headers.get("retry-after"))
+                if response.status_code == 429:
+                    error = RateLimitError(f"API 429 - {response.text[:500]}")
+                    if retry_after:
+                        limiter.pause(retry_after)
+                else:
+                    error = LLMError(f"API {response.status_code} - {response.text[:500]}")
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+                reason = str(response.status_code)
+            except requests.Timeout:
+                error, retry_after, reason = LLMError("API took too long to respond."), None, "timeout"
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                error, retry_after, reason = LLMError("Cannot connect to the API."), None, "connection"
+            finally:
+                self._slots.release()
+
+            print(f"[LLM Client Error] {model} attempt {attempt + 1}: {error}")
+            if attempt == self.max_retries:
+                break
+            backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            wait = max(backoff, retry_after or 0)
+            if time.monotonic() + wait >= deadline:
+                break
+            LLM_RETRIES.inc((model, reason))
+            time.sleep(wait)
+        raise error
+
+    @staticmethod
+    def _read_reply(response, model, consumer, deadline):
+        """
+        The reply text of a 200 response, streamed into consumer if
+        there is one. LLMError if the body isn't a chat completion.
+        """
+        if consumer is None:
+            try:
+                return response.json()["choices"][0]["message"]["content"]
+            except (ValueError, LookupError, TypeError) as e:
+                raise LLMError(f"Malformed API response: {e!r}")
+        parts = []
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    choices = json.loads(data).get("choices") or [{}]
+                    text = (choices[0].get("delta") or {}).get("content") or ""
+                except (ValueError, LookupError, TypeError, AttributeError) as e:
+                    raise LLMError(f"Malformed API response: {e!r}")
+                if not text:
+                    continue
+                parts.append(text)
+                if consumer(text):
+                    LLM_EARLY_CLOSES.inc((model,))
+                    break
+                if time.monotonic() > deadline:
+                    raise requests.Timeout()
+        finally:
+            # Closing mid-stream drops the connection, which stops generation
+            response.close()
+        return "".join(parts)
@@ -3,33 +3,98 @@ FastAPI backend for genVANET.
 
 Endpoints:
     POST /simulate          - Run a full simulation with scenario params, return all data
+    POST /simulate/stream   - Same run, streamed as NDJSON while SUMO is still stepping
     GET  /simulate/options   - Return available scenario options for the frontend
+    POST /predict           - Run a simulation and compare both models' route predictions
+    POST /predict/batch     - Many /predict combinations, sharing simulations between them
+    POST /whatif            - /predict on a run forked from a mid-run snapshot, with modifications
+    POST /jobs/simulate     - Queue a /simulate run as a background job
+    POST /jobs/predict      - Queue a /predict call as a background job
+    GET  /jobs/{job_id}     - Job status, progress and result (DELETE cancels it)
+    POST /analytics         - Whole-run per-route statistics for every scenario route
+    GET  /cache/stats       - Simulation result, model reply and snapshot cache hit/miss counters
+    GET  /metrics           - Prometheus metrics: phase timings, run/step/LLM counters
+    GET  /runs/{run_id}/steps              - Stored run steps in a time range
+    GET  /runs/{run_id}/edges/{edge_id}    - One edge's time series from a stored run
 """
 
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
+from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
-from .traci.scenario import generate_scenario, DENSITY_CONFIG, MIX_CONFIG, PATTERN_FN
-from .traci.main import run_full_simulation
+from .traci.scenario import write_scenario, resolve_size, DENSITY_CONFIG, MIX_CONFIG, PATTERN_FN
+from .traci.main import DEFAULT_COLLECT, SIM_POOL, CollectOptions
+from .traci.network import load_network
+from .traci.snapshot import SNAPSHOTS, ModificationError, check_modifications, modification, run_what_if
+from .cache import LLM_CACHE, SIM_CACHE, HashingWriter, simulation_key
+from .formats import FORMATS, to_columnar
+from .store import EDGE_FIELDS, RUN_STORE
+from .analytics import RunArrays, route_summary
+from .jobs import JOB_QUEUE, JobQueueFull
+from .metrics import CONTENT_TYPE, SERVER_TIMING, Span, render, start_timings, submit
+from .responses import CompressionMiddleware, FastJSONResponse, dumps
 import time
 
-from .ai_model import generate_prediction, _calc_route_stats, _pick_best_route
+from .ai_model import generate_prediction, fallback_prediction, _calc_route_stats, _pick_best_route
 from .groq_model import generate_groq_prediction
 from .validator import validate_prediction
 
-app = FastAPI(title="genVANET API", version="0.1.0")
+# Overall time budget (seconds) for the concurrent model queries in /predict
+PREDICT_DEADLINE = float(os.environ.get("GENVANET_PREDICT_DEADLINE", "30"))
+
+# Largest scenario /simulate will buffer in one response (use /simulate/stream above this)
+MAX_BUFFERED_VEHICLES = int(os.environ.get("GENVANET_MAX_BUFFERED_VEHICLES", "2000"))
+
+# Most steps /runs/{run_id}/steps returns in one response
+MAX_STORED_STEPS = int(os.environ.get("GENVANET_MAX_STORED_STEPS", "600"))
+
+# Model queries in flight at once, across all requests (two per prediction)
+LLM_CONCURRENCY = int(os.environ.get("GENVANET_LLM_CONCURRENCY", "16"))
+MODEL_EXECUTOR = ThreadPoolExecutor(max_workers=LLM_CONCURRENCY, thread_name_prefix="llm")
+
+# Most combinations one /predict/batch call accepts, and how many of its
+# unique scenarios are prepared at once (SIM_POOL still caps SUMO processes)
+MAX_BATCH_ITEMS = int(os.environ.get("GENVANET_MAX_BATCH_ITEMS", "32"))
+BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="batch")
+
+# Seconds clients are told to wait when the job queue is full
+JOB_RETRY_AFTER = 5
+
+
+app = FastAPI(title="genVANET API", version="0.1.0", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# gzip/brotli, negotiated per request (see responses.py)
+app.add_middleware(CompressionMiddleware)
+
+
+if SERVER_TIMING:
+    @app.middleware("http")
+    async def server_timing(request: Request, call_next):
+        """
+        Report each phase's total time in a Server-Timing header. Streamed
+        responses only cover what ran before the first byte was sent.
+        """
+        timings = start_timings()
+        response = await call_next(request)
+        response.headers["Server-Timing"] = timings.header()
+        return response
 
 
 class ScenarioRequest(BaseModel):
@@ -37,6 +102,184 @@ class ScenarioRequest(BaseModel):
     vehicle_mix: str = "mixed"     # cars_only | mixed | heavy_commercial
     pattern: str = "uniform"       # uniform | rush_hour | random
     seed: int = 42
+    # Optional overrides of the density preset (see scenario.resolve_size)
+    count: Optional[int] = None    # vehicles
+    duration: Optional[int] = None # seconds
+    rate: Optional[float] = None   # vehicles per second
+
+
+class SimulateRequest(ScenarioRequest):
+    # What to collect (see traci.main.CollectOptions); None means everything
+    stride: int = 1                              # collect every N simulated seconds
+    sections: Optional[List[str]] = None         # vehicles | edges | traffic_lights | stats
+    vehicle_fields: Optional[List[str]] = None   # speed | position | road | lane_position | route | type
+    edge_fields: Optional[List[str]] = None      # vehicle_count | mean_speed | occupancy | waiting_time
+    tls_fields: Optional[List[str]] = None       # phase | state | program
+    edges: Optional[List[str]] = None            # edge IDs to report
+
+
+def _collect_options(req):
+    """CollectOptions for a /simulate request, as a 400 on unknown options or edges."""
+    if not isinstance(req, SimulateRequest):
+        return DEFAULT_COLLECT
+    try:
+        options = CollectOptions(
+            stride=req.stride,
+            sections=req.sections,
+            vehicle_fields=req.vehicle_fields,
+            edge_fields=req.edge_fields,
+            tls_fields=req.tls_fields,
+            edges=req.edges,
+        )
+        options.edge_ids(load_network())
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return options if not options.is_default() else DEFAULT_COLLECT
+
+
+def _run_key(params, digest, collect=DEFAULT_COLLECT):
+    """Cache/store key for a run; narrowed collection gets keys of its own."""
+    if not collect.is_default():
+        params = dict(params, collect=collect.params())
+    return simulation_key(params, digest, backend=SIM_POOL.backend)
+
+
+def _scenario_size(req):
+    """Resolve (count, duration) for a request, as a 400 on bad overrides."""
+    try:
+        return resolve_size(req.density, req.count, req.duration, req.rate)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+def _scenario_params(req):
+    """Scenario fields that determine a run, with the size resolved."""
+    count, duration = _scenario_size(req)
+    return {
+        "density": req.density,
+        "vehicle_mix": req.vehicle_mix,
+        "pattern": req.pattern,
+        "seed": req.seed,
+        "count": count,
+        "duration": duration,
+    }
+
+
+@contextmanager
+def _scenario_file(req):
+    """
+    Write the scenario's route XML straight to a temp file, hashing it on
+    the way, and yield (route_file, params, route_digest). The file is
+    removed on exit. Nothing scales with the vehicle count in memory.
+    """
+    params = _scenario_params(req)
+    with tempfile.NamedTemporaryFile("w", suffix=".rou.xml", delete=False) as f, Span("scenario"):
+        writer = HashingWriter(f)
+        write_scenario(
+            writer,
+            density=params["density"],
+            vehicle_mix=params["vehicle_mix"],
+            pattern=params["pattern"],
+            seed=params["seed"],
+            count=params["count"],
+            duration=params["duration"],
+        )
+    try:
+        yield f.name, params, writer.hexdigest()
+    finally:
+        os.unlink(f.name)
+
+
+def _simulate_scenario(req, recorder=None, collect=DEFAULT_COLLECT):
+    """
+    Generate the scenario and return (steps, run_id), reusing a cached
+    run when the same scenario has been simulated before. run_id is
+    the run's ID in the run store, or None if the store is disabled
+    (or collect narrowed what is collected: stored runs hold every
+    field). A simulated run is stored as it is collected. recorder is
+    passed on to the simulation (see SimulationSession); on a cache hit
+    it is only given the last step.
+    """
+    store = RUN_STORE if collect.is_default() else None
+    with _scenario_file(req) as (route_file, params, digest):
+        key = _run_key(params, digest, collect)
+        steps = SIM_CACHE.get(key)
+        if steps is None:
+            writer = store.writer(key) if store is not None and not store.has(key) else None
+            with writer or nullcontext():
+                steps = SIM_POOL.run(route_file=route_file, duration=params["duration"], recorder=recorder,
+                                     collect=collect, writer=writer)
+            SIM_CACHE.put(key, steps)
+        elif recorder is not None and steps:
+            recorder.write(steps[-1])
+    if store is None:
+        return steps, None
+    if not store.has(key):
+        # Cached before the store had it (e.g. the store was cleared)
+        with store.writer(key) as writer:
+            for step in steps:
+                writer.write(step)
+    return steps, key
+
+
+def _peak_snapshot(req, recorder=None):
+    """
+    Return the step with the most active vehicles, or None.
+
+    A cached full run is used if there is one; otherwise SUMO only
+    runs until the peak can no longer change and just that step is
+    kept (and cached under its own key). On a cache hit the recorder
+    is only given the cached run's last step (or the cached peak).
+    """
+    with _scenario_file(req) as (route_file, params, digest):
+        steps = SIM_CACHE.get(simulation_key(params, digest, backend=SIM_POOL.backend))
+        if steps is not None:
+            if recorder is not None and steps:
+                recorder.write(steps[-1])
+            return max(steps, key=lambda s: s["stats"]["active_vehicles"]) if steps else None
+
+        peak_key = simulation_key(dict(params, mode="peak"), digest, backend=SIM_POOL.backend)
+        cached = SIM_CACHE.get(peak_key)
+        if cached is not None:
+            if recorder is not None and cached["peak"] is not None:
+                recorder.write(cached["peak"])
+            return cached["peak"]
+
+        peak = SIM_POOL.run_peak(
+            route_file=route_file,
+            duration=params["duration"],
+            total_vehicles=params["count"],
+            recorder=recorder,
+        )
+    SIM_CACHE.put(peak_key, {"peak": peak})
+    return peak
+
+
+def _check_buffered_size(req):
+    """Whole-run responses are held in memory; big runs must be streamed."""
+    count, _ = _scenario_size(req)
+    if count > MAX_BUFFERED_VEHICLES:
+        raise HTTPException(
+            400,
+            f"Scenarios over {MAX_BUFFERED_VEHICLES} vehicles must use /simulate/stream",
+        )
+
+
+def _run_arrays(steps, run_id):
+    """RunArrays for a run, mapped from the run store when it was stored."""
+    run = RUN_STORE.open(run_id) if run_id else None
+    return RunArrays.from_stored(run) if run is not None else RunArrays.from_steps(steps)
+
+
+def _validate_scenario(req):
+    """Raise a 400 if any scenario field is not a known option."""
+    if req.density not in DENSITY_CONFIG:
+        raise HTTPException(400, f"Invalid density. Options: {list(DENSITY_CONFIG.keys())}")
+    if req.vehicle_mix not in MIX_CONFIG:
+        raise HTTPException(400, f"Invalid vehicle_mix. Options: {list(MIX_CONFIG.keys())}")
+    if req.pattern not in PATTERN_FN:
+        raise HTTPException(400, f"Invalid pattern. Options: {list(PATTERN_FN.keys())}")
+    _scenario_size(req)
 
 
 @app.get("/simulate/options")
@@ -50,115 +293,305 @@ def get_options():
 
 
 @app.post("/simulate")
-def run_simulation(req: ScenarioRequest):
+def run_simulation(req: SimulateRequest, format: str = "rows"):
     """
     Generate a scenario from params, run SUMO via TraCI, return results.
 
     This is the main endpoint your frontend will call.
+    Pass ?format=columnar for the compact encoding (see formats.py).
+    stride, sections, *_fields and edges narrow what is collected, and
+    SUMO is only queried for that.
     """
-    # Validate inputs
-    if req.density not in DENSITY_CONFIG:
-        raise HTTPException(400, f"Invalid density. Options: {list(DENSITY_CONFIG.keys())}")
-    if req.vehicle_mix not in MIX_CONFIG:
-        raise HTTPException(400, f"Invalid vehicle_mix. Options: {list(MIX_CONFIG.keys())}")
-    if req.pattern not in PATTERN_FN:
-        raise HTTPException(400, f"Invalid pattern. Options: {list(PATTERN_FN.keys())}")
+    collect = _validate_simulate(req, format)
+    return FastJSONResponse(_simulate_response(req, collect, format))
 
-    # Generate route XML from scenario params
-    route_xml, duration = generate_scenario(
-        density=req.density,
-        vehicle_mix=req.vehicle_mix,
-        pattern=req.pattern,
-        seed=req.seed,
-    )
 
-    # Run SUMO simulation and collect per-step data
-    steps = run_full_simulation(route_xml=route_xml, duration=duration)
+def _validate_simulate(req, format):
+    """Return the request's CollectOptions; a 400 if it can't be served."""
+    _validate_scenario(req)
+    if format not in FORMATS:
+        raise HTTPException(400, f"Invalid format. Options: {list(FORMATS)}")
+    collect = _collect_options(req)
+    if format == "columnar" and not collect.is_complete():
+        raise HTTPException(400, "format=columnar needs every section and field")
+    _check_buffered_size(req)
+    return collect
 
-    # Build summary
+
+def _simulate_response(req, collect, format="rows", recorder=None):
+    """Build the /simulate response body (req already validated into collect)."""
+    # Generate the scenario, run SUMO (or hit the cache) and collect per-step data
+    steps, run_id = _simulate_scenario(req, recorder, collect)
+
+    # Build summary (total_vehicles is None when vehicles weren't collected)
     all_vehicles = set()
     for step in steps:
-        for v in step["vehicles"]:
+        for v in step.get("vehicles", ()):
             all_vehicles.add(v["id"])
 
     return {
-        "scenario": {
-            "density": req.density,
-            "vehicle_mix": req.vehicle_mix,
-            "pattern": req.pattern,
-            "seed": req.seed,
-        },
+        "scenario": _scenario_params(req),
+        "collect": collect.params(),
+        "run_id": run_id,
         "summary": {
             "total_steps": len(steps),
-            "total_vehicles": len(all_vehicles),
+            "total_vehicles": len(all_vehicles) if "vehicles" in collect.sections else None,
         },
-        "steps": steps,
+        "steps": to_columnar(steps) if format == "columnar" else steps,
     }
 
 
-class PredictRequest(BaseModel):
-    density: str = "medium"
-    vehicle_mix: str = "mixed"
-    pattern: str = "uniform"
-    seed: int = 42
-    vehicle_type: str = "car"         # car | ambulance
-    objective: str = "fast"           # fast | safe
+@app.post("/simulate/stream")
+def stream_simulation(req: SimulateRequest):
+    """
+    Streaming variant of /simulate: newline-delimited JSON records.
 
+        {"type": "scenario", "scenario": {...}}     - first line
+        {"type": "step", "step": {...}}             - one per collected step
+        {"type": "summary", "summary": {...}}       - last line
 
+    Steps are sent as SUMO produces them, so nothing but the set of
+    seen vehicle IDs is held in memory for the run. With a run store
+    configured, the run is stored as it streams and later requests for
+    the same scenario are served from the store. Takes the same
+    collection options as /simulate; narrowed runs are never stored.
+    """
+    _validate_scenario(req)
+    collect = _collect_options(req)
+    store = RUN_STORE if collect.is_default() else None
+
+    def records():
+        with _scenario_file(req) as (route_file, params, digest):
+            yield dumps({"type": "scenario", "scenario": params, "collect": collect.params()}) + b"\n"
+
+            key = _run_key(params, digest, collect)
+            stored = store.open(key) if store is not None else None
+            cached = SIM_CACHE.get(key)
+            writer = None
+            if stored is not None:
+                steps = stored.iter_steps()
+            elif cached is not None:
+                steps = cached
+            else:
+                steps = SIM_POOL.stream(route_file=route_file, duration=params["duration"], collect=collect)
+            if stored is None and store is not None:
+                # Store the run as it streams; dropped if the stream is cut short
+                writer = store.writer(key)
+
+            total_steps = 0
+            all_vehicles = set()
+            with writer or nullcontext():
+                for step in steps:
+                    total_steps += 1
+                    for v in step.get("vehicles", ()):
+                        all_vehicles.add(v["id"])
+                    if writer is not None:
+                        writer.write(step)
+                    yield dumps({"type": "step", "step": step}) + b"\n"
+
+        yield dumps({
+            "type": "summary",
+            "run_id": key if store is not None else None,
+            "summary": {
+                "total_steps": total_steps,
+                "total_vehicles": len(all_vehicles) if "vehicles" in collect.sections else None,
+            },
+        }) + b"\n"
+
+    return StreamingResponse(records(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Return hit/miss counters for the simulation, model reply and snapshot caches."""
+    return {"simulation": SIM_CACHE.stats(), "llm": LLM_CACHE.stats(), "snapshots": SNAPSHOTS.stats()}
+
+
+@app.post("/analytics")
+def route_analytics(req: ScenarioRequest, window: int = 30, series: bool = False):
+    """
+    Per-route statistics over the whole run for every route in the
+    scenario: mean, max and percentiles of vehicles, waiting time,
+    speed, occupancy and travel time (see analytics.py). Pass
+    ?series=true for the per-step and rolling-average series too.
+    """
+    _validate_scenario(req)
+    _check_buffered_size(req)
+    if window < 1:
+        raise HTTPException(400, "window must be at least 1")
 
-@app.post("/predict")
-def predict(req: PredictRequest):
+    steps, run_id = _simulate_scenario(req)
+    if not steps:
+        raise HTTPException(500, "Simulation produced no data")
+    return FastJSONResponse(dict(
+        route_summary(_run_arrays(steps, run_id), window=window, include_series=series),
+        scenario=_scenario_params(req),
+        run_id=run_id,
+    ))
+
+
+def _stored_run(run_id):
+    """Open a stored run, as a 404 if there is no such run."""
+    try:
+        run = RUN_STORE.open(run_id) if RUN_STORE is not None else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if run is None:
+        raise HTTPException(404, f"Unknown run: {run_id}")
+    return run
+
+
+@app.get("/runs/{run_id}/steps")
+def stored_steps(run_id: str, start: Optional[float] = None, end: Optional[float] = None):
+    """Return the steps of a stored run with start <= time < end."""
+    run = _stored_run(run_id)
+    i, j = run.time_range(start, end)
+    if j - i > MAX_STORED_STEPS:
+        raise HTTPException(400, f"At most {MAX_STORED_STEPS} steps per request; narrow the time range")
+    return FastJSONResponse({"run_id": run_id, "steps": list(run.iter_steps(i, j))})
+
+
+@app.get("/runs/{run_id}/edges/{edge_id}")
+def stored_edge_series(run_id: str, edge_id: str, field: str = "mean_speed",
+                       start: Optional[float] = None, end: Optional[float] = None):
+    """Return one edge's time series for `field` from a stored run."""
+    run = _stored_run(run_id)
+    if field not in EDGE_FIELDS:
+        raise HTTPException(400, f"Invalid field. Options: {list(EDGE_FIELDS)}")
+    if edge_id not in run.edge_ids:
+        raise HTTPException(404, f"Unknown edge: {edge_id}")
+    i, j = run.time_range(start, end)
+    return FastJSONResponse({
+        "run_id": run_id,
+        "edge": edge_id,
+        "field": field,
+        "time": run.column("steps.time")[i:j].tolist(),
+        "values": run.edge_series(edge_id, field, i, j).tolist(),
+    })
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.time()
+    result = fn(*args, **kwargs)
+    return result, round(time.time() - t0, 2)
+
+
+def _timed_until(deadline_at, fn, *args):
     """
-    Run simulation -> collect traffic data -> send to BOTH models -> compare -> return.
+    _timed(fn, *args, timeout=<seconds left>) if time.monotonic() has
+    not reached deadline_at yet when the executor gets to it, else None.
     """
-    if req.density not in DENSITY_CONFIG:
-        raise HTTPException(400, f"Invalid density. Options: {list(DENSITY_CONFIG.keys())}")
+    remaining = deadline_at - time.monotonic()
+    if remaining <= 0:
+        return None
+    return _timed(fn, *args, timeout=remaining)
+
+
+def _submit_models(predictors, traffic_data, vehicle_type, objective, deadline_at):
+    """
+    Start every predictor on the shared model executor; returns their
+    futures. deadline_at is a time.monotonic() time: each call gets the
+    time left when it starts, and calls still queued then are skipped.
+    """
+    return [
+        submit(MODEL_EXECUTOR, _timed_until, deadline_at, fn, traffic_data, vehicle_type, objective)
+        for fn in predictors
+    ]
+
+
+def _wait_models(futures, deadline_at):
+    wait(futures, timeout=max(0.0, deadline_at - time.monotonic()))
+
+
+def _model_results(futures, traffic_data, objective, deadline=PREDICT_DEADLINE):
+    """
+    (prediction, response_time) per future, in order, after the caller
+    has waited. Futures that are not done yet (or were skipped at the
+    deadline) are cancelled and replaced by the analytical fallback
+    prediction.
+    """
+    results = []
+    for future in futures:
+        result = future.result() if future.done() else None
+        if result is None:
+            future.cancel()
+            pred = fallback_prediction(
+                traffic_data, objective, f"Model did not respond within {deadline}s"
+            )
+            result = (pred, deadline)
+        results.append(result)
+    return results
+
+
+def _query_models(predictors, traffic_data, vehicle_type, objective, deadline=PREDICT_DEADLINE):
+    """
+    Run every predictor at the same time and wait at most `deadline`
+    seconds overall. A predictor that misses the deadline is replaced
+    by the analytical fallback prediction.
+
+    Returns a list of (prediction, response_time) in predictor order.
+    """
+    deadline_at = time.monotonic() + deadline
+    futures = _submit_models(predictors, traffic_data, vehicle_type, objective, deadline_at)
+    _wait_models(futures, deadline_at)
+    return _model_results(futures, traffic_data, objective, deadline)
+
+
+PREDICTORS = [generate_prediction, generate_groq_prediction]
+
+
+class PredictRequest(ScenarioRequest):
+    vehicle_type: str = "car"         # car | ambulance
+    objective: str = "fast"           # fast | safe
+    horizon: str = "peak"             # peak | run (averages over the whole run)
+
+
+def _validate_predict(req):
+    """Raise a 400 if any /predict field is not a known option."""
+    _validate_scenario(req)
     if req.vehicle_type not in ("car", "ambulance"):
         raise HTTPException(400, "vehicle_type must be 'car' or 'ambulance'")
     if req.objective not in ("fast", "safe"):
         raise HTTPException(400, "objective must be 'fast' or 'safe'")
+    if req.horizon not in ("peak", "run"):
+        raise HTTPException(400, "horizon must be 'peak' or 'run'")
+    if req.horizon == "run":
+        _check_buffered_size(req)
 
-    # Step 1: Run SUMO simulation (once, shared by both models)
-    route_xml, duration = generate_scenario(
-        density=req.density,
-        vehicle_mix=req.vehicle_mix,
-        pattern=req.pattern,
-        seed=req.seed,
-    )
-    steps = run_full_simulation(route_xml=route_xml, duration=duration)
 
-    if not steps:
-        raise HTTPException(500, "Simulation produced no data")
+def _traffic_snapshot(req, recorder=None):
+    """
+    The traffic data the models see: the peak step (SUMO only runs up to
+    it), or for horizon=run the whole run averaged per edge. None if the
+    simulation produced no data.
+    """
+    if req.horizon == "run":
+        steps, run_id = _simulate_scenario(req, recorder)
+        return _run_arrays(steps, run_id).mean_snapshot() if steps else None
+    return _peak_snapshot(req, recorder)
 
-    peak_step = max(steps, key=lambda s: s["stats"]["active_vehicles"])
 
-    # Step 2: Get analytical best route (ground truth for accuracy check)
+def _prediction_response(req, peak_step, model_a, model_b):
+    """Validate both predictions and build the /predict response body."""
+    pred_a, time_a = model_a
+    pred_b, time_b = model_b
+
+    # Analytical best route (ground truth for accuracy check)
     route_stats = _calc_route_stats(peak_step.get("edges", []))
     analytical_best = _pick_best_route(route_stats, req.objective)
 
-    # Step 3: Query Model A - Qwen3 32B (Groq API)
-    t0 = time.time()
-    pred_a = generate_prediction(
-        traffic_data=peak_step,
-        vehicle_type=req.vehicle_type,
-        objective=req.objective,
-    )
-    time_a = round(time.time() - t0, 2)
+    # Validate both
+    with Span("validate"):
+        val_a = validate_prediction(pred_a)
+        val_b = validate_prediction(pred_b)
 
-    # Step 4: Query Model B - Llama 3.1 8B (Groq API)
-    t0 = time.time()
-    pred_b = generate_groq_prediction(
-        traffic_data=peak_step,
-        vehicle_type=req.vehicle_type,
-        objective=req.objective,
-    )
-    time_b = round(time.time() - t0, 2)
-
-    # Step 5: Validate both
-    val_a = validate_prediction(pred_a)
-    val_b = validate_prediction(pred_b)
-
-    # Step 6: Build comparison metrics
+    # Build comparison metrics
     # Normalize recommended route for comparison
     route_a = val_a["prediction"].get("recommended_route", "")
     route_b = val_b["prediction"].get("recommended_route", "")
@@ -216,6 +649,216 @@ def predict(req: PredictRequest):
     }
 
 
+@app.post("/predict")
+def predict(req: PredictRequest):
+    """
+    Run simulation -> collect traffic data -> send to BOTH models -> compare -> return.
+    """
+    _validate_predict(req)
+    return _predict_response(req)
+
+
+def _predict_response(req, recorder=None):
+    """Build the /predict response body (req already validated)."""
+    # Step 1: Run SUMO simulation up to its peak (once, shared by both models)
+    peak_step = _traffic_snapshot(req, recorder)
+
+    if not peak_step:
+        raise HTTPException(500, "Simulation produced no data")
+
+    # Step 2: Query Model A (Qwen3 32B) and Model B (Llama 3.1 8B) concurrently
+    model_a, model_b = _query_models(PREDICTORS, peak_step, req.vehicle_type, req.objective)
+
+    # Step 3: Validate, compare against the analytical best route and respond
+    return _prediction_response(req, peak_step, model_a, model_b)
+
+
+class BatchPredictRequest(BaseModel):
+    items: List[PredictRequest]
+
+
+@app.post("/predict/batch")
+def predict_batch(req: BatchPredictRequest):
+    """
+    Run many /predict combinations (e.g. car vs ambulance, fast vs safe
+    on the same scenario) in one call.
+
+    Items that share a scenario share one simulation; the unique
+    simulations run in parallel, then every unique (snapshot,
+    vehicle_type, objective) prediction is sent to both models at once
+    through the shared model executor, so LLM_CONCURRENCY bounds the
+    calls in flight across all requests. The whole batch gets one
+    PREDICT_DEADLINE. Results come back in item order; an item whose
+    simulation produced no data gets {"error": ...}.
+    """
+    if not req.items:
+        raise HTTPException(400, "items must not be empty")
+    if len(req.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(400, f"At most {MAX_BATCH_ITEMS} items per batch")
+    for item in req.items:
+        _validate_predict(item)
+
+    # Unique simulations, in parallel
+    sim_keys = [
+        json.dumps(dict(_scenario_params(item), horizon=item.horizon), sort_keys=True)
+        for item in req.items
+    ]
+    sims = {}
+    for key, item in zip(sim_keys, req.items):
+        if key not in sims:
+            sims[key] = submit(BATCH_EXECUTOR, _traffic_snapshot, item)
+    snapshots = {key: future.result() for key, future in sims.items()}
+
+    # Unique predictions, all submitted before waiting on any, under one deadline
+    pred_keys = [(key, item.vehicle_type, item.objective) for key, item in zip(sim_keys, req.items)]
+    deadline_at = time.monotonic() + PREDICT_DEADLINE
+    pending = {}
+    for pkey, item in zip(pred_keys, req.items):
+        snapshot = snapshots[pkey[0]]
+        if snapshot and pkey not in pending:
+            pending[pkey] = _submit_models(PREDICTORS, snapshot, item.vehicle_type, item.objective, deadline_at)
+    _wait_models([f for futures in pending.values() for f in futures], deadline_at)
+
+    results = []
+    for pkey, item in zip(pred_keys, req.items):
+        snapshot = snapshots[pkey[0]]
+        if not snapshot:
+            results.append({"error": "Simulation produced no data"})
+            continue
+        model_a, model_b = _model_results(pending[pkey], snapshot, item.objective)
+        results.append(_prediction_response(item, snapshot, model_a, model_b))
+
+    return {
+        "results": results,
+        "summary": {
+            "items": len(req.items),
+            "simulations": len(sims),
+            "predictions": len(pending),
+        },
+    }
+
+
+# ── What-if forks ────────────────────────────────────────────
+
+class WhatIfRequest(ScenarioRequest):
+    vehicle_type: str = "car"         # car | ambulance
+    objective: str = "fast"           # fast | safe
+    at: int                           # simulation second to fork at
+    # e.g. {"type": "close_edge", "edge_id": "J4_J5"} or
+    # {"type": "add_vehicle", "vehicle_id": "amb1", "route": "highway_direct", "vehicle_type": "car"}
+    modifications: List[dict] = []
+
+
+def _what_if_modifications(req):
+    """Validate a /whatif request and return its modifications, as a 400 on bad input."""
+    _validate_scenario(req)
+    if req.vehicle_type not in ("car", "ambulance"):
+        raise HTTPException(400, "vehicle_type must be 'car' or 'ambulance'")
+    if req.objective not in ("fast", "safe"):
+        raise HTTPException(400, "objective must be 'fast' or 'safe'")
+    if SIM_POOL.backend == "replay":
+        raise HTTPException(400, "What-if runs need the sumo or fake backend")
+    _, duration = _scenario_size(req)
+    if not 1 <= req.at < duration:
+        raise HTTPException(400, f"at must be between 1 and {duration - 1}")
+    try:
+        mods = [modification(spec) for spec in req.modifications]
+        check_modifications(mods, load_network())
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return mods
+
+
+@app.post("/whatif")
+def what_if(req: WhatIfRequest):
+    """
+    Fork the scenario at `at` seconds, apply the modifications and
+    predict on the peak step of the rest of the run.
+
+    The state at `at` is saved once per scenario (see traci/snapshot.py),
+    so further what-ifs at the same time only simulate the remaining
+    horizon.
+    """
+    mods = _what_if_modifications(req)
+    with _scenario_file(req) as (route_file, params, digest):
+        try:
+            steps = SIM_POOL.call(
+                run_what_if,
+                store=SNAPSHOTS,
+                key=_run_key(params, digest),
+                time=req.at,
+                modifications=mods,
+                route_file=route_file,
+                duration=params["duration"],
+            )
+        except ModificationError as e:
+            raise HTTPException(400, str(e))
+    if not steps:
+        raise HTTPException(500, "Simulation produced no data")
+
+    peak_step = max(steps, key=lambda s: s["stats"]["active_vehicles"])
+    model_a, model_b = _query_models(PREDICTORS, peak_step, req.vehicle_type, req.objective)
+    return dict(
+        _prediction_response(req, peak_step, model_a, model_b),
+        what_if={
+            "at": req.at,
+            "modifications": [mod.to_dict() for mod in mods],
+            "steps": len(steps),
+        },
+    )
+
+
+# ── Background jobs ───────────────────────────────────────────
+
+def _submit_job(kind, fn, req):
+    """Queue fn(job) on the job queue; 429 with Retry-After when it is full."""
+    _, duration = _scenario_size(req)
+    try:
+        job = JOB_QUEUE.submit(kind, fn, duration=duration)
+    except JobQueueFull as e:
+        raise HTTPException(429, f"Too many pending jobs ({e}); retry later",
+                            headers={"Retry-After": str(JOB_RETRY_AFTER)})
+    return job.to_dict(include_result=False)
+
+
+@app.post("/jobs/simulate", status_code=202)
+def submit_simulation_job(req: SimulateRequest, format: str = "rows"):
+    """Queue a /simulate run; poll GET /jobs/{job_id} for progress and the result."""
+    collect = _validate_simulate(req, format)
+    return _submit_job("simulate", lambda job: _simulate_response(req, collect, format, recorder=job), req)
+
+
+@app.post("/jobs/predict", status_code=202)
+def submit_prediction_job(req: PredictRequest):
+    """Queue a /predict call; poll GET /jobs/{job_id} for progress and the result."""
+    _validate_predict(req)
+    return _submit_job("predict", lambda job: _predict_response(req, recorder=job), req)
+
+
+@app.get("/jobs")
+def job_stats():
+    """Queue depth, limits and job counts by status."""
+    return JOB_QUEUE.stats()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status, progress (simulated time / duration) and, once done, the result."""
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    return FastJSONResponse(job.to_dict())
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Cancel a job. A running simulation stops at its next step."""
+    job = JOB_QUEUE.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    return job.to_dict(include_result=False)
+
+
 # --- Serve frontend static files (production) ---
 FRONTEND_DIR = Path(__file__).resolve().parent.parent.parent / "frontend" / "dist"
 
@@ -0,0 +1,251 @@
+"""
+Timing spans and Prometheus metrics.
+
+Every phase of a request - scenario generation, simulation start,
+each simulation step and its TraCI collection, each model call,
+validation and JSON encoding - is timed with a Span. A span feeds
+the genvanet_phase_seconds histogram (one series per phase) and,
+when the request is being timed (see start_timings), that request's
+Server-Timing header.
+
+Counters and histograms are kept in-process and rendered in the
+Prometheus text format by render() for GET /metrics. Callback metrics
+read their values at scrape time from objects that already count
+(e.g. the result caches), so nothing is counted twice.
+
+Request timings live in a context variable. Work handed to a thread
+pool only reports into the request's timings if it was submitted
+with submit() (which carries the context over).
+"""
+
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Add a Server-Timing header with per-phase totals to every response
+SERVER_TIMING = os.environ.get("GENVANET_SERVER_TIMING", "") not in ("", "0", "false")
+
+# Seconds; per-step phases are sub-millisecond, model calls take seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Metrics in registration order, rendered by render()
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count, one series per label value tuple."""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in sorted(self._values.items())]
+
+
+class CallbackCounter(Counter):
+    """A counter whose values come from fn() -> {label values: value} at scrape time."""
+
+    def __init__(self, name, help, labelnames, fn, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self._fn = fn
+
+    def inc(self, labels=(), amount=1):
+        raise TypeError(f"{self.name} is read from a callback")
+
+    def value(self, labels=()):
+        return self._fn().get(labels, 0)
+
+    def samples(self):
+        return [(self.name, labels, value) for labels, value in sorted(self._fn().items())]
+
+
+class Histogram:
+    """Bucketed observations (seconds), one series per label value tuple."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value, labels=()):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def count(self, labels=()):
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        out = []
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                out.append((self.name + "_bucket", labels + (_number(float(bound)),), cumulative))
+            out.append((self.name + "_sum", labels, total))
+            out.append((self.name + "_count", labels, cumulative))
+        return out
+
+
+def render(registry=REGISTRY):
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            names = metric.labelnames
+            if name.endswith("_bucket"):
+                names += ("le",)
+            lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ── Shared metrics ────────────────────────────────────────────
+
+PHASE_SECONDS = Histogram(
+    "genvanet_phase_seconds", "Time spent per request phase", ("phase",),
+)
+LLM_SECONDS = Histogram(
+    "genvanet_llm_request_seconds", "Model API round trips (cache hits excluded)", ("model",),
+)
+RUNS = Counter("genvanet_simulation_runs_total", "Simulation sessions started", ("backend",))
+STEPS = Counter("genvanet_simulation_steps_total", "Simulation steps taken", ("backend",))
+VEHICLES = Counter("genvanet_simulated_vehicles_total", "Vehicles departed in simulations", ("backend",))
+SUMO_STARTS = Counter(
+    "genvanet_sumo_process_starts_total", "SUMO processes started by the warm pool, by reason", ("reason",),
+)
+SUMO_RELOADS = Counter("genvanet_sumo_reloads_total", "Runs served by reloading a warm SUMO process")
+LLM_REQUESTS = Counter(
+    "genvanet_llm_requests_total", "Model queries by outcome (ok, error, rate_limited, circuit_open, cached)",
+    ("model", "outcome"),
+)
+LLM_EARLY_CLOSES = Counter(
+    "genvanet_llm_early_closes_total", "Streamed model replies closed as soon as every field was parsed", ("model",),
+)
+LLM_RETRIES = Counter(
+    "genvanet_llm_retries_total", "Model API attempts retried, by cause (HTTP status, timeout, connection)",
+    ("model", "reason"),
+)
+
+
+# ── Spans and request timings ─────────────────────────────────
+
+_timings = contextvars.ContextVar("genvanet_timings", default=None)
+
+
+class Timings:
+    """Per-phase totals for one request, for its Server-Timing header."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            total = self._phases.get(phase)
+            self._phases[phase] = (total[0] + seconds, total[1] + 1) if total else (seconds, 1)
+
+    def phases(self):
+        """phase -> (total seconds, count), in the order phases first ran."""
+        with self._lock:
+            return dict(self._phases)
+
+    def header(self):
+        """Server-Timing value: one entry per phase plus the request total, in ms."""
+        parts = []
+        for phase, (seconds, count) in self.phases().items():
+            desc = f';desc="{count}x"' if count > 1 else ""
+            parts.append(f"{phase};dur={seconds * 1000:.2f}{desc}")
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.2f}")
+        return ", ".join(parts)
+
+
+def start_timings():
+    """Start collecting spans for the current request (context); returns its Timings."""
+    timings = Timings()
+    _timings.set(timings)
+    return timings
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit that keeps the caller's context, so spans in fn reach its Timings."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class Span:
+    """
+    Times a block as one phase:
+
+        with Span("collect"):
+            ...
+
+    `elapsed` holds the duration (seconds) after the block.
+    """
+
+    __slots__ = ("phase", "elapsed", "_t0")
+
+    def __init__(self, phase):
+        self.phase = phase
+        self.elapsed = None
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._t0
+        PHASE_SECONDS.observe(self.elapsed, (self.phase,))
+        timings = _timings.get()
+        if timings is not None:
+            timings.add(self.phase, self.elapsed)
@@ -0,0 +1,247 @@
+"""
+Fast JSON encoding and response compression.
+
+FastAPI turns an endpoint's return value into plain Python with
+jsonable_encoder (a recursive walk over every value) and then encodes
+it with the stdlib json module. For a /simulate body of several
+thousand steps both passes cost more than collecting the data did.
+FastJSONResponse encodes with orjson instead, and endpoints that
+return large bodies build it themselves, which skips jsonable_encoder
+entirely (their bodies are already plain dicts, lists and numbers).
+Without orjson installed the stdlib encoder is used.
+
+CompressionMiddleware negotiates Accept-Encoding: brotli when the
+client accepts it and the brotli package is installed, gzip otherwise,
+for bodies of at least COMPRESS_MIN_BYTES. Streamed responses are
+compressed chunk by chunk and flushed after each one, so NDJSON steps
+still reach the client as they are produced. It only relies on
+Starlette's public Headers classes, not on its GZipMiddleware
+internals.
+
+Measure both with python -m backend.bench.encoding.
+"""
+
+import json
+import os
+import zlib
+
+import anyio.to_thread
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+from .metrics import Span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smallest body worth compressing (bytes)
+COMPRESS_MIN_BYTES = int(os.environ.get("GENVANET_COMPRESS_MIN_BYTES", "1024"))
+# gzip level 1-9 and brotli quality 0-11; higher is smaller but slower
+GZIP_LEVEL = int(os.environ.get("GENVANET_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("GENVANET_BROTLI_QUALITY", "4"))
+
+# Chunks at least this big are compressed off the event loop
+THREAD_MIN_BYTES = 128 * 1024
+
+
+def dumps(content):
+    """Encode plain Python data (dicts, lists, str, numbers, None) as UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded with dumps(), timed as the "encode" phase.
+
+    Returning one from an endpoint skips jsonable_encoder, so the
+    content must already be plain JSON-compatible data.
+    """
+
+    def render(self, content):
+        with Span("encode"):
+            return dumps(content)
+
+
+# ── Compression ───────────────────────────────────────────────
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding):
+    """
+    The ENCODINGS entry to use for an Accept-Encoding header, or None.
+
+    Highest q-value wins; ties go to the order of ENCODINGS (brotli
+    first). "*" stands for every encoding not listed by name.
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            weights[name.strip()] = q
+
+    best = None
+    best_q = 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+# Already compressed, or must reach the client unbuffered
+UNCOMPRESSED_TYPES = ("text/event-stream", "application/gzip", "application/zip", "image/", "audio/", "video/")
+
+
+class CompressingResponder:
+    """
+    Wraps one response's ASGI send and compresses its body with
+    compress_chunk(). Subclasses set content_encoding and implement
+    compress_chunk(body, more_body), which flushes (more_body=True) or
+    finishes the stream.
+    """
+
+    content_encoding = None
+
+    def __init__(self, app, minimum_size):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start = None
+        self.compressing = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            # Held back until the first body chunk decides the headers
+            self.start = message
+            return
+        if kind != "http.response.body":
+            if self.start is not None:
+                await self.send(self.start)
+                self.start = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressing is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            self.compressing = (
+                (len(body) >= self.minimum_size or more_body)
+                and "content-encoding" not in headers
+                and self.start["status"] != 206
+                and not headers.get("content-type", "").startswith(UNCOMPRESSED_TYPES)
+            )
+            if self.compressing:
+                headers["Content-Encoding"] = self.content_encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                body = await self._compress(body, more_body)
+                if not more_body:
+                    headers["Content-Length"] = str(len(body))
+                message = dict(message, body=body)
+            await self.send(self.start)
+            self.start = None
+        elif self.compressing:
+            message = dict(message, body=await self._compress(body, more_body))
+        await self.send(message)
+
+    async def _compress(self, body, more_body):
+        # Big chunks are compressed off the event loop
+        if len(body) >= THREAD_MIN_BYTES:
+            return await anyio.to_thread.run_sync(self._timed_compress, body, more_body)
+        return self._timed_compress(body, more_body)
+
+    def _timed_compress(self, body, more_body):
+        with Span("compress"):
+            return self.compress_chunk(body, more_body)
+
+    def compress_chunk(self, body, more_body):
+        raise NotImplementedError
+
+
+class GzipResponder(CompressingResponder):
+
+    content_encoding = "gzip"
+
+    def __init__(self, app, minimum_size, level=GZIP_LEVEL):
+        super().__init__(app, minimum_size)
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress_chunk(self, body, more_body):
+        out = self._compressor.compress(body)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class BrotliResponder(CompressingResponder):
+
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size, quality=BROTLI_QUALITY):
+        super().__init__(app, minimum_size)
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def compress_chunk(self, body, more_body):
+        out = self._compressor.process(body)
+        return out + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the encoding negotiated by choose_encoding
+    (see module docstring). Small bodies, and responses that already
+    set Content-Encoding, are sent as they are.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES, gzip_level=GZIP_LEVEL,
+                 brotli_quality=BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+        if encoding == "br":
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif encoding == "gzip":
+            responder = GzipResponder(self.app, self.minimum_size, level=self.gzip_level)
+        else:
+            await self.app(scope, receive, send)
+            return
+        await responder(scope, receive, send)
+
+
+def compress(body, encoding, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+    """Compress a whole body as the middleware would ("br" or "gzip")."""
+    if encoding == "br":
+        return brotli.compress(body, mode=brotli.MODE_TEXT, quality=brotli_quality)
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
@@ -0,0 +1,445 @@
+"""
+Memory-mapped columnar store for simulation runs.
+
+Each run is a directory of flat binary column files (native byte
+order, fixed width) plus a JSON file with the IDs and the string
+dictionary:
+
+    steps.time       f64  one value per step
+    steps.active     i32    "
+    steps.departed   i32    "
+    steps.arrived    i32    "
+    edges.count      i32  steps x edges, row-major (one row per step)
+    edges.speed      f64    "
+    edges.occupancy  f64    "
+    edges.waiting    f64    "
+    tls.phase        i32  steps x traffic lights, row-major
+    tls.state        i32  (string dictionary index)
+    tls.program      i32  (string dictionary index)
+    veh.offsets      i64  steps + 1; step i owns rows offsets[i]:offsets[i+1]
+    veh.id           i32  one row per vehicle per step (string dictionary index)
+    veh.type         i32  (string dictionary index)
+    veh.route        i32  (string dictionary index of the space-joined edges)
+    veh.road         i32  (string dictionary index)
+    veh.speed        f64
+    veh.x            f64
+    veh.y            f64
+    veh.lane_pos     f64
+    meta.json        {"steps", "edges", "traffic_lights", "strings"}
+
+RunWriter appends one step at a time (it works as a session recorder
+too), so a run is never held in memory as Python objects. StoredRun
+maps the files read-only; its slices are memoryviews onto the
+mapping, so a time range or one edge's series costs nothing to take.
+"""
+
+import array
+import atexit
+import bisect
+import contextlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+RUN_STORE_DIR = os.environ.get("GENVANET_RUN_STORE_DIR", "")
+# Stored runs kept mapped at once (each holds one file descriptor per column)
+RUN_STORE_OPEN = int(os.environ.get("GENVANET_RUN_STORE_OPEN", "16"))
+
+# column name -> array typecode
+COLUMNS = {
+    "steps.time": "d",
+    "steps.active": "i",
+    "steps.departed": "i",
+    "steps.arrived": "i",
+    "edges.count": "i",
+    "edges.speed": "d",
+    "edges.occupancy": "d",
+    "edges.waiting": "d",
+    "tls.phase": "i",
+    "tls.state": "i",
+    "tls.program": "i",
+    "veh.offsets": "q",
+    "veh.id": "i",
+    "veh.type": "i",
+    "veh.route": "i",
+    "veh.road": "i",
+    "veh.speed": "d",
+    "veh.x": "d",
+    "veh.y": "d",
+    "veh.lane_pos": "d",
+}
+
+# Public field names for edge series -> column
+EDGE_FIELDS = {
+    "vehicle_count": "edges.count",
+    "mean_speed": "edges.speed",
+    "occupancy": "edges.occupancy",
+    "waiting_time": "edges.waiting",
+}
+
+
+# ── Writing ───────────────────────────────────────────────────
+
+class RunWriter:
+    """
+    Appends row-format steps to a new run directory.
+
+    The edge and traffic light sets are fixed by the first step (every
+    step of a run reports the same ones). Files are written under a
+    temporary directory that is renamed into place on close(), so
+    readers never see a half-written run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.steps = 0
+        self.edge_ids = None
+        self.tls_ids = None
+        self._strings = []
+        self._string_index = {}
+        self._vehicle_rows = 0
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._tmp_dir = tempfile.mkdtemp(prefix=".run-", dir=parent)
+        self._files = {name: open(os.path.join(self._tmp_dir, name), "wb") for name in COLUMNS}
+        self._append("veh.offsets", [0])
+
+    def _intern(self, s):
+        i = self._string_index.get(s)
+        if i is None:
+            i = self._string_index[s] = len(self._strings)
+            self._strings.append(s)
+        return i
+
+    def _append(self, name, values):
+        array.array(COLUMNS[name], values).tofile(self._files[name])
+
+    def write(self, step):
+        if self.edge_ids is None:
+            self.edge_ids = [e["id"] for e in step["edges"]]
+            self.tls_ids = [t["id"] for t in step["traffic_lights"]]
+        if len(step["edges"]) != len(self.edge_ids) or len(step["traffic_lights"]) != len(self.tls_ids):
+            raise ValueError("Every step of a stored run must report the same edges and traffic lights")
+
+        self._append("steps.time", [step["time"]])
+        self._append("steps.active", [step["stats"]["active_vehicles"]])
+        self._append("steps.departed", [step["stats"]["departed"]])
+        self._append("steps.arrived", [step["stats"]["arrived"]])
+
+        edges = step["edges"]
+        self._append("edges.count", [e["vehicle_count"] for e in edges])
+        self._append("edges.speed", [e["mean_speed"] for e in edges])
+        self._append("edges.occupancy", [e["occupancy"] for e in edges])
+        self._append("edges.waiting", [e["waiting_time"] for e in edges])
+
+        tls = step["traffic_lights"]
+        self._append("tls.phase", [t["phase"] for t in tls])
+        self._append("tls.state", [self._intern(t["state"]) for t in tls])
+        self._append("tls.program", [self._intern(t["program"]) for t in tls])
+
+        vehicles = step["vehicles"]
+        self._append("veh.id", [self._intern(v["id"]) for v in vehicles])
+        self._append("veh.type", [self._intern(v["type"]) for v in vehicles])
+        self._append("veh.route", [self._intern(" ".join(v["route"])) for v in vehicles])
+        self._append("veh.road", [self._intern(v["road"]) for v in vehicles])
+        self._append("veh.speed", [v["speed"] for v in vehicles])
+        self._append("veh.x", [v["position"]["x"] for v in vehicles])
+        self._append("veh.y", [v["position"]["y"] for v in vehicles])
+        self._append("veh.lane_pos", [v["lane_position"] for v in vehicles])
+        self._vehicle_rows += len(vehicles)
+        self._append("veh.offsets", [self._vehicle_rows])
+
+        self.steps += 1
+
+    def close(self, keep=True):
+        """Finish the run; keep=False throws it away."""
+        if self._files is None:
+            return
+        for f in self._files.values():
+            f.close()
+        self._files = None
+        if not keep:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            return
+        with open(os.path.join(self._tmp_dir, "meta.json"), "w") as f:
+            json.dump({
+                "steps": self.steps,
+                "edges": self.edge_ids or [],
+                "traffic_lights": self.tls_ids or [],
+                "strings": self._strings,
+            }, f)
+        try:
+            os.rename(self._tmp_dir, self.path)
+        except OSError:
+            # Another writer stored the same run first
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(keep=exc_type is None)
+
+
+# ── Reading ───────────────────────────────────────────────────
+
+class StoredRun:
+    """
+    Read-only, memory-mapped view of a stored run.
+
+    column() and the slicing helpers return memoryviews onto the
+    mapped files (no copies), which stay valid after close(); the
+    files are unmapped once the last of them is released. close()
+    waits for reads in progress (step() etc.) to finish, and a closed
+    run maps its files again if it is read after all.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.steps = meta["steps"]
+        self.edge_ids = meta["edges"]
+        self.tls_ids = meta["traffic_lights"]
+        self.strings = meta["strings"]
+        self._edge_index = {eid: i for i, eid in enumerate(self.edge_ids)}
+        self._maps = []
+        self._mapped = None
+        self._map_lock = threading.Lock()
+        # Reads in progress; close() is deferred until the last one ends
+        self._readers = 0
+        self._close_pending = False
+        self._columns
+
+    @property
+    def _columns(self):
+        columns = self._mapped
+        if columns is None:
+            with self._map_lock:
+                columns = self._mapped
+                if columns is None:
+                    columns = self._mapped = {
+                        name: self._map(os.path.join(self.path, name), typecode)
+                        for name, typecode in COLUMNS.items()
+                    }
+        return columns
+
+    def _map(self, filename, typecode):
+        if os.path.getsize(filename) == 0:
+            # mmap refuses empty files
+            return memoryview(array.array(typecode))
+        with open(filename, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mm)
+        return memoryview(mm).cast(typecode)
+
+    @contextlib.contextmanager
+    def _reading(self):
+        """Keep the columns mapped (close() waits) while reading them."""
+        with self._map_lock:
+            self._readers += 1
+        try:
+            yield self._columns
+        finally:
+            with self._map_lock:
+                self._readers -= 1
+                close = not self._readers and self._close_pending
+            if close:
+                self.close()
+
+    def column(self, name):
+        """The whole column as a typed memoryview."""
+        with self._reading() as c:
+            return c[name][:]
+
+    def time_range(self, start=None, end=None):
+        """Step indices [i, j) whose time lies in [start, end)."""
+        with self._reading() as c:
+            times = c["steps.time"]
+            i = 0 if start is None else bisect.bisect_left(times, start)
+            j = self.steps if end is None else bisect.bisect_left(times, end)
+        return i, max(i, j)
+
+    def edge_series(self, edge_id, field, i=0, j=None):
+        """
+        One edge's values for `field` (see EDGE_FIELDS) over steps
+        [i, j), as a strided view into the steps x edges column.
+        """
+        ei = self._edge_index.get(edge_id)
+        if ei is None:
+            raise ValueError(f"Unknown edge: {edge_id}")
+        if field not in EDGE_FIELDS:
+            raise ValueError(f"Invalid field. Options: {list(EDGE_FIELDS)}")
+        n = len(self.edge_ids)
+        j = self.steps if j is None else j
+        with self._reading() as c:
+            return c[EDGE_FIELDS[field]][i * n + ei:j * n:n]
+
+    def edge_rows(self, field, i=0, j=None):
+        """All edges' values for `field` over steps [i, j), row-major and contiguous."""
+        n = len(self.edge_ids)
+        j = self.steps if j is None else j
+        with self._reading() as c:
+            return c[EDGE_FIELDS[field]][i * n:j * n]
+
+    def vehicle_rows(self, i=0, j=None):
+        """Contiguous vehicle column views covering steps [i, j)."""
+        j = self.steps if j is None else j
+        with self._reading() as c:
+            lo, hi = c["veh.offsets"][i], c["veh.offsets"][j]
+            return {
+                name[len("veh."):]: col[lo:hi]
+                for name, col in c.items()
+                if name.startswith("veh.") and name != "veh.offsets"
+            }
+
+    def step(self, i):
+        """Materialize step i in the row format traci.main produces."""
+        with self._reading() as c:
+            return self._step(i, c)
+
+    def _step(self, i, c):
+        s = self.strings
+        n_edges = len(self.edge_ids)
+        n_tls = len(self.tls_ids)
+        lo, hi = c["veh.offsets"][i], c["veh.offsets"][i + 1]
+        return {
+            "time": c["steps.time"][i],
+            "vehicles": [
+                {
+                    "id": s[c["veh.id"][r]],
+                    "speed": c["veh.speed"][r],
+                    "position": {"x": c["veh.x"][r], "y": c["veh.y"][r]},
+                    "road": s[c["veh.road"][r]],
+                    "lane_position": c["veh.lane_pos"][r],
+                    "route": s[c["veh.route"][r]].split(),
+                    "type": s[c["veh.type"][r]],
+                }
+                for r in range(lo, hi)
+            ],
+            "edges": [
+                {
+                    "id": eid,
+                    "vehicle_count": c["edges.count"][i * n_edges + k],
+                    "mean_speed": c["edges.speed"][i * n_edges + k],
+                    "occupancy": c["edges.occupancy"][i * n_edges + k],
+                    "waiting_time": c["edges.waiting"][i * n_edges + k],
+                }
+                for k, eid in enumerate(self.edge_ids)
+            ],
+            "traffic_lights": [
+                {
+                    "id": tlid,
+                    "phase": c["tls.phase"][i * n_tls + k],
+                    "state": s[c["tls.state"][i * n_tls + k]],
+                    "program": s[c["tls.program"][i * n_tls + k]],
+                }
+                for k, tlid in enumerate(self.tls_ids)
+            ],
+            "stats": {
+                "active_vehicles": c["steps.active"][i],
+                "departed": c["steps.departed"][i],
+                "arrived": c["steps.arrived"][i],
+            },
+        }
+
+    def iter_steps(self, i=0, j=None):
+        """Materialize steps [i, j) one at a time."""
+        for k in range(i, self.steps if j is None else j):
+            yield self.step(k)
+
+    def close(self):
+        """
+        Unmap the columns, once reads in progress have finished. Views
+        returned by column() and the slicing helpers stay valid; their
+        file stays mapped until the last of them is released.
+        """
+        with self._map_lock:
+            if self._readers:
+                self._close_pending = True
+                return
+            self._close_pending = False
+            columns, self._mapped = self._mapped or {}, None
+            maps, self._maps = self._maps, []
+        for col in columns.values():
+            try:
+                col.release()
+            except BufferError:
+                pass
+        for mm in maps:
+            try:
+                mm.close()
+            except BufferError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RunStore:
+    """
+    A directory of stored runs, one subdirectory per run ID.
+
+    At most max_open runs are kept mapped; the least recently opened
+    one is closed to make room.
+    """
+
+    def __init__(self, root, max_open=RUN_STORE_OPEN):
+        self.root = root
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, run_id):
+        if not run_id or not all(ch.isalnum() or ch in "-_" for ch in run_id):
+            raise ValueError(f"Invalid run ID: {run_id!r}")
+        return os.path.join(self.root, run_id)
+
+    def has(self, run_id):
+        return os.path.exists(os.path.join(self.path(run_id), "meta.json"))
+
+    def writer(self, run_id):
+        """RunWriter for a new run; use as a context manager."""
+        return RunWriter(self.path(run_id))
+
+    def open(self, run_id):
+        """
+        Return the StoredRun for run_id (None if it isn't stored).
+        Open runs are shared, so mappings are made once per run while
+        it stays among the max_open most recently used.
+        """
+        path = self.path(run_id)
+        evicted = []
+        with self._lock:
+            run = self._open.get(run_id)
+            if run is not None:
+                self._open.move_to_end(run_id)
+                return run
+            if not self.has(run_id):
+                return None
+            run = self._open[run_id] = StoredRun(path)
+            while len(self._open) > self.max_open:
+                evicted.append(self._open.popitem(last=False)[1])
+        for old in evicted:
+            old.close()
+        return run
+
+    def close(self):
+        """Close every open run."""
+        with self._lock:
+            runs, self._open = list(self._open.values()), OrderedDict()
+        for run in runs:
+            run.close()
+
+
+# Shared store used by the API (disabled unless a directory is configured)
+RUN_STORE = RunStore(RUN_STORE_DIR) if RUN_STORE_DIR else None
+if RUN_STORE is not None:
+    atexit.register(RUN_STORE.close)
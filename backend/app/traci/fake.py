@@ -0,0 +1,466 @@
+"""
+Fake TraCI backend for SUMO-free runs.
+
+FakeConnection speaks the subset of the TraCI connection API that
+traci/main.py uses (getters, subscriptions, simulationStep, close) on
+top of a small deterministic traffic model:
+
+    - vehicles depart at their route file time if the first edge has room
+    - speed on an edge = min(vType maxSpeed, lane speed), scaled down by
+      how full the edge is
+    - a vehicle that reaches the end of an edge waits there until the
+      next edge has room; waiting time accumulates like SUMO's
+    - traffic lights cycle through the programs in the network file
+    - a lane closed with lane.setDisallowed(..., ["all"]) closes its
+      whole edge: nothing enters it (there is no router, so vehicles
+      routed over it wait in front of it)
+    - saveState/loadState pickle the traffic model (see snapshot.py)
+
+It is not SUMO, but it produces the same step shapes with realistic
+sizes and orders of magnitude, which is what benchmarks and load tests
+need. Use FakeSession wherever a SimulationSession is accepted.
+"""
+
+import os
+import pickle
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+
+import traci
+import traci.constants as tc
+
+from .main import SimulationSession
+from .network import BASE_DIR
+
+DEFAULT_ROUTE_FILE = os.path.join(BASE_DIR, "genvanet.rou.xml")
+
+CAR_SPACING = 7.5     # metres of lane per vehicle at jam density
+MIN_SPEED_SHARE = 0.1 # crawl speed (share of free speed) on a full edge
+DEFAULT_EDGE = {"length": 100.0, "speed": 13.89, "lanes": 1, "from": None, "to": None}
+
+
+class _FakeVehicle:
+    __slots__ = ("id", "type", "route", "depart", "length", "max_speed",
+                 "edge_index", "pos", "speed", "waiting")
+
+    def __init__(self, vid, vtype, route, depart, length, max_speed):
+        self.id = vid
+        self.type = vtype
+        self.route = route
+        self.depart = depart
+        self.length = length
+        self.max_speed = max_speed
+        self.edge_index = 0
+        self.pos = 0.0
+        self.speed = 0.0
+        self.waiting = 0.0
+
+    @property
+    def edge(self):
+        return self.route[self.edge_index]
+
+
+def _read_routes(route_file, vtypes):
+    """
+    Parse a route file into a departure-ordered list of _FakeVehicle;
+    vehicle types found are added to `vtypes` (id -> (length, maxSpeed)).
+    """
+    routes = {}
+    vehicles = []
+    for _, elem in ET.iterparse(route_file):
+        if elem.tag == "vType":
+            vtypes[elem.get("id")] = (
+                float(elem.get("length", 5)),
+                float(elem.get("maxSpeed", 13.89)),
+            )
+        elif elem.tag == "route" and elem.get("id"):
+            routes[elem.get("id")] = tuple(elem.get("edges").split())
+        elif elem.tag == "vehicle":
+            vtype = elem.get("type", "DEFAULT_VEHTYPE")
+            length, max_speed = vtypes.get(vtype, (5.0, 13.89))
+            vehicles.append(_FakeVehicle(
+                elem.get("id"), vtype, routes[elem.get("route")],
+                float(elem.get("depart", 0)), length, max_speed,
+            ))
+            elem.clear()
+    vehicles.sort(key=lambda v: v.depart)
+    return vehicles
+
+
+class _Domain:
+    """Shared subscription bookkeeping for one TraCI domain."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._subs = {}
+
+    def subscribe(self, object_id, var_ids):
+        self._conn.calls += 1
+        self._subs[object_id] = tuple(var_ids)
+
+    def getAllSubscriptionResults(self):
+        return {
+            oid: {var: self._value(oid, var) for var in var_ids}
+            for oid, var_ids in self._subs.items()
+            if self._exists(oid)
+        }
+
+    def _exists(self, object_id):
+        return True
+
+    def _get(self, object_id, var):
+        self._conn.calls += 1
+        return self._value(object_id, var)
+
+
+class _VehicleDomain(_Domain):
+
+    def getIDList(self):
+        self._conn.calls += 1
+        return tuple(self._conn.active)
+
+    def getIDCount(self):
+        self._conn.calls += 1
+        return len(self._conn.active)
+
+    def getPosition(self, vid):
+        return self._get(vid, tc.VAR_POSITION)
+
+    def getSpeed(self, vid):
+        return self._get(vid, tc.VAR_SPEED)
+
+    def getRoadID(self, vid):
+        return self._get(vid, tc.VAR_ROAD_ID)
+
+    def getLanePosition(self, vid):
+        return self._get(vid, tc.VAR_LANEPOSITION)
+
+    def getRoute(self, vid):
+        return self._get(vid, tc.VAR_EDGES)
+
+    def getTypeID(self, vid):
+        return self._get(vid, tc.VAR_TYPE)
+
+    def add(self, vehID, routeID, typeID="DEFAULT_VEHTYPE", depart="now", **_):
+        """Insert a vehicle on a route added with route.add (departs now)."""
+        self._conn.calls += 1
+        if vehID in self._conn.active or any(v.id == vehID for v in self._conn.added):
+            raise traci.TraCIException(f"The vehicle '{vehID}' to add already exists.")
+        if routeID not in self._conn.routes:
+            raise traci.TraCIException(f"Invalid route '{routeID}' for vehicle: '{vehID}'.")
+        length, max_speed = self._conn.vtypes.get(typeID, (5.0, 13.89))
+        self._conn.added.append(_FakeVehicle(
+            vehID, typeID, self._conn.routes[routeID], self._conn.time, length, max_speed,
+        ))
+
+    def rerouteTraveltime(self, vehID, currentTravelTimes=True):
+        # No router in the fake model; closed edges simply block
+        self._conn.calls += 1
+
+    def _exists(self, vid):
+        return vid in self._conn.active
+
+    def getAllSubscriptionResults(self):
+        # SUMO drops vehicle subscriptions on arrival
+        for vid in [v for v in self._subs if v not in self._conn.active]:
+            del self._subs[vid]
+        return super().getAllSubscriptionResults()
+
+    def _value(self, vid, var):
+        v = self._conn.active[vid]
+        if var == tc.VAR_POSITION:
+            return self._conn.position(v)
+        if var == tc.VAR_SPEED:
+            return v.speed
+        if var == tc.VAR_ROAD_ID:
+            return v.edge
+        if var == tc.VAR_LANEPOSITION:
+            return v.pos
+        if var == tc.VAR_EDGES:
+            return v.route
+        if var == tc.VAR_TYPE:
+            return v.type
+        raise ValueError(f"Unsupported vehicle variable {var:#x}")
+
+
+class _EdgeDomain(_Domain):
+
+    def getIDList(self):
+        self._conn.calls += 1
+        return tuple(self._conn.network.edge_ids)
+
+    def getLastStepVehicleNumber(self, eid):
+        return self._get(eid, tc.LAST_STEP_VEHICLE_NUMBER)
+
+    def getLastStepMeanSpeed(self, eid):
+        return self._get(eid, tc.LAST_STEP_MEAN_SPEED)
+
+    def getLastStepOccupancy(self, eid):
+        return self._get(eid, tc.LAST_STEP_OCCUPANCY)
+
+    def getWaitingTime(self, eid):
+        return self._get(eid, tc.VAR_WAITING_TIME)
+
+    def _value(self, eid, var):
+        on_edge = self._conn.on_edge.get(eid, ())
+        info = self._conn.network.edges.get(eid, DEFAULT_EDGE)
+        if var == tc.LAST_STEP_VEHICLE_NUMBER:
+            return len(on_edge)
+        if var == tc.LAST_STEP_MEAN_SPEED:
+            # SUMO reports the speed limit for an empty edge
+            return sum(v.speed for v in on_edge) / len(on_edge) if on_edge else info["speed"]
+        if var == tc.LAST_STEP_OCCUPANCY:
+            lane_metres = info["length"] * max(info["lanes"], 1)
+            return min(100.0, 100.0 * sum(v.length for v in on_edge) / lane_metres)
+        if var == tc.VAR_WAITING_TIME:
+            return sum(v.waiting for v in on_edge)
+        raise ValueError(f"Unsupported edge variable {var:#x}")
+
+
+class _TrafficLightDomain(_Domain):
+
+    def getIDList(self):
+        self._conn.calls += 1
+        return tuple(self._conn.network.tls_ids)
+
+    def getPhase(self, tlid):
+        return self._get(tlid, tc.TL_CURRENT_PHASE)
+
+    def getRedYellowGreenState(self, tlid):
+        return self._get(tlid, tc.TL_RED_YELLOW_GREEN_STATE)
+
+    def getProgram(self, tlid):
+        return self._get(tlid, tc.TL_CURRENT_PROGRAM)
+
+    def _phase(self, tlid):
+        phases = self._conn.network.tls[tlid]["phases"]
+        cycle = sum(p["duration"] for p in phases)
+        t = self._conn.time % cycle if cycle else 0
+        for i, p in enumerate(phases):
+            if t < p["duration"]:
+                return i, p["state"]
+            t -= p["duration"]
+        return 0, phases[0]["state"]
+
+    def _value(self, tlid, var):
+        if var == tc.TL_CURRENT_PHASE:
+            return self._phase(tlid)[0]
+        if var == tc.TL_RED_YELLOW_GREEN_STATE:
+            return self._phase(tlid)[1]
+        if var == tc.TL_CURRENT_PROGRAM:
+            return self._conn.network.tls[tlid]["program"]
+        raise ValueError(f"Unsupported traffic light variable {var:#x}")
+
+
+class _RouteDomain(_Domain):
+
+    def add(self, routeID, edges):
+        self._conn.calls += 1
+        if routeID in self._conn.routes:
+            raise traci.TraCIException(f"Could not add route '{routeID}'.")
+        self._conn.routes[routeID] = tuple(edges)
+
+
+class _LaneDomain(_Domain):
+
+    def setDisallowed(self, laneID, disallowedClasses):
+        self._conn.calls += 1
+        edge = laneID.rsplit("_", 1)[0]
+        if "all" in disallowedClasses:
+            self._conn.closed.add(edge)
+        else:
+            self._conn.closed.discard(edge)
+
+
+class _SimulationDomain(_Domain):
+
+    def getTime(self):
+        return self._get("", tc.VAR_TIME)
+
+    def getDepartedNumber(self):
+        return self._get("", tc.VAR_DEPARTED_VEHICLES_NUMBER)
+
+    def getArrivedNumber(self):
+        return self._get("", tc.VAR_ARRIVED_VEHICLES_NUMBER)
+
+    def subscribe(self, var_ids):
+        super().subscribe("", var_ids)
+
+    def getSubscriptionResults(self):
+        return self.getAllSubscriptionResults().get("", {})
+
+    def saveState(self, fileName):
+        self._conn.calls += 1
+        with open(fileName, "wb") as f:
+            pickle.dump(self._conn.state(), f)
+
+    def loadState(self, fileName):
+        self._conn.calls += 1
+        with open(fileName, "rb") as f:
+            self._conn.restore(pickle.load(f))
+
+    def _value(self, _, var):
+        if var == tc.VAR_TIME:
+            return self._conn.time
+        if var == tc.VAR_DEPARTED_VEHICLES_NUMBER:
+            return len(self._conn.departed_ids)
+        if var == tc.VAR_DEPARTED_VEHICLES_IDS:
+            return tuple(self._conn.departed_ids)
+        if var == tc.VAR_ARRIVED_VEHICLES_NUMBER:
+            return self._conn.arrived
+        raise ValueError(f"Unsupported simulation variable {var:#x}")
+
+
+class FakeConnection:
+    """
+    In-process stand-in for a traci Connection.
+
+    `calls` counts API calls the way round-trips would be counted
+    against a real SUMO (simulationStep and every getter/subscribe).
+    """
+
+    def __init__(self, route_file, network, end_time=None):
+        self.network = network
+        self.end_time = end_time
+        self.time = 0.0
+        self.calls = 0
+        self.vtypes = {}
+        self.routes = {}
+        self.pending = _read_routes(route_file, self.vtypes)
+        self._next_pending = 0
+        self.added = []
+        self.closed = set()
+        self.active = {}
+        self.on_edge = {}
+        self.departed_ids = []
+        self.arrived = 0
+
+        self.vehicle = _VehicleDomain(self)
+        self.edge = _EdgeDomain(self)
+        self.trafficlight = _TrafficLightDomain(self)
+        self.route = _RouteDomain(self)
+        self.lane = _LaneDomain(self)
+        self.simulation = _SimulationDomain(self)
+
+    def state(self):
+        """Everything simulationStep depends on, for saveState."""
+        return {
+            "time": self.time,
+            "pending": self.pending[self._next_pending:],
+            "added": self.added,
+            "closed": self.closed,
+            "routes": self.routes,
+            "active": self.active,
+        }
+
+    def restore(self, state):
+        """Inverse of state(). Like SUMO, vehicle subscriptions don't survive."""
+        self.time = state["time"]
+        self.pending = state["pending"]
+        self._next_pending = 0
+        self.added = state["added"]
+        self.closed = state["closed"]
+        self.routes = state["routes"]
+        self.active = state["active"]
+        self.vehicle._subs = {}
+        self.departed_ids = []
+        self.arrived = 0
+        self.on_edge = defaultdict(list)
+        for v in self.active.values():
+            self.on_edge[v.edge].append(v)
+
+    def _edge(self, eid):
+        return self.network.edges.get(eid, DEFAULT_EDGE)
+
+    def _capacity(self, eid):
+        if eid in self.closed:
+            return 0
+        info = self._edge(eid)
+        return max(1, int(info["length"] * max(info["lanes"], 1) / CAR_SPACING))
+
+    def position(self, v):
+        """Interpolate x/y along the straight line between the edge's junctions."""
+        info = self._edge(v.edge)
+        start = self.network.junctions.get(info["from"], (0.0, 0.0))
+        end = self.network.junctions.get(info["to"], start)
+        share = v.pos / info["length"] if info["length"] else 0.0
+        return (
+            start[0] + (end[0] - start[0]) * share,
+            start[1] + (end[1] - start[1]) * share,
+        )
+
+    def simulationStep(self):
+        self.calls += 1
+        self.time += 1.0
+        self.departed_ids = []
+        self.arrived = 0
+
+        counts = defaultdict(int)
+        for v in self.active.values():
+            counts[v.edge] += 1
+
+        # Move vehicles already in the network
+        for vid in list(self.active):
+            v = self.active[vid]
+            info = self._edge(v.edge)
+            fill = counts[v.edge] / max(self._capacity(v.edge), 1)
+            free_speed = min(v.max_speed, info["speed"])
+            v.speed = free_speed * max(MIN_SPEED_SHARE, 1.0 - fill)
+            v.pos += v.speed
+
+            if v.pos >= info["length"]:
+                if v.edge_index == len(v.route) - 1:
+                    counts[v.edge] -= 1
+                    del self.active[vid]
+                    self.arrived += 1
+                    continue
+                nxt = v.route[v.edge_index + 1]
+                if counts[nxt] < self._capacity(nxt):
+                    counts[v.edge] -= 1
+                    counts[nxt] += 1
+                    v.pos = min(v.pos - info["length"], self._edge(nxt)["length"])
+                    v.edge_index += 1
+                else:
+                    # Blocked at the end of the edge
+                    v.pos = info["length"]
+                    v.speed = 0.0
+
+            v.waiting = v.waiting + 1.0 if v.speed < 0.1 else 0.0
+
+        # Insert vehicles whose departure time has come (delayed if no room)
+        while self._next_pending < len(self.pending):
+            v = self.pending[self._next_pending]
+            if v.depart > self.time:
+                break
+            if counts[v.route[0]] >= self._capacity(v.route[0]):
+                break
+            counts[v.route[0]] += 1
+            self.active[v.id] = v
+            self.departed_ids.append(v.id)
+            self.pending[self._next_pending] = None
+            self._next_pending += 1
+
+        # Vehicles added through TraCI, in the order they were added
+        while self.added and counts[self.added[0].route[0]] < self._capacity(self.added[0].route[0]):
+            v = self.added.pop(0)
+            counts[v.route[0]] += 1
+            self.active[v.id] = v
+            self.departed_ids.append(v.id)
+
+        self.on_edge = defaultdict(list)
+        for v in self.active.values():
+            self.on_edge[v.edge].append(v)
+
+    def close(self, wait=True):
+        self.active = {}
+        self.pending = []
+
+
+class FakeSession(SimulationSession):
+    """SimulationSession backed by FakeConnection instead of a SUMO process."""
+
+    backend = "fake"
+
+    def _connect(self, cmd):
+        route_file = self.route_file or DEFAULT_ROUTE_FILE
+        return FakeConnection(route_file, self.network, end_time=self.duration)
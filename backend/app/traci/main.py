@@ -3,140 +3,741 @@ TraCI simulation manager.
 
 Handles starting/stopping SUMO and collecting per-step data.
 Can run with either the static .rou.xml or a dynamically generated scenario.
+
+Each run lives in its own SimulationSession, which owns a labeled TraCI
+connection and its own temp route file, so several runs can be in flight
+at once (see SimulationPool).
+
+Two collection modes are supported:
+    "poll"      - one TraCI getter call per attribute per object per step
+    "subscribe" - variable subscriptions; each step's snapshot arrives in the
+                  simulationStep response (plus one call per newly departed vehicle)
+
+Either way, CollectOptions can narrow a run to a stride, some sections,
+some attributes and some edges; only those are asked of TraCI.
 """
 
+import itertools
 import os
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import traci
+import traci.constants as tc
+
+from ..metrics import RUNS, STEPS, VEHICLES, Span, submit
+from .network import BASE_DIR, NET_FILE, load_network
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 SUMO_CFG = os.path.join(BASE_DIR, "genvanet.sumocfg")
-NET_FILE = os.path.join(BASE_DIR, "genvanet.net.xml")
 
-# Track temp file so we can clean up
-_temp_route_file = None
+COLLECT_MODES = ("poll", "subscribe")
+DEFAULT_COLLECT_MODE = "subscribe"
+
+# Which backend the shared pool runs: "sumo", "fake" (fake.py) or "replay" (replay.py)
+SIM_BACKENDS = ("sumo", "fake", "replay")
+SIM_BACKEND = os.environ.get("GENVANET_SIM_BACKEND", "sumo")
+
+# Max SUMO processes running at once (defaults to one per core)
+SIM_WORKERS = int(os.environ.get("GENVANET_SIM_WORKERS", "0")) or os.cpu_count() or 1
+
+# Keep SUMO processes alive between runs and reset them with traci.load (see warm.py)
+SUMO_WARM = os.environ.get("GENVANET_SUMO_WARM", "") not in ("", "0", "false")
+
+# Collectable fields and the TraCI variable behind each one
+VEHICLE_FIELD_VARS = {
+    "speed": tc.VAR_SPEED,
+    "position": tc.VAR_POSITION,
+    "road": tc.VAR_ROAD_ID,
+    "lane_position": tc.VAR_LANEPOSITION,
+    "route": tc.VAR_EDGES,
+    "type": tc.VAR_TYPE,
+}
+EDGE_FIELD_VARS = {
+    "vehicle_count": tc.LAST_STEP_VEHICLE_NUMBER,
+    "mean_speed": tc.LAST_STEP_MEAN_SPEED,
+    "occupancy": tc.LAST_STEP_OCCUPANCY,
+    "waiting_time": tc.VAR_WAITING_TIME,
+}
+TLS_FIELD_VARS = {
+    "phase": tc.TL_CURRENT_PHASE,
+    "state": tc.TL_RED_YELLOW_GREEN_STATE,
+    "program": tc.TL_CURRENT_PROGRAM,
+}
+SECTIONS = ("vehicles", "edges", "traffic_lights", "stats")
+
+# Variables subscribed per object in "subscribe" mode (everything)
+VEHICLE_VARS = tuple(VEHICLE_FIELD_VARS.values())
+EDGE_VARS = tuple(EDGE_FIELD_VARS.values())
+TLS_VARS = tuple(TLS_FIELD_VARS.values())
+SIM_VARS = (
+    tc.VAR_TIME, tc.VAR_DEPARTED_VEHICLES_NUMBER,
+    tc.VAR_ARRIVED_VEHICLES_NUMBER, tc.VAR_DEPARTED_VEHICLES_IDS,
+)
+
+# Unique TraCI connection labels, one per session
+_session_ids = itertools.count(1)
+
 
+# ── Collection options ────────────────────────────────────────
 
-def start_simulation(gui=False, route_xml=None, duration=300):
+class CollectOptions:
     """
-    Start SUMO via TraCI.
+    What to collect, and how often.
 
-    Args:
-        gui:       If True, open sumo-gui instead of headless sumo.
-        route_xml: If provided, write this XML string to a temp .rou.xml
-                   and use it instead of the default route file.
-        duration:  Simulation end time in seconds.
+    TraCI is only asked for what is selected here, in both collection
+    modes. "time" and "stats" are always collected since they drive
+    the run loop (early stop, peak detection).
     """
-    global _temp_route_file
 
-    sumo_binary = "sumo-gui" if gui else "sumo"
-    cmd = [sumo_binary, "--net-file", NET_FILE, "--start"]
+    def __init__(self, stride=1, sections=None, vehicle_fields=None, edge_fields=None,
+                 tls_fields=None, edges=None):
+        """
+        Args:
+            stride:         Collect every `stride` simulated seconds (SUMO
+                            still steps every second). departed/arrived
+                            are summed over the skipped steps, and the
+                            run's last step is always collected.
+            sections:       Which of SECTIONS to return (default: all;
+                            "stats" is always returned).
+            vehicle_fields: Vehicle attributes besides "id" (default: all
+                            of VEHICLE_FIELD_VARS).
+            edge_fields:    Edge attributes besides "id" (default: all).
+            tls_fields:     Traffic light attributes besides "id" (default: all).
+            edges:          Only report these edge IDs (default: every
+                            edge in the network index).
+        """
+        self.stride = stride
+        self.sections = self._fields(sections, SECTIONS, "section")
+        self.vehicle_fields = self._fields(vehicle_fields, VEHICLE_FIELD_VARS, "vehicle field")
+        self.edge_fields = self._fields(edge_fields, EDGE_FIELD_VARS, "edge field")
+        self.tls_fields = self._fields(tls_fields, TLS_FIELD_VARS, "traffic light field")
+        self.edges = tuple(edges) if edges is not None else None
 
-    if route_xml:
-        # Write generated routes to a temp file
-        _temp_route_file = tempfile.NamedTemporaryFile(
-            mode="w", suffix=".rou.xml", delete=False
+        if not isinstance(stride, int) or stride < 1:
+            raise ValueError("stride must be a positive integer")
+        if "stats" not in self.sections:
+            self.sections += ("stats",)
+
+    @staticmethod
+    def _fields(fields, known, what):
+        if fields is None:
+            return tuple(known)
+        for field in fields:
+            if field not in known:
+                raise ValueError(f"Invalid {what}. Options: {list(known)}")
+        # Keep the canonical order so output key order doesn't depend on the request
+        return tuple(f for f in known if f in fields)
+
+    def is_default(self):
+        return self.params() == {}
+
+    def is_complete(self):
+        """True if every section and field is collected (stride and edge filter aside)."""
+        return (
+            self.sections == SECTIONS
+            and self.vehicle_fields == tuple(VEHICLE_FIELD_VARS)
+            and self.edge_fields == tuple(EDGE_FIELD_VARS)
+            and self.tls_fields == tuple(TLS_FIELD_VARS)
         )
-        _temp_route_file.write(route_xml)
-        _temp_route_file.close()
-        cmd += ["--route-files", _temp_route_file.name]
-    else:
-        # Fall back to the static route file via sumocfg
-        cmd = [sumo_binary, "-c", SUMO_CFG, "--start"]
 
-    cmd += ["--end", str(duration)]
-    traci.start(cmd)
+    def params(self):
+        """The non-default options, as a JSON-friendly dict (for cache keys)."""
+        params = {}
+        if self.stride != 1:
+            params["stride"] = self.stride
+        if self.sections != SECTIONS:
+            params["sections"] = list(self.sections)
+        if self.vehicle_fields != tuple(VEHICLE_FIELD_VARS):
+            params["vehicle_fields"] = list(self.vehicle_fields)
+        if self.edge_fields != tuple(EDGE_FIELD_VARS):
+            params["edge_fields"] = list(self.edge_fields)
+        if self.tls_fields != tuple(TLS_FIELD_VARS):
+            params["tls_fields"] = list(self.tls_fields)
+        if self.edges is not None:
+            params["edges"] = list(self.edges)
+        return params
+
+    def edge_ids(self, network):
+        """Edges to report, checked against the network, in network order."""
+        if self.edges is None:
+            return network.edge_ids
+        for eid in self.edges:
+            if eid not in network.edges:
+                raise ValueError(f"Unknown edge: {eid}")
+        wanted = set(self.edges)
+        return [eid for eid in network.edge_ids if eid in wanted]
+
+    def project(self, step):
+        """
+        Apply these options to a fully collected step (for backends that
+        can't collect selectively, e.g. replayed traces).
+        """
+        data = {"time": step["time"]}
+        if "vehicles" in self.sections:
+            fields = ("id",) + self.vehicle_fields
+            data["vehicles"] = [{k: v[k] for k in fields} for v in step["vehicles"]]
+        if "edges" in self.sections:
+            fields = ("id",) + self.edge_fields
+            wanted = set(self.edges) if self.edges is not None else None
+            data["edges"] = [
+                {k: e[k] for k in fields}
+                for e in step["edges"]
+                if wanted is None or e["id"] in wanted
+            ]
+        if "traffic_lights" in self.sections:
+            fields = ("id",) + self.tls_fields
+            data["traffic_lights"] = [{k: t[k] for k in fields} for t in step["traffic_lights"]]
+        data["stats"] = step["stats"]
+        return data
+
 
+DEFAULT_COLLECT = CollectOptions()
 
-def get_vehicle_data():
-    """Get current data for all active vehicles."""
+
+# ── Polling collection ────────────────────────────────────────
+
+def get_vehicle_data(conn, fields=tuple(VEHICLE_FIELD_VARS)):
+    """Get current data for all active vehicles (only the requested fields)."""
     vehicles = []
-    for vid in traci.vehicle.getIDList():
-        x, y = traci.vehicle.getPosition(vid)
-        vehicles.append({
-            "id": vid,
-            "speed": round(traci.vehicle.getSpeed(vid), 2),
-            "position": {"x": round(x, 2), "y": round(y, 2)},
-            "road": traci.vehicle.getRoadID(vid),
-            "lane_position": round(traci.vehicle.getLanePosition(vid), 2),
-            "route": list(traci.vehicle.getRoute(vid)),
-            "type": traci.vehicle.getTypeID(vid),
-        })
+    for vid in conn.vehicle.getIDList():
+        v = {"id": vid}
+        if "speed" in fields:
+            v["speed"] = round(conn.vehicle.getSpeed(vid), 2)
+        if "position" in fields:
+            x, y = conn.vehicle.getPosition(vid)
+            v["position"] = {"x": round(x, 2), "y": round(y, 2)}
+        if "road" in fields:
+            v["road"] = conn.vehicle.getRoadID(vid)
+        if "lane_position" in fields:
+            v["lane_position"] = round(conn.vehicle.getLanePosition(vid), 2)
+        if "route" in fields:
+            v["route"] = list(conn.vehicle.getRoute(vid))
+        if "type" in fields:
+            v["type"] = conn.vehicle.getTypeID(vid)
+        vehicles.append(v)
     return vehicles
 
 
-def get_edge_data():
-    """Get traffic stats for all non-internal edges."""
+def get_edge_data(conn, edge_ids, fields=tuple(EDGE_FIELD_VARS)):
+    """Get traffic stats for the given edges (only the requested fields)."""
     edges = []
-    for eid in traci.edge.getIDList():
-        if eid.startswith(":"):
-            continue
-        edges.append({
-            "id": eid,
-            "vehicle_count": traci.edge.getLastStepVehicleNumber(eid),
-            "mean_speed": round(traci.edge.getLastStepMeanSpeed(eid), 2),
-            "occupancy": round(traci.edge.getLastStepOccupancy(eid), 2),
-            "waiting_time": round(traci.edge.getWaitingTime(eid), 2),
-        })
+    for eid in edge_ids:
+        e = {"id": eid}
+        if "vehicle_count" in fields:
+            e["vehicle_count"] = conn.edge.getLastStepVehicleNumber(eid)
+        if "mean_speed" in fields:
+            e["mean_speed"] = round(conn.edge.getLastStepMeanSpeed(eid), 2)
+        if "occupancy" in fields:
+            e["occupancy"] = round(conn.edge.getLastStepOccupancy(eid), 2)
+        if "waiting_time" in fields:
+            e["waiting_time"] = round(conn.edge.getWaitingTime(eid), 2)
+        edges.append(e)
     return edges
 
 
-def get_traffic_light_data():
-    """Get current state of all traffic lights."""
+def get_traffic_light_data(conn, network, fields=tuple(TLS_FIELD_VARS)):
+    """Get current state of all traffic lights (only the requested fields)."""
     tls = []
-    for tlid in traci.trafficlight.getIDList():
-        tls.append({
-            "id": tlid,
-            "phase": traci.trafficlight.getPhase(tlid),
-            "state": traci.trafficlight.getRedYellowGreenState(tlid),
-            "program": traci.trafficlight.getProgram(tlid),
-        })
+    for tlid in network.tls_ids:
+        t = {"id": tlid}
+        if "phase" in fields:
+            t["phase"] = conn.trafficlight.getPhase(tlid)
+        if "state" in fields:
+            t["state"] = conn.trafficlight.getRedYellowGreenState(tlid)
+        if "program" in fields:
+            t["program"] = conn.trafficlight.getProgram(tlid)
+        tls.append(t)
     return tls
 
 
-def step_and_collect():
-    """Advance one simulation step and return all collected data."""
-    traci.simulationStep()
-    return {
-        "time": traci.simulation.getTime(),
-        "vehicles": get_vehicle_data(),
-        "edges": get_edge_data(),
-        "traffic_lights": get_traffic_light_data(),
-        "stats": {
-            "active_vehicles": traci.vehicle.getIDCount(),
-            "departed": traci.simulation.getDepartedNumber(),
-            "arrived": traci.simulation.getArrivedNumber(),
-        },
+def collect_polled(conn, network, options=DEFAULT_COLLECT, full=True):
+    """
+    Build a step snapshot with one getter call per attribute.
+    With full=False only time and stats are collected.
+    """
+    data = {"time": conn.simulation.getTime()}
+    if full:
+        if "vehicles" in options.sections:
+            data["vehicles"] = get_vehicle_data(conn, options.vehicle_fields)
+        if "edges" in options.sections:
+            data["edges"] = get_edge_data(conn, options.edge_ids(network), options.edge_fields)
+        if "traffic_lights" in options.sections:
+            data["traffic_lights"] = get_traffic_light_data(conn, network, options.tls_fields)
+    data["stats"] = {
+        "active_vehicles": conn.vehicle.getIDCount(),
+        "departed": conn.simulation.getDepartedNumber(),
+        "arrived": conn.simulation.getArrivedNumber(),
     }
+    return data
+
 
+# ── Subscription-based collection ─────────────────────────────
 
-def run_full_simulation(route_xml=None, duration=300):
+def setup_subscriptions(conn, network, options=DEFAULT_COLLECT):
     """
-    Run the entire simulation and collect data from every step.
+    Subscribe once to every static object that was asked for: the
+    selected edges, all traffic lights and the simulation-level counters,
+    each with only the selected variables.
 
-    Returns a list of per-step snapshots (only steps with active vehicles).
+    Vehicles come and go, so they are subscribed as they depart
+    (see collect_subscribed). SUMO drops a vehicle's subscription
+    automatically when it arrives.
+    """
+    if "edges" in options.sections and options.edge_fields:
+        edge_vars = [EDGE_FIELD_VARS[f] for f in options.edge_fields]
+        for eid in options.edge_ids(network):
+            conn.edge.subscribe(eid, edge_vars)
+    if "traffic_lights" in options.sections and options.tls_fields:
+        tls_vars = [TLS_FIELD_VARS[f] for f in options.tls_fields]
+        for tlid in network.tls_ids:
+            conn.trafficlight.subscribe(tlid, tls_vars)
+    conn.simulation.subscribe(SIM_VARS)
+
+
+def vehicle_vars(options):
+    """
+    Variables to subscribe per vehicle. A subscription needs at least
+    one, and vehicles are subscribed even when not reported, since the
+    subscription results give the active count for free.
+    """
+    if "vehicles" not in options.sections:
+        return [tc.VAR_ROAD_ID]
+    return [VEHICLE_FIELD_VARS[f] for f in options.vehicle_fields] or [tc.VAR_ROAD_ID]
+
+
+def collect_subscribed(conn, network=None, options=DEFAULT_COLLECT, full=True):
+    """
+    Build a step snapshot from the subscription results delivered
+    with the last simulationStep. Same shape as the polled snapshot.
+    With full=False only time and stats are collected.
     """
-    start_simulation(route_xml=route_xml, duration=duration)
-    results = []
+    sim = conn.simulation.getSubscriptionResults()
+    data = {"time": sim[tc.VAR_TIME]}
+
+    # Newly departed vehicles: subscribing returns their current values
+    subscribe_vars = vehicle_vars(options)
+    for vid in sim[tc.VAR_DEPARTED_VEHICLES_IDS]:
+        conn.vehicle.subscribe(vid, subscribe_vars)
+    vehicle_results = conn.vehicle.getAllSubscriptionResults()
+
+    if full and "vehicles" in options.sections:
+        fields = options.vehicle_fields
+        vehicles = []
+        for vid, v in vehicle_results.items():
+            out = {"id": vid}
+            if "speed" in fields:
+                out["speed"] = round(v[tc.VAR_SPEED], 2)
+            if "position" in fields:
+                x, y = v[tc.VAR_POSITION]
+                out["position"] = {"x": round(x, 2), "y": round(y, 2)}
+            if "road" in fields:
+                out["road"] = v[tc.VAR_ROAD_ID]
+            if "lane_position" in fields:
+                out["lane_position"] = round(v[tc.VAR_LANEPOSITION], 2)
+            if "route" in fields:
+                out["route"] = list(v[tc.VAR_EDGES])
+            if "type" in fields:
+                out["type"] = v[tc.VAR_TYPE]
+            vehicles.append(out)
+        data["vehicles"] = vehicles
+
+    if full and "edges" in options.sections:
+        fields = options.edge_fields
+        if fields:
+            results = conn.edge.getAllSubscriptionResults().items()
+        else:
+            results = ((eid, {}) for eid in options.edge_ids(network))
+        edges = []
+        for eid, e in results:
+            out = {"id": eid}
+            if "vehicle_count" in fields:
+                out["vehicle_count"] = e[tc.LAST_STEP_VEHICLE_NUMBER]
+            if "mean_speed" in fields:
+                out["mean_speed"] = round(e[tc.LAST_STEP_MEAN_SPEED], 2)
+            if "occupancy" in fields:
+                out["occupancy"] = round(e[tc.LAST_STEP_OCCUPANCY], 2)
+            if "waiting_time" in fields:
+                out["waiting_time"] = round(e[tc.VAR_WAITING_TIME], 2)
+            edges.append(out)
+        data["edges"] = edges
+
+    if full and "traffic_lights" in options.sections:
+        fields = options.tls_fields
+        if fields:
+            results = conn.trafficlight.getAllSubscriptionResults().items()
+        else:
+            results = ((tlid, {}) for tlid in network.tls_ids)
+        tls = []
+        for tlid, t in results:
+            out = {"id": tlid}
+            if "phase" in fields:
+                out["phase"] = t[tc.TL_CURRENT_PHASE]
+            if "state" in fields:
+                out["state"] = t[tc.TL_RED_YELLOW_GREEN_STATE]
+            if "program" in fields:
+                out["program"] = t[tc.TL_CURRENT_PROGRAM]
+            tls.append(out)
+        data["traffic_lights"] = tls
+
+    data["stats"] = {
+        "active_vehicles": len(vehicle_results),
+        "departed": sim[tc.VAR_DEPARTED_VEHICLES_NUMBER],
+        "arrived": sim[tc.VAR_ARRIVED_VEHICLES_NUMBER],
+    }
+    return data
+
+
+# ── Per-run session ───────────────────────────────────────────
+
+class SimulationSession:
+    """
+    One SUMO process behind its own labeled TraCI connection.
+
+    Nothing here touches the default global traci connection, so
+    sessions in different threads don't interfere. Use as a context
+    manager to guarantee SUMO is closed and the route file removed.
+    """
+
+    # Label for this backend's run/step counters (see metrics.py)
+    backend = "sumo"
+
+    def __init__(self, route_xml=None, duration=300, gui=False, collect_mode=DEFAULT_COLLECT_MODE,
+                 route_file=None, collect=None, fork=None):
+        """
+        Args:
+            route_xml:    If provided, write this XML string to a temp .rou.xml
+                          and use it instead of the default route file.
+            duration:     Simulation end time in seconds.
+            gui:          If True, open sumo-gui instead of headless sumo.
+            collect_mode: "poll" or "subscribe" (see module docstring).
+            route_file:   Path to an existing .rou.xml to use instead of
+                          route_xml (large scenarios written straight to
+                          disk). The caller keeps ownership of the file.
+            collect:      CollectOptions (stride, sections, fields, edge
+                          filter); default collects everything every step.
+            fork:         snapshot.Fork to start from a saved state (plus
+                          modifications) instead of t=0.
+        """
+        if collect_mode not in COLLECT_MODES:
+            raise ValueError(f"Invalid collect_mode. Options: {list(COLLECT_MODES)}")
 
-    try:
-        for _ in range(duration):
-            data = step_and_collect()
-            if data["stats"]["active_vehicles"] > 0:
-                results.append(data)
+        self.route_xml = route_xml
+        self.duration = duration
+        self.gui = gui
+        self.collect_mode = collect_mode
+        self.collect = collect or DEFAULT_COLLECT
+        self.fork = fork
+        # Simulation time the run starts at (a fork's snapshot time)
+        self.start_time = 0
+        self.label = f"sim{next(_session_ids)}"
+        self.network = load_network(NET_FILE)
+        self.conn = None
+        self.route_file = route_file
+        self._owns_route_file = False
+        # Optional object with write(step), fed every collected step (see
+        # replay.py, jobs.py); an exception from write() stops the run
+        self.recorder = None
+        # departed/arrived of steps not reported (skipped by the stride,
+        # or without active vehicles), added to the next reported step
+        self._skipped = (0, 0)
+
+    def start(self):
+        """Write the route file (if any) and launch SUMO."""
+        sumo_binary = "sumo-gui" if self.gui else "sumo"
+        cmd = [sumo_binary, "--net-file", NET_FILE, "--start"]
+
+        if self.route_file:
+            cmd += ["--route-files", self.route_file]
+        elif self.route_xml:
+            # Write generated routes to a temp file owned by this session
+            with tempfile.NamedTemporaryFile(
+                mode="w", suffix=".rou.xml", delete=False
+            ) as f:
+                f.write(self.route_xml)
+            self.route_file = f.name
+            self._owns_route_file = True
+            cmd += ["--route-files", self.route_file]
+        else:
+            # Fall back to the static route file via sumocfg
+            cmd = [sumo_binary, "-c", SUMO_CFG, "--start"]
+
+        cmd += ["--end", str(self._end_time())]
+
+        try:
+            with Span("sim_start"):
+                self.conn = self._connect(cmd)
+                if self.collect_mode == "subscribe":
+                    setup_subscriptions(self.conn, self.network, self.collect)
+            if self.fork is not None:
+                with Span("fork"):
+                    self.fork.apply(self)
+        except Exception:
+            self.close()
+            raise
+        RUNS.inc((self.backend,))
+        return self
+
+    def _end_time(self):
+        """SUMO's --end; SUMO closes the connection once it is reached."""
+        return self.duration
+
+    def _connect(self, cmd):
+        """
+        Launch SUMO with `cmd` and return its TraCI connection.
+        Subclasses override this to swap in another backend.
+        """
+        traci.start(cmd, label=self.label)
+        return traci.getConnection(self.label)
+
+    def step_and_collect(self, full=True):
+        """
+        Advance one simulation step and return the collected data.
+        With full=False only time and stats are collected (steps
+        skipped by the stride).
+        """
+        with Span("sim_step"):
+            self.conn.simulationStep()
+        with Span("collect"):
+            data = self.collect_step(full)
+        return self._finish_step(data, full)
+
+    def collect_step(self, full=True):
+        """Collect the current step again, without advancing (see iter_steps)."""
+        if self.collect_mode == "subscribe":
+            return collect_subscribed(self.conn, self.network, self.collect, full)
+        return collect_polled(self.conn, self.network, self.collect, full)
+
+    def _finish_step(self, data, full):
+        """
+        Feed full steps to the recorder as collected, then carry
+        departed/arrived from skipped steps over to the next full one.
+        `data` may be shared (replayed steps), so it is copied rather
+        than changed.
+        """
+        stats = data["stats"]
+        STEPS.inc((self.backend,))
+        if stats["departed"]:
+            VEHICLES.inc((self.backend,), stats["departed"])
+        if not full:
+            departed, arrived = self._skipped
+            self._skipped = (departed + stats["departed"], arrived + stats["arrived"])
+            return data
+        if self.recorder is not None:
+            self.recorder.write(data)
+        return self._with_skipped(data)
+
+    def _with_skipped(self, data):
+        """data with the unreported departed/arrived added to its stats."""
+        if self._skipped == (0, 0):
+            return data
+        departed, arrived = self._skipped
+        self._skipped = (0, 0)
+        stats = data["stats"]
+        return dict(data, stats=dict(
+            stats, departed=stats["departed"] + departed, arrived=stats["arrived"] + arrived,
+        ))
+
+    def iter_steps(self):
+        """
+        Step until the end time (or until the network empties),
+        yielding each collected snapshot (every collect.stride steps)
+        that has active vehicles as soon as it is collected.
+
+        Every departure and arrival is counted in some yielded step: the
+        counts of steps that aren't yielded go to the next one, and the
+        run's last step is yielded (collected in full if the stride
+        skipped it) when it still has counts to report, even with no
+        active vehicles.
+        """
+        stride = self.collect.stride
+        steps = int(self.duration - self.start_time)
+        for i in range(steps):
+            full = i % stride == 0 or i == steps - 1
+            data = self.step_and_collect(full)
+            active = data["stats"]["active_vehicles"]
             # Stop early if all vehicles have arrived and none are active
-            if data["stats"]["active_vehicles"] == 0 and data["time"] > 10:
+            last = i == steps - 1 or (active == 0 and data["time"] > 10)
+            if not full:
+                if last and self._skipped != (0, 0):
+                    # This step's counts are already in _skipped
+                    with Span("collect"):
+                        data = self.collect_step(True)
+                    departed, arrived = self._skipped
+                    self._skipped = (0, 0)
+                    yield dict(data, stats=dict(data["stats"], departed=departed, arrived=arrived))
+            elif active > 0 or (last and (data["stats"]["departed"] or data["stats"]["arrived"])):
+                yield data
+            else:
+                self._skipped = (data["stats"]["departed"], data["stats"]["arrived"])
+            if last:
                 break
-    finally:
-        stop_simulation()
 
-    return results
+    def run(self):
+        """
+        Run to completion and return the per-step snapshots with active
+        vehicles (plus the last step, see iter_steps).
+        """
+        return list(self.iter_steps())
+
+    def run_until_peak(self, total_vehicles):
+        """
+        Return only the snapshot with the most active vehicles
+        (the first one, on ties - same as max() over run()).
+
+        Vehicles only leave the network after departing, so the active
+        count can never exceed active_now + vehicles_not_yet_departed.
+        Once that bound drops to the current peak, the rest of the run
+        cannot produce a new peak and SUMO is stopped early.
+
+        Args:
+            total_vehicles: Number of vehicles in the route file's
+                            departure schedule.
+        """
+        peak = None
+        departed = 0
+        for data in self.iter_steps():
+            active = data["stats"]["active_vehicles"]
+            departed += data["stats"]["departed"]
+            if peak is None or active > peak["stats"]["active_vehicles"]:
+                peak = data
+            if active + (total_vehicles - departed) <= peak["stats"]["active_vehicles"]:
+                break
+        return peak
+
+    def close(self):
+        """Close this session's TraCI connection and remove its route file."""
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            finally:
+                self.conn = None
+        if self._owns_route_file and os.path.exists(self.route_file):
+            os.unlink(self.route_file)
+            self.route_file = None
+            self._owns_route_file = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_full_simulation(route_xml=None, duration=300, collect_mode=DEFAULT_COLLECT_MODE, route_file=None,
+                        session_cls=SimulationSession, recorder=None, collect=None, fork=None, writer=None):
+    """
+    Run the entire simulation and collect data from every step.
+
+    Returns a list of per-step snapshots (only steps with active vehicles).
+    session_cls picks the backend (e.g. fake.FakeSession for SUMO-free runs);
+    recorder, if given, sees every collected step (see SimulationSession);
+    collect narrows what is collected (see CollectOptions); fork starts
+    the run from a snapshot (see snapshot.py). writer, if given (e.g. a
+    store.RunWriter), is given each returned step as soon as it is
+    collected.
+    """
+    with session_cls(route_xml, duration, collect_mode=collect_mode, route_file=route_file,
+                     collect=collect, fork=fork) as session:
+        session.recorder = recorder
+        if writer is None:
+            return session.run()
+        steps = []
+        for step in session.iter_steps():
+            writer.write(step)
+            steps.append(step)
+        return steps
+
+
+def run_until_peak(route_xml=None, duration=300, total_vehicles=0, collect_mode=DEFAULT_COLLECT_MODE,
+                   route_file=None, session_cls=SimulationSession, recorder=None):
+    """
+    Run the simulation only as long as the peak-traffic step can still
+    change, and return that single snapshot (None if nothing ran).
+    """
+    with session_cls(route_xml, duration, collect_mode=collect_mode, route_file=route_file) as session:
+        session.recorder = recorder
+        return session.run_until_peak(total_vehicles)
+
+
+# ── Bounded parallel execution ────────────────────────────────
+
+def session_class(backend):
+    """
+    Session class for a backend name in SIM_BACKENDS ("sumo" means
+    warm.WarmSession when SUMO_WARM is set). fake.py, replay.py and
+    warm.py import this module, so they are imported on demand.
+    """
+    if backend == "sumo":
+        if SUMO_WARM:
+            from .warm import WarmSession
+            return WarmSession
+        return SimulationSession
+    if backend == "fake":
+        from .fake import FakeSession
+        return FakeSession
+    if backend == "replay":
+        from .replay import ReplaySession
+        return ReplaySession
+    raise ValueError(f"Invalid simulation backend. Options: {list(SIM_BACKENDS)}")
+
+
+class SimulationPool:
+    """
+    Runs up to max_workers simulations at the same time, each in its
+    own SUMO process (or session of another backend). Extra submissions
+    queue until a slot frees up.
+    """
+
+    def __init__(self, max_workers=SIM_WORKERS, backend=SIM_BACKEND):
+        if backend not in SIM_BACKENDS:
+            raise ValueError(f"Invalid simulation backend. Options: {list(SIM_BACKENDS)}")
+        self.max_workers = max_workers
+        self.backend = backend
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sumo")
+
+    def _in_slot(self, fn, **kwargs):
+        kwargs.setdefault("session_cls", session_class(self.backend))
+        with self._slots:
+            return fn(**kwargs)
+
+    def submit(self, **kwargs):
+        """
+        Queue a run_full_simulation(**kwargs); returns a Future
+        resolving to the step list.
+        """
+        return submit(self._executor, self._in_slot, run_full_simulation, **kwargs)
+
+    def run(self, **kwargs):
+        """Queue a run and block until its steps are ready."""
+        return self.submit(**kwargs).result()
+
+    def run_peak(self, **kwargs):
+        """Queue a run_until_peak(**kwargs) and block until the peak snapshot is ready."""
+        return self.call(run_until_peak, **kwargs)
+
+    def call(self, fn, **kwargs):
+        """
+        Queue fn(session_cls=<pool backend>, **kwargs) for any function
+        that runs sessions (e.g. snapshot.run_what_if) and return its result.
+        """
+        return submit(self._executor, self._in_slot, fn, **kwargs).result()
+
+    def stream(self, session_cls=None, **kwargs):
+        """
+        Generator version of run(): waits for a free slot, then yields
+        steps while SUMO is still running. Closing the generator early
+        stops SUMO and frees the slot. Takes SimulationSession's arguments.
+        """
+        session_cls = session_cls or session_class(self.backend)
+        with self._slots:
+            with session_cls(**kwargs) as session:
+                yield from session.iter_steps()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
 
 
-def stop_simulation():
-    """Close TraCI and clean up temp files."""
-    global _temp_route_file
-    traci.close()
-    if _temp_route_file and os.path.exists(_temp_route_file.name):
-        os.unlink(_temp_route_file.name)
-        _temp_route_file = None
+# Shared pool used by the API
+SIM_POOL = SimulationPool()
@@ -0,0 +1,95 @@
+"""
+Static network index.
+
+The SUMO network never changes during a run, so everything per-step
+collection needs to know about it - which edges to report, their
+lengths, speed limits and lane counts, and the traffic light IDs - is
+read once from the .net.xml and shared by every run on that file.
+
+Plain XML parsing only, so analytics code can use it without TraCI.
+"""
+
+import os
+import threading
+import xml.etree.ElementTree as ET
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+NET_FILE = os.path.join(BASE_DIR, "genvanet.net.xml")
+
+# (path, mtime, size) -> NetworkIndex
+_indexes = {}
+_lock = threading.Lock()
+
+
+class NetworkIndex:
+    """
+    Read-only metadata for one network file.
+
+    Attributes:
+        edge_ids:  Non-internal edge IDs, in file order.
+        edges:     edge_id -> {"length", "speed", "lanes", "from", "to"}
+                   (length in m, speed limit in m/s, from lane 0).
+        tls_ids:   Traffic light IDs, in file order.
+        tls:       tls_id -> {"program", "phases": [{"duration", "state"}]}
+        junctions: junction_id -> (x, y), non-internal junctions only.
+    """
+
+    def __init__(self, net_file):
+        self.net_file = net_file
+        self.edge_ids = []
+        self.edges = {}
+        self.tls_ids = []
+        self.tls = {}
+        self.junctions = {}
+
+        for elem in ET.parse(net_file).getroot():
+            if elem.tag == "edge":
+                # Internal junction edges (":J1_0") carry a function attribute
+                if elem.get("function", "normal") != "normal":
+                    continue
+                lanes = elem.findall("lane")
+                first = lanes[0] if lanes else None
+                self.edge_ids.append(elem.get("id"))
+                self.edges[elem.get("id")] = {
+                    "length": float(first.get("length", 0)) if first is not None else 0.0,
+                    "speed": float(first.get("speed", 0)) if first is not None else 0.0,
+                    "lanes": len(lanes),
+                    "from": elem.get("from"),
+                    "to": elem.get("to"),
+                }
+            elif elem.tag == "tlLogic":
+                self.tls_ids.append(elem.get("id"))
+                self.tls[elem.get("id")] = {
+                    "program": elem.get("programID"),
+                    "phases": [
+                        {"duration": float(ph.get("duration")), "state": ph.get("state")}
+                        for ph in elem.findall("phase")
+                    ],
+                }
+            elif elem.tag == "junction" and elem.get("type") != "internal":
+                self.junctions[elem.get("id")] = (float(elem.get("x")), float(elem.get("y")))
+
+    def edge_length(self, edge_id, default=0.0):
+        """Length of an edge in metres (default if unknown)."""
+        edge = self.edges.get(edge_id)
+        return edge["length"] if edge else default
+
+    def route_length(self, edge_ids):
+        """Total length of a sequence of edges in metres."""
+        return sum(self.edge_length(eid) for eid in edge_ids)
+
+
+def load_network(net_file=NET_FILE):
+    """
+    Return the NetworkIndex for net_file, parsing it only the first
+    time (or again if the file has changed on disk).
+    """
+    st = os.stat(net_file)
+    stamp = (os.path.abspath(net_file), st.st_mtime_ns, st.st_size)
+    index = _indexes.get(stamp)
+    if index is None:
+        with _lock:
+            index = _indexes.get(stamp)
+            if index is None:
+                index = _indexes[stamp] = NetworkIndex(net_file)
+    return index
@@ -0,0 +1,251 @@
+"""
+Record/replay backend for deterministic, SUMO-free runs.
+
+A recorder captures every step a session collects into a trace file;
+ReplaySession then serves those steps back through the same
+interface as SimulationSession (start, step_and_collect, iter_steps,
+run, run_until_peak, close), without starting anything.
+
+Trace files are gzipped JSON lines:
+
+    {"trace": 1, "duration": ..., "collect_mode": ..., "routes": <sha256>, ...}
+    {"s": {...new static entries...}, "r": {...step columns...}}   - one per step
+
+Steps use the columnar encoding from formats.py, written one step at
+a time, so a trace is a fraction of the size of the row JSON and can
+be recorded while the run is in progress.
+
+Traces are looked up by the sha256 of the route file they were
+recorded with (<TRACE_DIR>/<sha256>.trace.gz), so a recorded scenario
+replays whenever the same routes are requested again. Decoded traces
+are kept in memory and replayed steps are shared between sessions:
+treat them as read-only, like cached results.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from ..cache import file_digest
+from ..formats import ColumnarDecoder, ColumnarEncoder
+from ..metrics import RUNS, Span
+from .main import DEFAULT_COLLECT_MODE, SimulationSession
+from .network import BASE_DIR
+
+TRACE_VERSION = 1
+TRACE_SUFFIX = ".trace.gz"
+TRACE_DIR = os.environ.get("GENVANET_TRACE_DIR", os.path.join(BASE_DIR, "traces"))
+# Decoded traces kept in memory, least recently replayed dropped first
+TRACE_CACHE_SIZE = int(os.environ.get("GENVANET_TRACE_CACHE_SIZE", "8"))
+
+# Route file used by SUMO when a session has neither route_xml nor route_file
+DEFAULT_ROUTE_FILE = os.path.join(BASE_DIR, "genvanet.rou.xml")
+
+# (path, mtime, size) -> (header, steps), in LRU order
+_traces = OrderedDict()
+# stamp -> Future of (header, steps), while one thread decodes it
+_decoding = {}
+_lock = threading.Lock()
+
+
+def route_digest(route_xml=None, route_file=None):
+    """sha256 of the routes a session runs, the key traces are stored under."""
+    if route_file:
+        return file_digest(route_file)
+    if route_xml:
+        return hashlib.sha256(route_xml.encode()).hexdigest()
+    return file_digest(DEFAULT_ROUTE_FILE)
+
+
+def trace_file(digest, trace_dir=TRACE_DIR):
+    """Where the trace for a route digest lives."""
+    return os.path.join(trace_dir, digest + TRACE_SUFFIX)
+
+
+# ── Recording ─────────────────────────────────────────────────
+
+class TraceWriter:
+    """
+    Writes steps to a trace file as they are collected.
+
+    Set as a session's `recorder` (or call write() yourself). The file
+    is written under a temporary name and moved into place on close(),
+    so a half-recorded run never shows up as a trace.
+    """
+
+    def __init__(self, path, header):
+        """
+        Args:
+            path:   Trace file to create.
+            header: JSON-serialisable run metadata (duration, collect_mode,
+                    routes digest, ...) stored in the first line.
+        """
+        self.path = path
+        self.steps = 0
+        self._encoder = ColumnarEncoder()
+        self._tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = gzip.open(self._tmp_path, "wt", encoding="utf-8")
+        self._file.write(json.dumps(dict(header, trace=TRACE_VERSION), separators=(",", ":")) + "\n")
+
+    def write(self, step):
+        record, new = self._encoder.encode(step)
+        line = {"r": record}
+        if new["edges"] or new["roads"] or new["vehicles"]["ids"] or new["traffic_lights"]["ids"]:
+            line["s"] = new
+        self._file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self.steps += 1
+
+    def close(self, keep=True):
+        """Finish the file; keep=False throws the recording away."""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if keep:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.unlink(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(keep=exc_type is None)
+
+
+def record_simulation(route_xml=None, duration=300, collect_mode=DEFAULT_COLLECT_MODE, route_file=None,
+                      session_cls=SimulationSession, trace_dir=TRACE_DIR, path=None):
+    """
+    Run a full simulation on any backend, recording it as a trace.
+
+    Returns (steps, path) - the same steps run_full_simulation would
+    return, and the trace file written (trace_dir/<routes sha256>.trace.gz
+    unless `path` is given).
+    """
+    digest = route_digest(route_xml, route_file)
+    path = path or trace_file(digest, trace_dir)
+    header = {
+        "duration": duration,
+        "collect_mode": collect_mode,
+        "routes": digest,
+        "backend": session_cls.__name__,
+    }
+    with session_cls(route_xml, duration, collect_mode=collect_mode, route_file=route_file) as session:
+        with TraceWriter(path, header) as writer:
+            session.recorder = writer
+            steps = session.run()
+    return steps, path
+
+
+# ── Replay ────────────────────────────────────────────────────
+
+def read_trace(path):
+    """
+    Return (header, steps) for a trace file, decoding it only the
+    first time (or again if the file has changed on disk or was
+    dropped from the TRACE_CACHE_SIZE most recently read).
+    """
+    st = os.stat(path)
+    stamp = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _lock:
+        trace = _traces.get(stamp)
+        if trace is not None:
+            _traces.move_to_end(stamp)
+            return trace
+        future = _decoding.get(stamp)
+        decode = future is None
+        if decode:
+            future = _decoding[stamp] = Future()
+    if not decode:
+        # Another thread is decoding this trace
+        return future.result()
+
+    # Decoded outside the lock, so replays of other traces aren't held up
+    try:
+        trace = _decode_trace(path)
+    except BaseException as e:
+        with _lock:
+            del _decoding[stamp]
+        future.set_exception(e)
+        raise
+    with _lock:
+        del _decoding[stamp]
+        _traces[stamp] = trace
+        while len(_traces) > TRACE_CACHE_SIZE:
+            _traces.popitem(last=False)
+    future.set_result(trace)
+    return trace
+
+
+def _decode_trace(path):
+    decoder = ColumnarDecoder()
+    steps = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("trace") != TRACE_VERSION:
+            raise ValueError(f"Unsupported trace version in {path}: {header.get('trace')}")
+        for line in f:
+            entry = json.loads(line)
+            if "s" in entry:
+                decoder.add_static(entry["s"])
+            steps.append(decoder.decode(entry["r"]))
+    return header, steps
+
+
+class ReplaySession(SimulationSession):
+    """
+    SimulationSession that serves a recorded trace instead of running
+    a simulation. Takes the same arguments; the trace is found from the
+    routes (see module docstring) unless trace_path is given, and its
+    recorded duration replaces the one passed in.
+
+    To use a specific trace wherever a session class is accepted, bind
+    it with functools.partial(ReplaySession, trace_path=...).
+
+    Traces hold every field, so collect options are applied to the
+    recorded steps (CollectOptions.project) as they are served.
+    """
+
+    backend = "replay"
+
+    def __init__(self, route_xml=None, duration=300, gui=False, collect_mode=DEFAULT_COLLECT_MODE,
+                 route_file=None, collect=None, fork=None, trace_path=None):
+        if fork is not None:
+            raise ValueError("Replayed runs can't be forked from a snapshot")
+        super().__init__(route_xml, duration, gui=gui, collect_mode=collect_mode, route_file=route_file,
+                         collect=collect)
+        self.trace_path = trace_path
+        self.header = None
+        self._steps = None
+        self._next = 0
+
+    def start(self):
+        path = self.trace_path or trace_file(route_digest(self.route_xml, self.route_file))
+        if not os.path.exists(path):
+            raise ValueError(f"No recorded trace for these routes (expected {path})")
+        with Span("sim_start"):
+            self.header, self._steps = read_trace(path)
+        self.duration = self.header["duration"]
+        self._next = 0
+        RUNS.inc((self.backend,))
+        return self
+
+    def step_and_collect(self, full=True):
+        if self._next >= len(self._steps):
+            raise ValueError(f"Trace ends after {len(self._steps)} steps")
+        self._next += 1
+        return self._finish_step(self.collect_step(full), full)
+
+    def collect_step(self, full=True):
+        data = self._steps[self._next - 1]
+        if full and not (self.collect.is_complete() and self.collect.edges is None):
+            data = self.collect.project(data)
+        return data
+
+    def close(self):
+        self._steps = None
@@ -3,11 +3,14 @@ Dynamic scenario generator.
 
 Takes user-selected parameters (density, vehicle mix, pattern)
 and generates a SUMO route XML string — no pre-built files needed.
+The XML is written line by line (write_scenario) so large scenarios can
+go straight to a file without building a document in memory.
 """
 
+import io
+import math
 import random
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
+from xml.sax.saxutils import quoteattr
 
 # All 20 routes from the network, grouped by entry point
 ROUTES = {
@@ -57,6 +60,10 @@ DENSITY_CONFIG = {
     "rush_hour": {"count": 120, "duration": 500},
 }
 
+# Bounds for explicit count/duration/rate overrides
+MAX_VEHICLES = 100_000
+MAX_DURATION = 24 * 3600  # seconds
+
 MIX_CONFIG = {
     "cars_only":  {"car": 1.0, "bus": 0.0, "truck": 0.0},
     "mixed":      {"car": 0.6, "bus": 0.2, "truck": 0.2},
@@ -64,24 +71,44 @@ MIX_CONFIG = {
 }
 
 # ── Departure pattern generators ──────────────────────────────
+# Each takes a random.Random instance so concurrent calls never share
+# (or reseed) the global random state, and yields departure times in
+# ascending order one at a time - nothing is held in a list, so a
+# 100k-vehicle scenario costs the same memory as a 15-vehicle one.
+
+def _sorted_uniform(count, low, high, rng):
+    """
+    Yield `count` uniform samples from [low, high) in ascending order
+    without storing or sorting them.
 
-def _uniform_departures(count, duration):
+    The largest of k uniforms on [0, 1) is distributed as U ** (1/k),
+    and the rest are uniform below it, so walking down from the top and
+    mirroring the values gives the ascending order statistics.
+    """
+    top = 1.0
+    for k in range(count, 0, -1):
+        top *= rng.random() ** (1.0 / k)
+        yield low + (1.0 - top) * (high - low)
+
+
+def _uniform_departures(count, duration, rng):
     """Evenly spaced departures."""
     gap = duration / count
-    return [round(i * gap, 2) for i in range(count)]
+    for i in range(count):
+        yield round(i * gap, 2)
 
 
-def _rush_hour_departures(count, duration):
+def _rush_hour_departures(count, duration, rng):
     """Clustered in the first 40% of the duration (morning rush)."""
     rush_end = duration * 0.4
-    departures = sorted([round(random.uniform(0, rush_end), 2) for _ in range(count)])
-    return departures
+    for t in _sorted_uniform(count, 0, rush_end, rng):
+        yield round(t, 2)
 
 
-def _random_departures(count, duration):
+def _random_departures(count, duration, rng):
     """Random departures across the full duration."""
-    departures = sorted([round(random.uniform(0, duration * 0.8), 2) for _ in range(count)])
-    return departures
+    for t in _sorted_uniform(count, 0, duration * 0.8, rng):
+        yield round(t, 2)
 
 
 PATTERN_FN = {
@@ -91,58 +118,139 @@ PATTERN_FN = {
 }
 
 
-def generate_scenario(density="medium", vehicle_mix="mixed", pattern="uniform", seed=42):
-    """
-    Generate a SUMO route XML string from scenario parameters.
+# ── Route XML writer ──────────────────────────────────────────
 
-    Args:
-        density:     "low" | "medium" | "high" | "rush_hour"
-        vehicle_mix: "cars_only" | "mixed" | "heavy_commercial"
-        pattern:     "uniform" | "rush_hour" | "random"
-        seed:        random seed for reproducibility
+def _attrs(**attrs):
+    """Serialize attributes in insertion order, XML-escaped."""
+    return " ".join(
+        f'{key}={quoteattr(str(value))}' for key, value in attrs.items()
+    )
 
-    Returns:
-        tuple: (route_xml_string, sim_duration)
-    """
-    random.seed(seed)
 
-    cfg = DENSITY_CONFIG[density]
-    mix = MIX_CONFIG[vehicle_mix]
-    count = cfg["count"]
-    duration = cfg["duration"]
+def write_routes(out, count, duration, mix, pattern, rng):
+    """
+    Stream a SUMO route file to `out` (any object with .write(str)),
+    one line per element, without building a document tree.
 
+    Args:
+        out:      Text file or buffer to write to.
+        count:    Number of vehicles.
+        duration: Simulation duration in seconds (spreads departures).
+        mix:      vtype -> share, as in MIX_CONFIG.
+        pattern:  Key into PATTERN_FN.
+        rng:      random.Random instance driving all random choices.
+    """
     # Build vehicle type list based on mix ratios
     type_pool = []
     for vtype, ratio in mix.items():
         type_pool.extend([vtype] * int(ratio * 100))
 
     # Generate departure times
-    departures = PATTERN_FN[pattern](count, duration)
+    departures = PATTERN_FN[pattern](count, duration, rng)
 
-    # Build XML
-    root = ET.Element("routes")
+    out.write("<routes>\n")
 
     # Vehicle types
     for vtype_id, attrs in VTYPES.items():
-        ET.SubElement(root, "vType", id=vtype_id, **attrs)
+        out.write(f"    <vType {_attrs(id=vtype_id, **attrs)}/>\n")
 
     # Route definitions
     for route_id, edges in ALL_ROUTES:
-        ET.SubElement(root, "route", id=route_id, edges=edges)
+        out.write(f"    <route {_attrs(id=route_id, edges=edges)}/>\n")
 
     # Vehicles
     for i, depart in enumerate(departures):
-        vtype = random.choice(type_pool)
-        route_id, _ = random.choice(ALL_ROUTES)
-        ET.SubElement(root, "vehicle",
-                      id=f"v{i}",
-                      type=vtype,
-                      route=route_id,
-                      depart=f"{depart:.2f}")
-
-    xml_str = minidom.parseString(ET.tostring(root)).toprettyxml(indent="    ")
-    # Remove extra XML declaration minidom adds
-    lines = xml_str.split("\n")
-    xml_str = "\n".join(lines[1:])
-
-    return xml_str, duration
+        vtype = rng.choice(type_pool)
+        route_id, _ = rng.choice(ALL_ROUTES)
+        out.write(
+            f'    <vehicle id="v{i}" type={quoteattr(vtype)} '
+            f'route={quoteattr(route_id)} depart="{depart:.2f}"/>\n'
+        )
+
+    out.write("</routes>\n")
+
+
+def resolve_size(density="medium", count=None, duration=None, rate=None):
+    """
+    Work out the vehicle count and duration for a scenario.
+
+    Starts from the density preset and applies any overrides. `rate` is
+    vehicles per second: with a duration it sets the count, with a
+    count it sets the duration. At most two of the three may be given.
+
+    Returns:
+        tuple: (count, duration)
+
+    Raises:
+        ValueError: if the overrides are inconsistent or out of bounds.
+    """
+    cfg = DENSITY_CONFIG[density]
+
+    if rate is not None:
+        if count is not None and duration is not None:
+            raise ValueError("Give at most two of count, duration and rate")
+        if not (math.isfinite(rate) and rate > 0):
+            raise ValueError("rate must be positive (vehicles per second)")
+        # Bound the float before ceil: huge or tiny rates overflow to inf
+        if count is None:
+            duration = cfg["duration"] if duration is None else duration
+            if rate * duration > MAX_VEHICLES:
+                raise ValueError(f"count must be between 1 and {MAX_VEHICLES}")
+            count = math.ceil(rate * duration)
+        else:
+            if count / rate > MAX_DURATION:
+                raise ValueError(f"duration must be between 1 and {MAX_DURATION} seconds")
+            duration = math.ceil(count / rate)
+
+    count = cfg["count"] if count is None else count
+    duration = cfg["duration"] if duration is None else duration
+
+    if not 1 <= count <= MAX_VEHICLES:
+        raise ValueError(f"count must be between 1 and {MAX_VEHICLES}")
+    if not 1 <= duration <= MAX_DURATION:
+        raise ValueError(f"duration must be between 1 and {MAX_DURATION} seconds")
+
+    return count, duration
+
+
+def write_scenario(out, density="medium", vehicle_mix="mixed", pattern="uniform", seed=42,
+                   count=None, duration=None, rate=None):
+    """
+    Write the scenario's route XML straight to `out` and return its
+    duration. Same arguments as generate_scenario.
+    """
+    count, duration = resolve_size(density, count, duration, rate)
+    write_routes(
+        out,
+        count=count,
+        duration=duration,
+        mix=MIX_CONFIG[vehicle_mix],
+        pattern=pattern,
+        rng=random.Random(seed),
+    )
+    return duration
+
+
+def generate_scenario(density="medium", vehicle_mix="mixed", pattern="uniform", seed=42,
+                      count=None, duration=None, rate=None):
+    """
+    Generate a SUMO route XML string from scenario parameters.
+
+    Args:
+        density:     "low" | "medium" | "high" | "rush_hour"
+        vehicle_mix: "cars_only" | "mixed" | "heavy_commercial"
+        pattern:     "uniform" | "rush_hour" | "random"
+        seed:        random seed for reproducibility
+        count:       optional vehicle count override (see resolve_size)
+        duration:    optional duration override in seconds
+        rate:        optional departure rate override in vehicles/second
+
+    Returns:
+        tuple: (route_xml_string, sim_duration)
+
+    For large scenarios prefer write_scenario() with a file, which
+    never holds the whole document in memory.
+    """
+    buf = io.StringIO()
+    duration = write_scenario(buf, density, vehicle_mix, pattern, seed, count, duration, rate)
+    return buf.getvalue(), duration
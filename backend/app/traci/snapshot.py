@@ -0,0 +1,368 @@
+"""
+Simulation snapshots and forked what-if runs.
+
+A what-if question ("what if an extra vehicle enters at t=120", "what
+if J4_J5 closes at t=120") only changes the run from that moment on.
+Instead of replaying the scenario from t=0 every time, the scenario is
+run once up to the times of interest and SUMO's state is saved there
+(simulation.saveState). A forked run then starts SUMO on the same
+routes, loads the state (simulation.loadState), applies its
+modifications and simulates only the remaining horizon.
+
+Snapshots are files kept in a SnapshotStore, keyed by the run's cache
+key (scenario, routes, network, backend) and the snapshot time, so
+every what-if on the same scenario and time reuses one warm-up.
+
+Modifications:
+    AddVehicle - insert a vehicle now, on a scenario route or a list of edges
+    CloseEdge  - disallow every lane of an edge and reroute vehicles whose
+                 remaining route uses it (vehicles not yet in the network
+                 keep their routes)
+
+The fake backend supports all of this; replayed traces can't be forked.
+"""
+
+import os
+import re
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+import traci
+
+from .main import DEFAULT_COLLECT_MODE, SimulationSession, run_full_simulation, setup_subscriptions, vehicle_vars
+from .scenario import ALL_ROUTES, VTYPES
+
+SNAPSHOT_DIR = os.environ.get("GENVANET_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "genvanet-snapshots"))
+SNAPSHOT_CACHE_SIZE = int(os.environ.get("GENVANET_SNAPSHOT_CACHE_SIZE", "64"))
+
+_ROUTE_EDGES = {route_id: edges.split() for route_id, edges in ALL_ROUTES}
+
+
+# ── Modifications ─────────────────────────────────────────────
+
+# Vehicle IDs of generated scenarios (scenario.py): v0, v1, ...
+SCENARIO_VEHICLE_ID = re.compile(r"v\d+")
+
+
+class ModificationError(ValueError):
+    """SUMO rejected a modification when it was applied to the fork."""
+
+
+class AddVehicle:
+    """Insert a vehicle at the fork time."""
+
+    def __init__(self, vehicle_id, route=None, edges=None, vehicle_type="car"):
+        """
+        Args:
+            vehicle_id:   ID of the new vehicle (not of the scenario's v<N> form).
+            route:        A route ID from scenario.ALL_ROUTES, or ...
+            edges:        ... the edge IDs to drive along.
+            vehicle_type: One of scenario.VTYPES.
+        """
+        if not isinstance(vehicle_id, str) or not vehicle_id.strip():
+            raise ValueError("add_vehicle needs a non-empty vehicle_id string")
+        if SCENARIO_VEHICLE_ID.fullmatch(vehicle_id):
+            raise ValueError(f"vehicle_id {vehicle_id} clashes with the scenario's v<N> vehicle IDs")
+        if (route is None) == (edges is None):
+            raise ValueError("add_vehicle needs exactly one of route or edges")
+        if route is not None and (not isinstance(route, str) or route not in _ROUTE_EDGES):
+            raise ValueError(f"Unknown route: {route}")
+        if edges is not None and (
+            not isinstance(edges, list) or not edges or not all(isinstance(eid, str) for eid in edges)
+        ):
+            raise ValueError("add_vehicle edges must be a non-empty list of edge IDs")
+        if not isinstance(vehicle_type, str) or vehicle_type not in VTYPES:
+            raise ValueError(f"Invalid vehicle_type. Options: {list(VTYPES)}")
+        self.vehicle_id = vehicle_id
+        self.edges = list(_ROUTE_EDGES[route] if route is not None else edges)
+        self.vehicle_type = vehicle_type
+
+    def check(self, network):
+        for eid in self.edges:
+            if eid not in network.edges:
+                raise ValueError(f"Unknown edge: {eid}")
+
+    def apply(self, conn, network):
+        route_id = f"whatif_{self.vehicle_id}"
+        conn.route.add(route_id, self.edges)
+        conn.vehicle.add(self.vehicle_id, route_id, typeID=self.vehicle_type, depart="now")
+
+    def to_dict(self):
+        return {"type": "add_vehicle", "vehicle_id": self.vehicle_id, "edges": self.edges,
+                "vehicle_type": self.vehicle_type}
+
+
+class CloseEdge:
+    """Close an edge to all traffic at the fork time."""
+
+    def __init__(self, edge_id):
+        if not isinstance(edge_id, str):
+            raise ValueError("close_edge needs an edge_id string")
+        self.edge_id = edge_id
+
+    def check(self, network):
+        if self.edge_id not in network.edges:
+            raise ValueError(f"Unknown edge: {self.edge_id}")
+
+    def apply(self, conn, network):
+        lanes = max(network.edges[self.edge_id].get("lanes", 1), 1)
+        for i in range(lanes):
+            conn.lane.setDisallowed(f"{self.edge_id}_{i}", ["all"])
+        for vid in conn.vehicle.getIDList():
+            route = conn.vehicle.getRoute(vid)
+            road = conn.vehicle.getRoadID(vid)
+            remaining = route[route.index(road) + 1:] if road in route else route
+            if self.edge_id in remaining:
+                conn.vehicle.rerouteTraveltime(vid)
+
+    def to_dict(self):
+        return {"type": "close_edge", "edge_id": self.edge_id}
+
+
+MODIFICATIONS = {"add_vehicle": AddVehicle, "close_edge": CloseEdge}
+
+
+def modification(spec):
+    """Build a modification from its dict form ({"type": "close_edge", "edge_id": ...})."""
+    spec = dict(spec)
+    kind = spec.pop("type", None)
+    if kind not in MODIFICATIONS:
+        raise ValueError(f"Invalid modification type. Options: {list(MODIFICATIONS)}")
+    try:
+        return MODIFICATIONS[kind](**spec)
+    except TypeError as e:
+        raise ValueError(f"Invalid {kind} modification: {e}")
+
+
+def check_modifications(mods, network):
+    """Check modifications against the network and each other (ValueError if invalid)."""
+    vehicle_ids = set()
+    for mod in mods:
+        mod.check(network)
+        if isinstance(mod, AddVehicle):
+            if mod.vehicle_id in vehicle_ids:
+                raise ValueError(f"vehicle_id {mod.vehicle_id} is added more than once")
+            vehicle_ids.add(mod.vehicle_id)
+
+
+# ── Forking ───────────────────────────────────────────────────
+
+class Fork:
+    """Where a forked run starts: a saved state and what to change in it."""
+
+    def __init__(self, state_file, time, modifications=()):
+        self.state_file = state_file
+        self.time = time
+        self.modifications = list(modifications)
+
+    def apply(self, session):
+        """Load the state into a started session and apply the modifications."""
+        conn = session.conn
+        conn.simulation.loadState(self.state_file)
+        session.start_time = self.time
+        for mod in self.modifications:
+            try:
+                mod.apply(conn, session.network)
+            except traci.TraCIException as e:
+                raise ModificationError(f"Could not apply {mod.to_dict()['type']}: {e}")
+        if session.collect_mode == "subscribe":
+            # Vehicles restored from the state departed before the fork
+            setup_subscriptions(conn, session.network, session.collect)
+            subscribe_vars = vehicle_vars(session.collect)
+            for vid in conn.vehicle.getIDList():
+                conn.vehicle.subscribe(vid, subscribe_vars)
+
+
+# ── Snapshot store ────────────────────────────────────────────
+
+class SnapshotStore:
+    """
+    Saved states on disk, keyed by (run key, time). The oldest files
+    are deleted once more than max_entries are kept, except while a
+    fork is loading them (checkout/release): those go once released.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR, max_entries=SNAPSHOT_CACHE_SIZE):
+        self.root = root
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_locks = {}
+        self._readers = {}
+        self._evicted = set()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key, time):
+        return os.path.join(self.root, f"{key}.{int(time)}.state.xml.gz")
+
+    def temp_path(self, key, time):
+        """A unique name to save into before add() moves it to path(key, time)."""
+        # SUMO picks the state format from the extension, so keep it last
+        return os.path.join(self.root, f"{key}.{int(time)}.{uuid.uuid4().hex}.tmp.state.xml.gz")
+
+    def lock_save(self, key, time):
+        """
+        Wait for, then hold, the lock on saving the state at (key, time),
+        so it is saved once. Locks exist only while someone holds or
+        waits for them.
+        """
+        with self._lock:
+            entry = self._save_locks.get((key, int(time)))
+            if entry is None:
+                entry = self._save_locks[(key, int(time))] = [threading.Lock(), 0]
+            entry[1] += 1
+        entry[0].acquire()
+
+    def unlock_save(self, key, time):
+        with self._lock:
+            entry = self._save_locks[(key, int(time))]
+            entry[0].release()
+            entry[1] -= 1
+            if not entry[1]:
+                del self._save_locks[(key, int(time))]
+
+    def get(self, key, time):
+        """Path of the saved state, or None."""
+        with self._lock:
+            path = self._entries.get((key, int(time)))
+            if path is not None and os.path.exists(path):
+                self._entries.move_to_end((key, int(time)))
+                self.hits += 1
+                return path
+            self._entries.pop((key, int(time)), None)
+            self.misses += 1
+            return None
+
+    def checkout(self, key, time):
+        """
+        Path of the saved state, kept on disk until release(path); None
+        if the store doesn't have it.
+        """
+        with self._lock:
+            path = self._entries.get((key, int(time)))
+            if path is None or not os.path.exists(path):
+                return None
+            self._entries.move_to_end((key, int(time)))
+            self._readers[path] = self._readers.get(path, 0) + 1
+            return path
+
+    def release(self, path):
+        with self._lock:
+            self._readers[path] -= 1
+            if self._readers[path]:
+                return
+            del self._readers[path]
+            if path not in self._evicted:
+                return
+            self._evicted.discard(path)
+        self._unlink(path)
+
+    def add(self, key, time, saved):
+        """Move a state saved at `saved` (see temp_path) into place and register it."""
+        path = self.path(key, time)
+        evicted = []
+        with self._lock:
+            os.replace(saved, path)
+            self._evicted.discard(path)
+            self._entries[(key, int(time))] = path
+            self._entries.move_to_end((key, int(time)))
+            while len(self._entries) > self.max_entries:
+                _, old = self._entries.popitem(last=False)
+                if old in self._readers:
+                    self._evicted.add(old)
+                else:
+                    evicted.append(old)
+        for old in evicted:
+            self._unlink(old)
+        return path
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+
+def save_snapshots(store, key, times, route_xml=None, duration=300, route_file=None,
+                   session_cls=SimulationSession, collect_mode=DEFAULT_COLLECT_MODE):
+    """
+    Run the scenario once and save its state at each of `times` that the
+    store doesn't have yet. Only time and stats are collected on the way.
+
+    Returns {time: state file} for every requested time.
+    """
+    times = sorted({int(t) for t in times})
+    if any(t < 1 or t >= duration for t in times):
+        raise ValueError(f"Snapshot times must be between 1 and {duration - 1}")
+    saved = {t: store.get(key, t) for t in times}
+    missing = [t for t in times if saved[t] is None]
+    if not missing:
+        return saved
+
+    # One saver per (key, time): later requests wait and then find the file.
+    # Locks are taken in time order, so overlapping requests can't deadlock.
+    locked = []
+    try:
+        for t in missing:
+            store.lock_save(key, t)
+            locked.append(t)
+        for t in missing:
+            saved[t] = store.checkout(key, t)
+            if saved[t] is not None:
+                store.release(saved[t])
+        missing = [t for t in missing if saved[t] is None]
+        if not missing:
+            return saved
+
+        os.makedirs(store.root, exist_ok=True)
+        with session_cls(route_xml, duration, collect_mode=collect_mode, route_file=route_file) as session:
+            for _ in range(missing[-1]):
+                session.step_and_collect(full=False)
+                now = int(session.conn.simulation.getTime())
+                if now in missing:
+                    temp = store.temp_path(key, now)
+                    try:
+                        session.conn.simulation.saveState(temp)
+                        saved[now] = store.add(key, now, temp)
+                    finally:
+                        if os.path.exists(temp):
+                            os.unlink(temp)
+    finally:
+        for t in locked:
+            store.unlock_save(key, t)
+    return saved
+
+
+def run_what_if(store, key, time, modifications=(), route_xml=None, duration=300, route_file=None,
+                session_cls=SimulationSession, collect_mode=DEFAULT_COLLECT_MODE, collect=None):
+    """
+    Steps from `time` to `duration` after applying `modifications` to
+    the scenario's state at `time` (saved first if the store lacks it).
+    """
+    # Hold the file while the fork loads it; it may be evicted (and
+    # saved again) between saving and checking it out
+    state_file = None
+    while state_file is None:
+        save_snapshots(store, key, [time], route_xml, duration, route_file, session_cls, collect_mode)
+        state_file = store.checkout(key, time)
+    try:
+        fork = Fork(state_file, int(time), modifications)
+        return run_full_simulation(
+            route_xml, duration, collect_mode=collect_mode, route_file=route_file,
+            session_cls=session_cls, collect=collect, fork=fork,
+        )
+    finally:
+        store.release(state_file)
+
+
+# Shared store used by the API
+SNAPSHOTS = SnapshotStore()
@@ -0,0 +1,182 @@
+"""
+Warm SUMO processes, reset between runs with traci.load.
+
+A cold SimulationSession spawns `sumo`, waits for its TraCI socket and
+closes it again, on every run. For short, low-density runs that
+startup dominates. WarmSession instead borrows a long-lived SUMO
+process from a SumoProcessPool and reloads it with the run's route
+file, so only the simulation itself is rebuilt.
+
+Processes are checked before they are reused (a cheap TraCI call on
+a live connection) and replaced once they have served max_runs runs,
+so a slowly leaking or wedged SUMO never lives forever. Runs that fail
+return nothing to the pool: the process is closed.
+
+SUMO closes the connection when it reaches --end, so warm runs are
+loaded with an end time one step past the duration; the session stops
+stepping at the duration either way.
+
+Enable with GENVANET_SUMO_WARM=1 (see traci/main.py); compare latency
+with python -m backend.bench.warm.
+"""
+
+import atexit
+import itertools
+import os
+import threading
+
+import traci
+
+from ..metrics import SUMO_RELOADS, SUMO_STARTS
+from .main import SIM_WORKERS, SimulationSession
+
+# Runs served by one SUMO process before it is replaced
+SUMO_MAX_RUNS = int(os.environ.get("GENVANET_SUMO_MAX_RUNS", "50"))
+
+_labels = itertools.count(1)
+
+
+class WarmProcess:
+    """One long-lived SUMO process and its TraCI connection."""
+
+    def __init__(self, cmd):
+        self.label = f"warm{next(_labels)}"
+        traci.start(cmd, label=self.label)
+        self.conn = traci.getConnection(self.label)
+        self.runs = 1
+
+    def healthy(self):
+        """True if SUMO still answers on this connection."""
+        try:
+            self.conn.simulation.getTime()
+            return True
+        except Exception:
+            return False
+
+    def load(self, args):
+        """Reset the simulation with new options (the command minus the binary)."""
+        self.conn.load(args)
+        self.runs += 1
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception as e:
+            print(f"[SUMO Pool Error] closing {self.label}: {e}")
+
+
+class SumoProcessPool:
+    """
+    Idle SUMO processes waiting for their next run.
+
+    acquire() hands out a reloaded process (or starts one); release()
+    takes it back. At most max_idle processes are kept idle; the pool
+    never limits how many run at once - SimulationPool does that.
+    """
+
+    def __init__(self, max_idle=SIM_WORKERS, max_runs=SUMO_MAX_RUNS):
+        self.max_idle = max_idle
+        self.max_runs = max_runs
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self, cmd):
+        """
+        Return a WarmProcess running `cmd` (binary first, then SUMO
+        options): an idle process reloaded with the options if a
+        healthy one is available, otherwise a new one.
+        """
+        reason = "new"
+        while True:
+            with self._lock:
+                proc = self._idle.pop() if self._idle else None
+            if proc is None:
+                break
+            if proc.runs >= self.max_runs:
+                reason = "recycled"
+            elif not proc.healthy():
+                reason = "unhealthy"
+            else:
+                try:
+                    proc.load(cmd[1:])
+                    SUMO_RELOADS.inc()
+                    return proc
+                except Exception as e:
+                    print(f"[SUMO Pool Error] reloading {proc.label}: {e}")
+                    reason = "unhealthy"
+            proc.close()
+
+        SUMO_STARTS.inc((reason,))
+        return WarmProcess(cmd)
+
+    def release(self, proc, reuse=True):
+        """Take a process back after its run; reuse=False closes it."""
+        with self._lock:
+            if reuse and len(self._idle) < self.max_idle:
+                self._idle.append(proc)
+                return
+        proc.close()
+
+    def stats(self):
+        with self._lock:
+            return {"idle": len(self._idle), "max_idle": self.max_idle, "max_runs": self.max_runs}
+
+    def shutdown(self):
+        """Close every idle process."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for proc in idle:
+            proc.close()
+
+
+# Shared pool used by WarmSession; idle processes are closed on exit
+SUMO_PROCESSES = SumoProcessPool()
+atexit.register(SUMO_PROCESSES.shutdown)
+
+
+class WarmSession(SimulationSession):
+    """
+    SimulationSession that runs on a pooled SUMO process (see module
+    docstring). Same arguments and behaviour; gui=True is not pooled
+    and starts sumo-gui cold.
+    """
+
+    pool = SUMO_PROCESSES
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._proc = None
+        self._failed = False
+
+    def _end_time(self):
+        return self.duration + 1 if not self.gui else self.duration
+
+    def _connect(self, cmd):
+        if self.gui:
+            return super()._connect(cmd)
+        self._proc = self.pool.acquire(cmd)
+        return self._proc.conn
+
+    def start(self):
+        # Until start() returns, SUMO may be left half loaded or forked
+        # (the base class closes the session before re-raising)
+        self._failed = True
+        super().start()
+        self._failed = False
+        return self
+
+    def iter_steps(self):
+        # A TraCI error may leave SUMO mid-command; don't reuse that process
+        try:
+            yield from super().iter_steps()
+        except (traci.TraCIException, traci.FatalTraCIError, OSError):
+            self._failed = True
+            raise
+
+    def close(self):
+        """Hand the SUMO process back to the pool and remove the route file."""
+        if self._proc is not None:
+            proc, self._proc = self._proc, None
+            self.conn = None
+            self.pool.release(proc, reuse=not self._failed)
+        super().close()
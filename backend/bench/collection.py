@@ -0,0 +1,83 @@
+"""
+Benchmark: TraCI round-trips and wall time per step, poll vs subscribe.
+
+Needs a working SUMO install (or --fake for the in-process backend,
+which counts API calls instead of socket round-trips). Run from the
+project root:
+
+    python -m backend.bench.collection
+    python -m backend.bench.collection --density rush_hour --pattern rush_hour
+    python -m backend.bench.collection --fake
+"""
+
+import argparse
+import time
+
+from traci.connection import Connection
+
+from ..app.traci import main as sim
+from ..app.traci.fake import FakeSession
+from ..app.traci.scenario import generate_scenario, DENSITY_CONFIG, PATTERN_FN
+
+# Every TraCI command (getter, subscribe, simulationStep) goes through _sendExact
+_round_trips = 0
+_original_send = Connection._sendExact
+
+
+def _counting_send(self):
+    global _round_trips
+    _round_trips += 1
+    return _original_send(self)
+
+
+def measure(route_xml, duration, collect_mode, session_cls=sim.SimulationSession):
+    """Run one simulation and return (steps, round_trips, seconds)."""
+    global _round_trips
+
+    with session_cls(route_xml, duration, collect_mode=collect_mode) as session:
+        _round_trips = 0
+        fake_calls = getattr(session.conn, "calls", 0)
+        steps = 0
+        t0 = time.perf_counter()
+        for _ in range(duration):
+            data = session.step_and_collect()
+            steps += 1
+            if data["stats"]["active_vehicles"] == 0 and data["time"] > 10:
+                break
+        elapsed = time.perf_counter() - t0
+        if session_cls is FakeSession:
+            _round_trips = session.conn.calls - fake_calls
+
+    return steps, _round_trips, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--density", choices=list(DENSITY_CONFIG), action="append")
+    parser.add_argument("--vehicle-mix", default="mixed")
+    parser.add_argument("--pattern", default="uniform", choices=list(PATTERN_FN))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fake", action="store_true", help="use the fake TraCI backend instead of SUMO")
+    args = parser.parse_args()
+    session_cls = FakeSession if args.fake else sim.SimulationSession
+
+    Connection._sendExact = _counting_send
+
+    print(f"{'density':<10} {'mode':<10} {'steps':>6} {'rt/step':>9} {'ms/step':>9}")
+    for density in args.density or list(DENSITY_CONFIG):
+        route_xml, duration = generate_scenario(
+            density=density,
+            vehicle_mix=args.vehicle_mix,
+            pattern=args.pattern,
+            seed=args.seed,
+        )
+        for mode in sim.COLLECT_MODES:
+            steps, rts, elapsed = measure(route_xml, duration, mode, session_cls)
+            print(
+                f"{density:<10} {mode:<10} {steps:>6} "
+                f"{rts / steps:>9.1f} {elapsed / steps * 1000:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
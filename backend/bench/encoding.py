@@ -0,0 +1,75 @@
+"""
+Benchmark: /simulate body encoding time and bytes on the wire, per density.
+
+For each density level it simulates one scenario, builds the /simulate
+body (rows and columnar) and reports:
+
+    stdlib   jsonable_encoder + json.dumps (FastAPI's default path)
+    fast     responses.dumps (orjson when installed), no jsonable_encoder
+    gzip/br  compressed size and time at the API's levels
+
+Runs against the fake TraCI backend by default, so no SUMO install is
+needed:
+
+    python -m backend.bench.encoding
+    python -m backend.bench.encoding --density high rush_hour --repeat 20
+    python -m backend.bench.encoding --backend sumo
+"""
+
+import argparse
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from ..app.formats import to_columnar
+from ..app.responses import BROTLI_QUALITY, ENCODINGS, GZIP_LEVEL, compress, dumps, orjson
+from ..app.traci.main import run_full_simulation, session_class
+from ..app.traci.scenario import DENSITY_CONFIG, generate_scenario
+
+
+def timed(fn, repeat):
+    """(result, median seconds) over `repeat` calls."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return result, statistics.median(times)
+
+
+def stdlib_encode(body):
+    return JSONResponse(jsonable_encoder(body)).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--density", nargs="+", choices=list(DENSITY_CONFIG), default=list(DENSITY_CONFIG))
+    parser.add_argument("--pattern", default="rush_hour")
+    parser.add_argument("--backend", choices=["sumo", "fake"], default="fake")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}, "
+          f"compression: {', '.join(ENCODINGS)} (gzip level {GZIP_LEVEL}, brotli quality {BROTLI_QUALITY})")
+    print(f"{'density':10} {'format':8} {'stdlib ms':>10} {'fast ms':>8} {'speedup':>8} {'raw KiB':>9}"
+          + "".join(f" {enc + ' KiB':>9} {enc + ' ms':>7}" for enc in ENCODINGS))
+
+    for density in args.density:
+        route_xml, duration = generate_scenario(density, "mixed", args.pattern, 42)
+        steps = run_full_simulation(route_xml, duration, session_cls=session_class(args.backend))
+        for format in ("rows", "columnar"):
+            body = {"scenario": {"density": density}, "steps": to_columnar(steps) if format == "columnar" else steps}
+            _, slow = timed(lambda: stdlib_encode(body), args.repeat)
+            raw, fast = timed(lambda: dumps(body), args.repeat)
+            line = (f"{density:10} {format:8} {slow * 1000:10.1f} {fast * 1000:8.1f} {slow / fast:7.1f}x "
+                    f"{len(raw) / 1024:9.1f}")
+            for encoding in ENCODINGS:
+                packed, seconds = timed(lambda: compress(raw, encoding), args.repeat)
+                line += f" {len(packed) / 1024:9.1f} {seconds * 1000:7.1f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: route XML generation time and peak memory, old vs new.
+
+"tree" is the previous approach (ElementTree + minidom pretty-print),
+"stream" is scenario.write_routes writing to a buffer or a file.
+No SUMO needed:
+
+    python -m backend.bench.scenario_gen
+    python -m backend.bench.scenario_gen --counts 1000 10000
+"""
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from xml.dom import minidom
+
+from ..app.traci.scenario import ALL_ROUTES, MIX_CONFIG, PATTERN_FN, VTYPES, write_routes
+
+
+def tree_routes(count, duration, mix, pattern, rng):
+    """The old generate_scenario body, kept here for comparison."""
+    type_pool = []
+    for vtype, ratio in mix.items():
+        type_pool.extend([vtype] * int(ratio * 100))
+    departures = PATTERN_FN[pattern](count, duration, rng)
+
+    root = ET.Element("routes")
+    for vtype_id, attrs in VTYPES.items():
+        ET.SubElement(root, "vType", id=vtype_id, **attrs)
+    for route_id, edges in ALL_ROUTES:
+        ET.SubElement(root, "route", id=route_id, edges=edges)
+    for i, depart in enumerate(departures):
+        vtype = rng.choice(type_pool)
+        route_id, _ = rng.choice(ALL_ROUTES)
+        ET.SubElement(root, "vehicle", id=f"v{i}", type=vtype, route=route_id, depart=f"{depart:.2f}")
+
+    xml_str = minidom.parseString(ET.tostring(root)).toprettyxml(indent="    ")
+    return "\n".join(xml_str.split("\n")[1:])
+
+
+def measure(fn):
+    """Run fn once; return (seconds, peak MiB allocated by Python)."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1 << 20)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route XML generation benchmark")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--pattern", default="random")
+    parser.add_argument("--vehicle-mix", default="mixed", choices=list(MIX_CONFIG))
+    args = parser.parse_args()
+    mix = MIX_CONFIG[args.vehicle_mix]
+
+    print(f"{'vehicles':>9} {'method':<14} {'seconds':>9} {'peak MiB':>9}")
+    for count in args.counts:
+        duration = max(count // 4, 200)
+
+        def tree():
+            tree_routes(count, duration, mix, args.pattern, random.Random(42))
+
+        def stream_buffer():
+            write_routes(io.StringIO(), count, duration, mix, args.pattern, random.Random(42))
+
+        def stream_file():
+            with tempfile.NamedTemporaryFile("w", suffix=".rou.xml", delete=False) as f:
+                write_routes(f, count, duration, mix, args.pattern, random.Random(42))
+            os.unlink(f.name)
+
+        for name, fn in (("tree", tree), ("stream/buffer", stream_buffer), ("stream/file", stream_file)):
+            seconds, peak = measure(fn)
+            print(f"{count:>9} {name:<14} {seconds:>9.3f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
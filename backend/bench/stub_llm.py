@@ -0,0 +1,217 @@
+"""
+Local stand-in for the Groq chat completions API.
+
+Answers every request with a fixed five-line prediction after a
+configurable delay, so /predict can be exercised without network
+access or an API key:
+
+    python -m backend.bench.stub_llm --port 8900 --delay 1.5
+    GROQ_API_URL=http://127.0.0.1:8900/v1/chat/completions GROQ_API_KEY=stub \\
+        uvicorn backend.app.main:app --port 8000
+
+It can also misbehave like the real API, to exercise the client's
+rate limiting, retries and circuit breaker (llm_client.py):
+
+    --rpm 30             x-ratelimit-* headers for 30 requests per minute,
+                         and 429 with Retry-After beyond that
+    --fail-first 3       answer the first 3 requests with --fail-status (503)
+    --fail-rate 0.2      answer 20% of requests with --fail-status
+    --malformed          answer 200 with a body (or events) that isn't a chat completion
+
+Requests with "stream": true get the reply as server-sent events, one
+word per event every --token-delay seconds. --chatter N appends N
+words of rambling after the five lines, like a verbose model, so
+closing the stream early (GENVANET_LLM_STREAM) shows up in time and
+in `state.chunks`.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RATE_WINDOW = 60.0  # seconds, for --rpm
+
+REPLY = """PREDICTION: Moderate traffic building on the highway over the next few minutes.
+CONGESTION: J1_J2 and J2_J3 will slow down
+RECOMMENDED_ROUTE: Route B
+EXPECTED_DELAY: 95
+EXPLANATION: Route B avoids the busiest highway edges while staying short."""
+
+
+class StubState:
+    """Request counters shared by one server's handlers."""
+
+    def __init__(self):
+        self.requests = 0
+        self.chunks = 0  # streamed events sent
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Chunked transfer encoding for streamed replies needs HTTP/1.1
+    protocol_version = "HTTP/1.1"
+
+    # Set per server via make_server()
+    delay = 0.0
+    reply = REPLY
+    token_delay = 0.0
+    chatter = 0
+    rpm = None
+    fail_first = 0
+    fail_rate = 0.0
+    fail_status = 503
+    malformed = False
+    state = None
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # A client that closed a stream early dropped the keep-alive connection
+            pass
+
+    def _admit(self):
+        """(status, rate-limit headers) for this request."""
+        with self.state.lock:
+            self.state.requests += 1
+            n = self.state.requests
+            headers = {}
+            if self.rpm:
+                now = time.monotonic()
+                if now - self.state.window_start >= RATE_WINDOW:
+                    self.state.window_start, self.state.window_requests = now, 0
+                reset = RATE_WINDOW - (now - self.state.window_start)
+                if self.state.window_requests >= self.rpm:
+                    return 429, {"retry-after": f"{reset:.2f}"}
+                self.state.window_requests += 1
+                headers = {
+                    "x-ratelimit-limit-requests": str(self.rpm),
+                    "x-ratelimit-remaining-requests": str(self.rpm - self.state.window_requests),
+                    "x-ratelimit-reset-requests": f"{reset:.2f}s",
+                }
+        if n <= self.fail_first or random.random() < self.fail_rate:
+            return self.fail_status, headers
+        return 200, headers
+
+    def _send(self, status, payload, headers):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        status, headers = self._admit()
+        if status != 200:
+            error = {"error": {"message": f"stub error {status}", "type": "stub"}}
+            self._send(status, json.dumps(error).encode(), headers)
+            return
+        time.sleep(self.delay)
+        if self.malformed and not body.get("stream"):
+            self._send(200, b'{"unexpected": true}', headers)
+            return
+        if body.get("stream"):
+            self._stream(body.get("model", "stub"), headers)
+            return
+
+        payload = json.dumps({
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.reply}}],
+        }).encode()
+        self._send(200, payload, headers)
+
+    def _stream(self, model, headers):
+        """Send the reply word by word as server-sent events, chunk-encoded."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        text = self.reply + "\n" + " ".join(["etc"] * self.chatter) if self.chatter else self.reply
+        pieces = [{"content": word} for word in re.findall(r"\S+\s*|\s+", text)]
+        try:
+            for delta in pieces + [None]:
+                if delta is None:
+                    event = "data: [DONE]\n\n"
+                elif self.malformed:
+                    event = "data: {not json\n\n"
+                else:
+                    event = "data: " + json.dumps({"model": model, "choices": [{"index": 0, "delta": delta}]}) + "\n\n"
+                    with self.state.lock:
+                        self.state.chunks += 1
+                data = event.encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+                time.sleep(self.token_delay)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(port=0, delay=0.0, reply=REPLY, rpm=None, fail_first=0, fail_rate=0.0, fail_status=503,
+                token_delay=0.0, chatter=0, malformed=False):
+    """
+    Build a threaded stub server (port 0 picks a free port). Its
+    `state.requests` counts the requests it received and `state.chunks`
+    the streamed events it sent.
+    """
+    state = StubState()
+    handler = type("Handler", (StubHandler,), {
+        "delay": delay, "reply": reply, "rpm": rpm, "fail_first": fail_first,
+        "fail_rate": fail_rate, "fail_status": fail_status, "state": state,
+        "token_delay": token_delay, "chatter": chatter, "malformed": malformed,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.state = state
+    return server
+
+
+def serve_in_background(port=0, delay=0.0, reply=REPLY, **misbehave):
+    """
+    Start a stub server on a daemon thread; returns (server, url).
+    misbehave takes make_server's rpm, fail_*, token_delay, chatter and malformed arguments.
+    """
+    server = make_server(port, delay, reply, **misbehave)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    return server, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub for the Groq chat completions API")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before replying")
+    parser.add_argument("--rpm", type=int, help="requests per minute before answering 429")
+    parser.add_argument("--fail-first", type=int, default=0, help="fail this many requests first")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests to fail")
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed words")
+    parser.add_argument("--chatter", type=int, default=0, help="extra words after the five lines")
+    parser.add_argument("--malformed", action="store_true", help="answer 200 with a non-completion body")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.delay, rpm=args.rpm, fail_first=args.fail_first,
+                         fail_rate=args.fail_rate, fail_status=args.fail_status,
+                         token_delay=args.token_delay, chatter=args.chatter, malformed=args.malformed)
+    print(f"Stub LLM listening on http://127.0.0.1:{args.port}/v1/chat/completions")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
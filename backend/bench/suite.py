@@ -0,0 +1,234 @@
+"""
+Benchmark suite for the hot paths, at every density level.
+
+For each case it reports ops/sec, latency percentiles and the peak
+Python memory of a single call. Runs against the fake TraCI backend by
+default, so no SUMO install is needed:
+
+    python -m backend.bench.suite
+    python -m backend.bench.suite --density rush_hour --case run_full_simulation
+    python -m backend.bench.suite --save baseline.json
+    python -m backend.bench.suite --compare baseline.json   # exit 1 on regressions
+
+Pass --backend sumo to run the simulation cases against real SUMO.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from ..app.ai_model import _calc_route_stats, fallback_prediction, parse_response
+from ..app.traci.fake import FakeSession
+from ..app.traci.main import SimulationSession, run_full_simulation
+from ..app.traci.scenario import DENSITY_CONFIG, generate_scenario
+from ..app.validator import validate_prediction
+from .stub_llm import REPLY
+
+SCENARIO = {"vehicle_mix": "mixed", "pattern": "rush_hour", "seed": 42}
+BACKENDS = {"fake": FakeSession, "sumo": SimulationSession}
+
+
+# ── Cases ─────────────────────────────────────────────────────
+# Each builder does its setup once and returns the zero-argument
+# callable that is timed.
+
+def case_generate_scenario(ctx):
+    return lambda: generate_scenario(ctx["density"], **SCENARIO)
+
+
+def case_step_and_collect(ctx):
+    state = {"session": None, "steps": 0}
+
+    def step():
+        # Start a fresh run whenever the previous one reaches its end time
+        if state["session"] is None or state["steps"] >= ctx["duration"]:
+            if state["session"] is not None:
+                state["session"].close()
+            state["session"] = ctx["session_cls"](ctx["route_xml"], ctx["duration"]).start()
+            state["steps"] = 0
+        state["steps"] += 1
+        return state["session"].step_and_collect()
+
+    ctx["cleanup"].append(lambda: state["session"] and state["session"].close())
+    return step
+
+
+def case_run_full_simulation(ctx):
+    return lambda: run_full_simulation(
+        ctx["route_xml"], ctx["duration"], session_cls=ctx["session_cls"]
+    )
+
+
+def case_calc_route_stats(ctx):
+    edges = ctx["peak"]["edges"]
+    return lambda: _calc_route_stats(edges)
+
+
+def case_parse_response(ctx):
+    return lambda: parse_response(REPLY)
+
+
+def case_validate_prediction(ctx):
+    prediction = fallback_prediction(ctx["peak"], "fast")
+    return lambda: validate_prediction(prediction)
+
+
+def case_json_simulate_response(ctx):
+    response = {
+        "scenario": dict(SCENARIO, density=ctx["density"]),
+        "summary": {"total_steps": len(ctx["steps"]), "total_vehicles": 0},
+        "steps": ctx["steps"],
+    }
+    return lambda: json.dumps(response)
+
+
+CASES = {
+    "generate_scenario": case_generate_scenario,
+    "step_and_collect": case_step_and_collect,
+    "run_full_simulation": case_run_full_simulation,
+    "calc_route_stats": case_calc_route_stats,
+    "parse_response": case_parse_response,
+    "validate_prediction": case_validate_prediction,
+    "json_simulate_response": case_json_simulate_response,
+}
+
+
+# ── Runner ────────────────────────────────────────────────────
+
+def measure(fn, min_time, max_iters):
+    """Time fn repeatedly; return ops/sec, latency percentiles (ms) and peak KiB."""
+    fn()  # warm-up
+
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < max_iters:
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+        if time.perf_counter() - start >= min_time and len(latencies) >= 5:
+            break
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+    return {
+        "iterations": len(latencies),
+        "ops_per_sec": round(len(latencies) / sum(latencies), 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 4),
+        "p50_ms": round(pct(50), 4),
+        "p95_ms": round(pct(95), 4),
+        "p99_ms": round(pct(99), 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def build_context(density, session_cls):
+    """Generate the scenario and one full run that cases can reuse."""
+    route_xml, duration = generate_scenario(density, **SCENARIO)
+    steps = run_full_simulation(route_xml, duration, session_cls=session_cls)
+    return {
+        "density": density,
+        "route_xml": route_xml,
+        "duration": duration,
+        "session_cls": session_cls,
+        "steps": steps,
+        "peak": max(steps, key=lambda s: s["stats"]["active_vehicles"]),
+        "cleanup": [],
+    }
+
+
+def run_suite(densities, cases, backend, min_time, max_iters):
+    results = {}
+    for density in densities:
+        ctx = build_context(density, BACKENDS[backend])
+        results[density] = {}
+        for name in cases:
+            results[density][name] = measure(CASES[name](ctx), min_time, max_iters)
+            print(_format_row(density, name, results[density][name]), flush=True)
+        for cleanup in ctx["cleanup"]:
+            cleanup()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print changes against a saved baseline; return the regressions found."""
+    regressions = []
+    print(f"\n{'density':<10} {'case':<24} {'ops/s Δ':>9} {'p95 Δ':>9}")
+    for density, cases in results.items():
+        for name, now in cases.items():
+            before = baseline.get("results", {}).get(density, {}).get(name)
+            if not before:
+                continue
+            ops_delta = now["ops_per_sec"] / before["ops_per_sec"] - 1
+            p95_delta = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+            flag = ""
+            if ops_delta < -threshold or p95_delta > threshold:
+                regressions.append((density, name))
+                flag = "  REGRESSION"
+            print(f"{density:<10} {name:<24} {ops_delta:>+9.1%} {p95_delta:>+9.1%}{flag}")
+    return regressions
+
+
+def _format_row(density, name, r):
+    return (
+        f"{density:<10} {name:<24} {r['ops_per_sec']:>11.1f} "
+        f"{r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['peak_kib']:>10.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="genVANET benchmark suite")
+    parser.add_argument("--density", choices=list(DENSITY_CONFIG), action="append")
+    parser.add_argument("--case", choices=list(CASES), action="append")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="fake")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per case (default 1)")
+    parser.add_argument("--max-iters", type=int, default=10000)
+    parser.add_argument("--save", metavar="FILE", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown counted as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    print(f"{'density':<10} {'case':<24} {'ops/s':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>10}")
+    results = run_suite(
+        args.density or list(DENSITY_CONFIG),
+        args.case or list(CASES),
+        args.backend,
+        args.min_time,
+        args.max_iters,
+    )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "meta": {
+                    "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "backend": args.backend,
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
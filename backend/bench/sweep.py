@@ -0,0 +1,296 @@
+"""
+Parameter sweep over scenario grids, across processes.
+
+Runs every combination of densities, vehicle mixes, patterns and seeds
+(DENSITY_CONFIG x MIX_CONFIG x PATTERN_FN x seeds) on a process pool,
+one simulation per worker at a time (each worker starts its own SUMO,
+or keeps one warm with --warm). Only the per-run aggregates are kept:
+totals, the peak step and, at the peak, the per-route stats and the
+analytical best route and delay for both objectives - the reference
+predictions are scored against offline.
+
+Results go to a sweep directory of flat binary columns, in the layout
+of store.py (one fixed-width file per column, strings as indexes into
+meta.json's dictionary). A row is appended as soon as its run
+finishes, so an interrupted sweep keeps everything it completed;
+running the same command again skips those runs and carries on:
+
+    python -m backend.bench.sweep sweeps/eval --seeds 0-999
+    python -m backend.bench.sweep sweeps/eval --density low high --pattern rush_hour --seeds 0-99 --workers 8
+    python -m backend.bench.sweep sweeps/quick --backend fake --seeds 0-9
+
+Load the columns with read_sweep(path) (NumPy arrays, strings decoded).
+"""
+
+import argparse
+import array
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from ..app.ai_model import ROUTES, _calc_route_stats, _estimate_delay, _pick_best_route
+from ..app.traci.main import COLLECT_MODES, DEFAULT_COLLECT_MODE, CollectOptions, session_class
+from ..app.traci.scenario import DENSITY_CONFIG, MIX_CONFIG, PATTERN_FN, generate_scenario
+
+OBJECTIVES = ("fast", "safe")
+
+# Every string column value, fixed up front so meta.json never changes mid-sweep
+STRINGS = list(DENSITY_CONFIG) + list(MIX_CONFIG) + list(PATTERN_FN) + list(ROUTES)
+
+# column name -> array typecode (string columns hold STRINGS indexes)
+COLUMNS = {
+    "density": "i",
+    "vehicle_mix": "i",
+    "pattern": "i",
+    "seed": "q",
+    "steps": "i",
+    "departed": "i",
+    "arrived": "i",
+    "peak_active": "i",
+    "peak_time": "d",
+    "mean_active": "d",
+}
+for _label in ROUTES:
+    _prefix = "route_" + _label.split()[-1].lower()
+    COLUMNS.update({f"{_prefix}.speed": "d", f"{_prefix}.vehicles": "i", f"{_prefix}.waiting": "d"})
+for _objective in OBJECTIVES:
+    COLUMNS.update({f"{_objective}.route": "i", f"{_objective}.delay": "d"})
+COLUMNS["wall_seconds"] = "d"
+
+STRING_COLUMNS = ("density", "vehicle_mix", "pattern") + tuple(f"{o}.route" for o in OBJECTIVES)
+KEY_COLUMNS = ("density", "vehicle_mix", "pattern", "seed")
+
+# Only the edges the route stats read, and only the fields they use
+ROUTE_EDGES = list(dict.fromkeys(eid for info in ROUTES.values() for eid in info["edges"]))
+COLLECT = CollectOptions(
+    sections=["edges"], edge_fields=["vehicle_count", "mean_speed", "waiting_time"], edges=ROUTE_EDGES,
+)
+
+
+# ── One run (in a worker process) ─────────────────────────────
+
+def _session_cls(backend, warm):
+    if warm and backend == "sumo":
+        from ..app.traci.warm import WarmSession
+        return WarmSession
+    return session_class(backend)
+
+
+def run_one(key, backend="sumo", warm=False, duration=None, collect_mode=DEFAULT_COLLECT_MODE):
+    """
+    Simulate one (density, vehicle_mix, pattern, seed) and return its
+    row: column name -> value, strings not yet encoded.
+    """
+    density, vehicle_mix, pattern, seed = key
+    t0 = time.perf_counter()
+    route_xml, run_duration = generate_scenario(density, vehicle_mix, pattern, seed, duration=duration)
+
+    steps = departed = arrived = active_total = 0
+    peak = None
+    session_cls = _session_cls(backend, warm)
+    with session_cls(route_xml, run_duration, collect_mode=collect_mode, collect=COLLECT) as session:
+        for step in session.iter_steps():
+            stats = step["stats"]
+            steps += 1
+            departed += stats["departed"]
+            arrived += stats["arrived"]
+            active_total += stats["active_vehicles"]
+            if peak is None or stats["active_vehicles"] > peak["stats"]["active_vehicles"]:
+                peak = step
+
+    row = dict(zip(KEY_COLUMNS, key), steps=steps, departed=departed, arrived=arrived,
+               peak_active=0, peak_time=0.0, mean_active=active_total / steps if steps else 0.0)
+    route_stats = _calc_route_stats(peak["edges"] if peak else [])
+    if peak is not None:
+        row.update(peak_active=peak["stats"]["active_vehicles"], peak_time=peak["time"])
+    for label, stats in route_stats.items():
+        prefix = "route_" + label.split()[-1].lower()
+        row.update({f"{prefix}.speed": stats["avg_speed"], f"{prefix}.vehicles": stats["vehicles"],
+                    f"{prefix}.waiting": stats["waiting_time"]})
+    for objective in OBJECTIVES:
+        best = _pick_best_route(route_stats, objective)
+        row.update({f"{objective}.route": best, f"{objective}.delay": _estimate_delay(route_stats, best)})
+    row["wall_seconds"] = time.perf_counter() - t0
+    return row
+
+
+# ── Sweep directory ───────────────────────────────────────────
+
+class SweepWriter:
+    """
+    Appends rows to a sweep directory, creating it or resuming it.
+
+    Every column is flushed after each row. On open, columns are cut
+    back to the shortest one, which drops a row half-written when the
+    previous sweep was killed.
+    """
+
+    def __init__(self, path, settings):
+        self.path = path
+        meta_path = os.path.join(path, "meta.json")
+        meta = {"columns": COLUMNS, "strings": STRINGS, "settings": settings}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                existing = json.load(f)
+            if existing != meta:
+                raise ValueError(f"{path} holds a sweep with other settings or columns: {existing['settings']}")
+        else:
+            os.makedirs(path, exist_ok=True)
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+
+        self._index = {s: i for i, s in enumerate(STRINGS)}
+        sizes = {}
+        for name, code in COLUMNS.items():
+            file = os.path.join(path, name)
+            sizes[name] = os.path.getsize(file) // array.array(code).itemsize if os.path.exists(file) else 0
+        self.rows = min(sizes.values())
+        self._files = {}
+        for name, code in COLUMNS.items():
+            f = open(os.path.join(path, name), "ab")
+            f.truncate(self.rows * array.array(code).itemsize)
+            self._files[name] = f
+
+    def done(self):
+        """Keys (density, vehicle_mix, pattern, seed) already written."""
+        if not self.rows:
+            return set()
+        columns = read_sweep(self.path, KEY_COLUMNS, rows=self.rows)
+        return set(zip(*(columns[name].tolist() for name in KEY_COLUMNS)))
+
+    def write(self, row):
+        for name, code in COLUMNS.items():
+            value = row[name]
+            if name in STRING_COLUMNS:
+                value = self._index[value]
+            array.array(code, [value]).tofile(self._files[name])
+        for f in self._files.values():
+            f.flush()
+        self.rows += 1
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_sweep(path, columns=None, rows=None):
+    """
+    Columns of a sweep directory as NumPy arrays (string columns as
+    arrays of str), cut to the rows every column has.
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    names = list(columns or meta["columns"])
+    data = {
+        name: np.fromfile(os.path.join(path, name), dtype=np.dtype(meta["columns"][name]))
+        for name in names
+    }
+    if rows is None:
+        rows = min(len(values) for values in data.values()) if data else 0
+    strings = np.array(meta["strings"])
+    return {
+        name: strings[values[:rows]] if name in STRING_COLUMNS else values[:rows]
+        for name, values in data.items()
+    }
+
+
+# ── CLI ───────────────────────────────────────────────────────
+
+def parse_seeds(spec):
+    """ "0-99,200,300-309" -> [0, ..., 99, 200, 300, ..., 309] """
+    seeds = []
+    for part in spec.split(","):
+        low, _, high = part.partition("-")
+        seeds.extend(range(int(low), int(high or low) + 1))
+    return list(dict.fromkeys(seeds))
+
+
+def sweep(path, keys, settings, workers, warm=False):
+    """
+    Run every key not yet in the sweep directory; returns (written, skipped).
+    settings (backend, duration, collect_mode) must match a resumed sweep's.
+    """
+    with SweepWriter(path, settings) as writer:
+        done = writer.done()
+        todo = [key for key in keys if key not in done]
+        print(f"{len(keys)} runs, {len(keys) - len(todo)} already in {path}, {workers} workers")
+
+        t0 = time.perf_counter()
+        written = 0
+        todo_iter = iter(todo)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            try:
+                while True:
+                    # Keep a couple of runs queued per worker, not the whole grid
+                    while len(pending) < workers * 2:
+                        key = next(todo_iter, None)
+                        if key is None:
+                            break
+                        pending.add(executor.submit(run_one, key, warm=warm, **settings))
+                    if not pending:
+                        break
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        try:
+                            writer.write(future.result())
+                            written += 1
+                        except Exception as e:
+                            print(f"[Sweep Error] {e}")
+                    if written and written % 100 == 0:
+                        elapsed = time.perf_counter() - t0
+                        print(f"{written}/{len(todo)} runs, {written / elapsed:.1f} runs/s")
+            except KeyboardInterrupt:
+                for future in pending:
+                    future.cancel()
+                print(f"Interrupted after {written} runs; run again to resume")
+                raise
+
+        elapsed = time.perf_counter() - t0
+        if written:
+            print(f"Wrote {written} runs in {elapsed:.1f}s ({written / elapsed:.1f} runs/s)")
+        return written, len(keys) - len(todo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep scenario grids and store per-run metrics")
+    parser.add_argument("path", help="sweep directory (created, or resumed if it exists)")
+    parser.add_argument("--density", nargs="+", choices=list(DENSITY_CONFIG), default=list(DENSITY_CONFIG))
+    parser.add_argument("--vehicle-mix", nargs="+", choices=list(MIX_CONFIG), default=list(MIX_CONFIG))
+    parser.add_argument("--pattern", nargs="+", choices=list(PATTERN_FN), default=list(PATTERN_FN))
+    parser.add_argument("--seeds", type=parse_seeds, default=parse_seeds("0-9"), help='e.g. "0-999" or "1,5,10-19"')
+    parser.add_argument("--duration", type=int, help="override every density's duration (seconds)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backend", choices=["sumo", "fake"], default="sumo")
+    parser.add_argument("--warm", action="store_true", help="keep one SUMO per worker, reset with traci.load")
+    parser.add_argument("--collect-mode", choices=list(COLLECT_MODES), default=DEFAULT_COLLECT_MODE)
+    args = parser.parse_args()
+
+    keys = [
+        (density, mix, pattern, seed)
+        for density in args.density
+        for mix in args.vehicle_mix
+        for pattern in args.pattern
+        for seed in args.seeds
+    ]
+    settings = {"backend": args.backend, "duration": args.duration, "collect_mode": args.collect_mode}
+    try:
+        sweep(args.path, keys, settings, args.workers, warm=args.warm)
+    except ValueError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        raise SystemExit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Record scenarios as replay traces, and time replaying them.
+
+Traces are stored under the routes' sha256 (see traci/replay.py), so
+a scenario recorded here is served by the API when it runs with
+GENVANET_SIM_BACKEND=replay and the same GENVANET_TRACE_DIR:
+
+    python -m backend.bench.trace record --density high --pattern rush_hour
+    python -m backend.bench.trace record --density low --backend fake
+    python -m backend.bench.trace replay traces/<sha256>.trace.gz
+"""
+
+import argparse
+import functools
+import os
+import time
+
+from ..app.traci.main import COLLECT_MODES, DEFAULT_COLLECT_MODE, run_full_simulation, session_class
+from ..app.traci.replay import TRACE_DIR, ReplaySession, read_trace, record_simulation
+from ..app.traci.scenario import DENSITY_CONFIG, MIX_CONFIG, PATTERN_FN, generate_scenario
+
+
+def record(args):
+    route_xml, duration = generate_scenario(
+        args.density, args.vehicle_mix, args.pattern, args.seed,
+        count=args.count, duration=args.duration, rate=args.rate,
+    )
+    t0 = time.perf_counter()
+    steps, path = record_simulation(
+        route_xml, duration,
+        collect_mode=args.collect_mode,
+        session_cls=session_class(args.backend),
+        trace_dir=args.trace_dir,
+    )
+    elapsed = time.perf_counter() - t0
+    print(f"Recorded {len(steps)} steps in {elapsed:.2f}s ({args.backend})")
+    print(f"{path} ({os.path.getsize(path) / 1024:.1f} KiB)")
+
+
+def replay(args):
+    t0 = time.perf_counter()
+    header, _ = read_trace(args.trace)
+    print(f"Decoded trace in {(time.perf_counter() - t0) * 1000:.1f} ms "
+          f"(recorded with {header['backend']}, {header['collect_mode']})")
+
+    session_cls = functools.partial(ReplaySession, trace_path=args.trace)
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        steps = run_full_simulation(session_cls=session_cls)
+    elapsed = time.perf_counter() - t0
+    print(f"{args.repeat} replays of {len(steps)} steps: "
+          f"{args.repeat / elapsed:.1f} runs/s, {args.repeat * len(steps) / elapsed:.0f} steps/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and replay simulation traces")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="run a scenario and save it as a trace")
+    rec.add_argument("--density", choices=list(DENSITY_CONFIG), default="medium")
+    rec.add_argument("--vehicle-mix", choices=list(MIX_CONFIG), default="mixed")
+    rec.add_argument("--pattern", choices=list(PATTERN_FN), default="uniform")
+    rec.add_argument("--seed", type=int, default=42)
+    rec.add_argument("--count", type=int)
+    rec.add_argument("--duration", type=int)
+    rec.add_argument("--rate", type=float)
+    rec.add_argument("--backend", choices=["sumo", "fake"], default="sumo")
+    rec.add_argument("--collect-mode", choices=list(COLLECT_MODES), default=DEFAULT_COLLECT_MODE)
+    rec.add_argument("--trace-dir", default=TRACE_DIR)
+    rec.set_defaults(fn=record)
+
+    rep = sub.add_parser("replay", help="time replaying a trace")
+    rep.add_argument("trace")
+    rep.add_argument("--repeat", type=int, default=100)
+    rep.set_defaults(fn=replay)
+
+    args = parser.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: per-run latency with a cold SUMO start vs a warm, reloaded one.
+
+Runs the same short scenarios back to back with SimulationSession
+(traci.start per run) and WarmSession (traci.load on a pooled
+process), and reports latency percentiles for each. Needs a working
+SUMO install. Run from the project root:
+
+    python -m backend.bench.warm
+    python -m backend.bench.warm --density medium --runs 30 --max-runs 10
+"""
+
+import argparse
+import statistics
+import time
+
+from ..app.traci.main import SimulationSession, run_full_simulation
+from ..app.traci.scenario import DENSITY_CONFIG, generate_scenario
+from ..app.traci.warm import SumoProcessPool, WarmSession
+
+
+def measure(session_cls, scenarios):
+    """Run every (route_xml, duration) once; returns per-run seconds."""
+    times = []
+    for route_xml, duration in scenarios:
+        t0 = time.perf_counter()
+        run_full_simulation(route_xml, duration, session_cls=session_cls)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def report(name, times):
+    ordered = sorted(times)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:6} mean {statistics.mean(times) * 1000:8.1f} ms   "
+          f"p50 {statistics.median(times) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--density", choices=list(DENSITY_CONFIG), default="low")
+    parser.add_argument("--duration", type=int, default=60, help="seconds per run (short runs show startup cost)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--max-runs", type=int, default=50, help="runs per warm process before it is replaced")
+    args = parser.parse_args()
+
+    scenarios = [
+        generate_scenario(args.density, "mixed", "uniform", seed, duration=args.duration)
+        for seed in range(args.runs)
+    ]
+
+    class BenchWarmSession(WarmSession):
+        pool = SumoProcessPool(max_idle=1, max_runs=args.max_runs)
+
+    print(f"{args.runs} runs, density={args.density}, duration={args.duration}s")
+    report("cold", measure(SimulationSession, scenarios))
+    # The first warm run starts the process; the rest reload it
+    warm = measure(BenchWarmSession, scenarios)
+    BenchWarmSession.pool.shutdown()
+    report("warm", warm)
+    report("reload", warm[1:] or warm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""
+The suite runs without SUMO or a model server: the API is imported with
+the fake simulation backend, and /whatif snapshots go to a temp dir.
+Set before any backend module reads its settings.
+"""
+
+import os
+import tempfile
+
+os.environ["GENVANET_SIM_BACKEND"] = "fake"
+os.environ.setdefault("GENVANET_SNAPSHOT_DIR", tempfile.mkdtemp(prefix="genvanet-test-snapshots-"))
@@ -0,0 +1,84 @@
+import functools
+
+import pytest
+
+from backend.app.traci.fake import FakeSession
+from backend.app.traci.main import CollectOptions, run_full_simulation
+from backend.app.traci.replay import ReplaySession, record_simulation
+from backend.app.traci.scenario import generate_scenario
+
+
+@pytest.fixture(scope="module")
+def scenario():
+    return generate_scenario("low", "mixed", "uniform", 7, count=200, duration=900)
+
+
+@pytest.fixture(scope="module")
+def trace(scenario, tmp_path_factory):
+    route_xml, duration = scenario
+    _, path = record_simulation(route_xml, duration, session_cls=FakeSession,
+                                trace_dir=str(tmp_path_factory.mktemp("traces")))
+    return path
+
+
+@pytest.fixture(params=["poll", "subscribe", "replay"])
+def run(request, scenario, trace):
+    """run(collect) -> steps of the scenario on the fake backend (or replayed)."""
+    route_xml, duration = scenario
+    if request.param == "replay":
+        session_cls, collect_mode = functools.partial(ReplaySession, trace_path=trace), "poll"
+    else:
+        session_cls, collect_mode = FakeSession, request.param
+
+    def run(collect=None):
+        return run_full_simulation(route_xml, duration, collect_mode=collect_mode,
+                                   session_cls=session_cls, collect=collect)
+    return run
+
+
+def totals(steps):
+    return (sum(s["stats"]["departed"] for s in steps), sum(s["stats"]["arrived"] for s in steps))
+
+
+def test_unstrided_run_counts_every_vehicle(run):
+    steps = run()
+    departed, arrived = totals(steps)
+    assert departed == 200
+    assert departed - arrived == steps[-1]["stats"]["active_vehicles"]
+
+
+@pytest.mark.parametrize("stride", [2, 7, 10, 60])
+def test_stride_keeps_departed_and_arrived_sums(run, stride):
+    full = run()
+    strided = run(CollectOptions(stride=stride))
+    assert totals(strided) == totals(full)
+    assert strided[-1]["time"] == full[-1]["time"]
+    assert all(s["time"] in {f["time"] for f in full} for s in strided)
+
+
+@pytest.mark.parametrize("stride", [1, 7, 60])
+@pytest.mark.parametrize("collect_mode", ["poll", "subscribe"])
+def test_run_that_empties_reports_every_arrival(collect_mode, stride):
+    # Departures end at 120s, so the network empties and the run stops early
+    route_xml, _ = generate_scenario("low", "mixed", "uniform", 3, count=50, duration=120)
+    steps = run_full_simulation(route_xml, 3600, collect_mode=collect_mode, session_cls=FakeSession,
+                                collect=CollectOptions(stride=stride))
+    assert totals(steps) == (50, 50)
+    assert steps[-1]["stats"]["active_vehicles"] == 0
+    assert steps[-1]["time"] < 3600
+
+
+@pytest.mark.parametrize("options", [
+    {"sections": ["edges"]},
+    {"sections": ["vehicles", "traffic_lights"], "vehicle_fields": ["speed", "road"], "tls_fields": ["phase"]},
+    {"edge_fields": ["vehicle_count", "waiting_time"], "edges": ["J2_J3", "J1_J2"]},
+])
+def test_narrowed_collection_matches_projected_full_run(run, options):
+    collect = CollectOptions(**options)
+    assert run(collect) == [collect.project(step) for step in run()]
+
+
+def test_edge_filter_keeps_network_order(run):
+    steps = run(CollectOptions(sections=["edges"], edges=["J2_J3", "J1_J2"]))
+    assert all([e["id"] for e in s["edges"]] == ["J1_J2", "J2_J3"] for s in steps)
+    assert all(set(s) == {"time", "edges", "stats"} for s in steps)
@@ -0,0 +1,170 @@
+import threading
+import time
+
+import pytest
+
+from backend.app import llm_client
+from backend.app.llm_client import (ChatClient, CircuitBreaker, CircuitOpenError, LLMError, RateLimiter,
+                                    RateLimitError, TokenBucket)
+from backend.bench.stub_llm import REPLY, serve_in_background
+
+MESSAGES = [{"role": "user", "content": "How is traffic?"}]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_client, "BACKOFF_BASE", 0.0)
+
+
+@pytest.fixture
+def stub():
+    """stub(**misbehave) -> (server, ChatClient against it)."""
+    servers = []
+
+    def stub(max_retries=2, breaker=None, max_in_flight=8, **misbehave):
+        server, url = serve_in_background(**misbehave)
+        servers.append(server)
+        return server, ChatClient(url, lambda: "stub", max_in_flight=max_in_flight, max_retries=max_retries,
+                                  breaker=breaker or CircuitBreaker(failures=2, cooldown=0.2))
+    yield stub
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_reply(stub):
+    _, client = stub()
+    assert client.chat("m", MESSAGES, timeout=5) == REPLY
+
+
+def test_streamed_reply(stub):
+    _, client = stub()
+    pieces = []
+    assert client.chat("m", MESSAGES, timeout=5, consumer=lambda text: pieces.append(text)) == REPLY
+    assert "".join(pieces) == REPLY
+
+
+def test_failures_are_retried(stub):
+    server, client = stub(fail_first=2)
+    assert client.chat("m", MESSAGES, timeout=5) == REPLY
+    assert server.state.requests == 3
+    assert client.breaker.state == "closed"
+
+
+def test_breaker_opens_then_half_open_trial_closes_it(stub):
+    server, client = stub(max_retries=0, fail_first=2)
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            client.chat("m", MESSAGES, timeout=5)
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.chat("m", MESSAGES, timeout=5)
+    assert server.state.requests == 2
+
+    time.sleep(0.25)
+    assert client.chat("m", MESSAGES, timeout=5) == REPLY
+    assert client.breaker.state == "closed"
+
+
+def test_failed_trial_reopens_for_another_cooldown(stub):
+    server, client = stub(max_retries=0, fail_first=3)
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            client.chat("m", MESSAGES, timeout=5)
+    time.sleep(0.25)
+    with pytest.raises(LLMError) as raised:
+        client.chat("m", MESSAGES, timeout=5)
+    assert not isinstance(raised.value, CircuitOpenError)
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.chat("m", MESSAGES, timeout=5)
+    assert server.state.requests == 3
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_malformed_reply_counts_as_failure(stub, stream):
+    _, client = stub(max_retries=0, malformed=True)
+    consumer = (lambda text: False) if stream else None
+    for _ in range(2):
+        with pytest.raises(LLMError) as raised:
+            client.chat("m", MESSAGES, timeout=5, consumer=consumer)
+        assert "Malformed" in str(raised.value)
+    assert client.breaker.state == "open"
+
+
+def test_rate_limited_queries_do_not_open_the_breaker(stub):
+    server, client = stub(rpm=2)
+    for _ in range(2):
+        assert client.chat("m", MESSAGES, timeout=5) == REPLY
+    # The headers said the window is used up: the limiter waits locally
+    # instead of sending a request that would get a 429
+    for _ in range(3):
+        with pytest.raises(RateLimitError):
+            client.chat("m", MESSAGES, timeout=0.5)
+    assert server.state.requests == 2
+    assert client.breaker.state == "closed"
+
+
+def test_429_pauses_the_model(stub):
+    server, client = stub(max_retries=0, rpm=1)
+    client.limiter("m").requests = TokenBucket()  # ignore the headers, so the 429 is reached
+    client.limiter("m").update = lambda headers: None
+    assert client.chat("m", MESSAGES, timeout=5) == REPLY
+    with pytest.raises(RateLimitError):
+        client.chat("m", MESSAGES, timeout=5)
+    # Retry-After (the rest of the minute) now holds back further queries
+    with pytest.raises(RateLimitError):
+        client.chat("m", MESSAGES, timeout=1)
+    assert server.state.requests == 2
+    assert client.breaker.state == "closed"
+
+
+def test_saturated_client_raises_rate_limit_error(stub):
+    server, client = stub(delay=0.5, max_in_flight=1)
+    first = threading.Thread(target=client.chat, args=("m", MESSAGES, 5))
+    first.start()
+    time.sleep(0.1)
+    with pytest.raises(RateLimitError):
+        client.chat("m", MESSAGES, timeout=0.1)
+    first.join()
+    assert server.state.requests == 1
+    assert client.breaker.state == "closed"
+
+
+def test_inconclusive_trial_leaves_the_next_query_as_trial():
+    breaker = CircuitBreaker(failures=1, cooldown=0.1)
+    breaker.record(False)
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    time.sleep(0.15)
+    breaker.allow()
+    assert breaker.state == "half_open"
+    breaker.record(None)
+    assert breaker.state == "open"
+    breaker.allow()
+    assert breaker.state == "half_open"
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_token_bucket():
+    bucket = TokenBucket()
+    assert bucket.wait_time(1000, 0.0) == 0
+    bucket.sync(limit=10, remaining=0, reset=5.0, now=0.0)
+    assert bucket.wait_time(1, 0.0) == pytest.approx(0.5)
+    assert bucket.wait_time(1, 0.5) == 0
+    bucket.take(1, 0.5)
+    assert bucket.wait_time(100, 0.5) == pytest.approx(5.0)  # capped at capacity
+    bucket.pause(2.0, 0.5)
+    assert bucket.wait_time(0, 0.5) == pytest.approx(2.0)
+
+
+def test_rate_limiter_syncs_from_headers():
+    limiter = RateLimiter()
+    limiter.update({"x-ratelimit-limit-requests": "30", "x-ratelimit-remaining-requests": "0",
+                    "x-ratelimit-reset-requests": "1m"})
+    with pytest.raises(RateLimitError):
+        limiter.acquire(10, deadline=time.monotonic() + 0.5)
+    limiter.update({"x-ratelimit-limit-requests": "30", "x-ratelimit-remaining-requests": "5",
+                    "x-ratelimit-reset-requests": "10s"})
+    limiter.acquire(10, deadline=time.monotonic())
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from backend.app import ai_model, main
+from backend.app.cache import LLM_CACHE
+from backend.app.llm_client import ChatClient
+from backend.bench.stub_llm import serve_in_background
+
+SNAPSHOT = {"time": 10.0, "edges": [], "stats": {"active_vehicles": 1, "departed": 0, "arrived": 0}}
+
+
+def test_models_get_the_time_left_and_late_calls_are_skipped():
+    calls = []
+
+    def slow(traffic_data, vehicle_type, objective, timeout):
+        calls.append(timeout)
+        time.sleep(timeout + 0.05)  # overruns its timeout a little
+        return {"route": "slow"}
+
+    # Fill every model executor thread, so the rest queue behind them
+    predictors = [slow] * (main.LLM_CONCURRENCY + 2)
+    deadline = 0.3
+    t0 = time.monotonic()
+    results = main._query_models(predictors, SNAPSHOT, "car", "fast", deadline=deadline)
+    assert time.monotonic() - t0 < deadline + 0.2
+    assert len(results) == len(predictors)
+    # Every call missed the deadline, so every prediction is the analytical fallback
+    assert all(pred.get("route") != "slow" for pred, _ in results)
+    assert all(0 < timeout <= deadline for timeout in calls)
+
+    # The queued calls start once the running ones time out, past the deadline: skipped
+    time.sleep(deadline + 0.2)
+    assert len(calls) == main.LLM_CONCURRENCY
+
+
+def test_fast_models_are_used():
+    def fast(traffic_data, vehicle_type, objective, timeout):
+        return {"route": "fast", "timeout": timeout}
+
+    (pred_a, _), (pred_b, _) = main._query_models([fast, fast], SNAPSHOT, "car", "fast", deadline=5)
+    assert pred_a["route"] == pred_b["route"] == "fast"
+    assert 0 < pred_a["timeout"] <= 5
+
+
+@pytest.fixture
+def stub_models(monkeypatch):
+    """stub_models(delay): both models are answered by a stub server replying after `delay` seconds."""
+    servers = []
+
+    def stub_models(delay):
+        server, url = serve_in_background(delay=delay)
+        servers.append(server)
+        monkeypatch.setattr(ai_model, "GROQ_API_KEY", "stub")
+        monkeypatch.setattr(ai_model, "LLM_CLIENT", ChatClient(url, lambda: "stub"))
+        # Identical prompts would otherwise be answered from the model reply cache
+        LLM_CACHE.clear()
+    yield stub_models
+    LLM_CACHE.clear()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_models_are_queried_concurrently(stub_models):
+    stub_models(delay=0.4)
+    t0 = time.monotonic()
+    results = main._query_models(main.PREDICTORS, SNAPSHOT, "car", "fast", deadline=5)
+    assert time.monotonic() - t0 < 0.7  # the slower of the two, not the sum
+    assert [pred["recommended_route"] for pred, _ in results] == ["Route B", "Route B"]
+
+
+def test_stub_past_the_deadline_gets_the_fallback(stub_models):
+    stub_models(delay=1.0)
+    t0 = time.monotonic()
+    results = main._query_models(main.PREDICTORS, SNAPSHOT, "car", "fast", deadline=0.3)
+    assert time.monotonic() - t0 < 0.6
+    assert all(pred["raw_response"].startswith("ERROR") for pred, _ in results)
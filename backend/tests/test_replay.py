@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from backend.app.traci import replay
+from backend.app.traci.fake import FakeSession
+from backend.app.traci.scenario import generate_scenario
+
+
+@pytest.fixture(scope="module")
+def traces(tmp_path_factory):
+    trace_dir = str(tmp_path_factory.mktemp("traces"))
+    paths = []
+    for seed in range(3):
+        route_xml, duration = generate_scenario("low", "mixed", "uniform", seed, count=20, duration=40)
+        _, path = replay.record_simulation(route_xml, duration, session_cls=FakeSession, trace_dir=trace_dir)
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(replay, "_traces", replay.OrderedDict())
+
+
+def test_cache_is_bounded(traces, monkeypatch):
+    monkeypatch.setattr(replay, "TRACE_CACHE_SIZE", 2)
+    for path in traces:
+        replay.read_trace(path)
+    assert [stamp[0] for stamp in replay._traces] == traces[1:]
+    assert replay.read_trace(traces[2]) is replay.read_trace(traces[2])
+
+
+def test_concurrent_reads_decode_once(traces, monkeypatch):
+    decoded = []
+    decode = replay._decode_trace
+
+    def counting(path):
+        decoded.append(path)
+        return decode(path)
+
+    monkeypatch.setattr(replay, "_decode_trace", counting)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(replay.read_trace(traces[0]))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert decoded == [traces[0]]
+    assert all(result is results[0] for result in results)
+
+
+def test_decoding_does_not_block_other_traces(traces, monkeypatch):
+    replay.read_trace(traces[0])
+    started, finish = threading.Event(), threading.Event()
+    decode = replay._decode_trace
+
+    def slow(path):
+        started.set()
+        finish.wait(5)
+        return decode(path)
+
+    monkeypatch.setattr(replay, "_decode_trace", slow)
+    slow_reader = threading.Thread(target=replay.read_trace, args=(traces[1],))
+    slow_reader.start()
+    started.wait(5)
+    try:
+        # A cache hit for another trace while traces[1] is being decoded
+        hit = threading.Thread(target=replay.read_trace, args=(traces[0],))
+        hit.start()
+        hit.join(1)
+        assert not hit.is_alive()
+    finally:
+        finish.set()
+        slow_reader.join()
+
+
+def test_failed_decode_is_retried(traces, monkeypatch):
+    decode = replay._decode_trace
+
+    def broken(path):
+        raise ValueError("corrupt")
+
+    monkeypatch.setattr(replay, "_decode_trace", broken)
+    with pytest.raises(ValueError):
+        replay.read_trace(traces[0])
+    monkeypatch.setattr(replay, "_decode_trace", decode)
+    header, steps = replay.read_trace(traces[0])
+    assert steps
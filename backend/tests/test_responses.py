@@ -0,0 +1,95 @@
+import gzip
+import zlib
+
+import anyio
+import pytest
+
+from backend.app.responses import CompressionMiddleware, brotli, choose_encoding
+
+
+def asgi_app(chunks, content_type=b"application/json", headers=()):
+    """An ASGI app sending `chunks` as the body (streamed if more than one)."""
+    async def app(scope, receive, send):
+        raw = [(b"content-type", content_type), *headers]
+        if len(chunks) == 1:
+            raw.append((b"content-length", str(len(chunks[0])).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": raw})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+def request(app, accept_encoding):
+    """(headers, [body chunks]) of one request through CompressionMiddleware."""
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "GET", "path": "/",
+             "headers": [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []}
+    anyio.run(CompressionMiddleware(app, minimum_size=100), scope, receive, send)
+    headers = {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+    return headers, [m["body"] for m in sent[1:]]
+
+
+BODY = b'{"steps": [' + b",".join(b'{"time": %d}' % i for i in range(500)) + b"]}"
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "br" if brotli else "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_gzip_body():
+    headers, chunks = request(asgi_app([BODY]), "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert headers["content-length"] == str(len(chunks[0]))
+    assert "Accept-Encoding" in headers["vary"]
+    assert gzip.decompress(chunks[0]) == BODY
+
+
+@pytest.mark.skipif(brotli is None, reason="brotli not installed")
+def test_brotli_body():
+    headers, chunks = request(asgi_app([BODY]), "br, gzip")
+    assert headers["content-encoding"] == "br"
+    assert brotli.decompress(chunks[0]) == BODY
+
+
+def test_streamed_chunks_are_flushed_as_sent():
+    lines = [b'{"step": %d}\n' % i for i in range(20)]
+    headers, chunks = request(asgi_app(lines), "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Each line can be decoded as soon as its chunk arrives
+    for line, chunk in zip(lines, chunks):
+        assert decompressor.decompress(chunk) == line
+
+
+@pytest.mark.parametrize("app", [
+    asgi_app([b"{}"]),                                                       # too small
+    asgi_app([BODY], content_type=b"text/event-stream"),
+    asgi_app([BODY], headers=[(b"content-encoding", b"identity")]),
+])
+def test_left_uncompressed(app):
+    headers, chunks = request(app, "gzip")
+    assert headers.get("content-encoding") in (None, "identity")
+    assert b"".join(chunks) in (b"{}", BODY)
+
+
+def test_client_without_accept_encoding():
+    headers, chunks = request(asgi_app([BODY]), "")
+    assert "content-encoding" not in headers
+    assert chunks == [BODY]
@@ -0,0 +1,56 @@
+import math
+
+import pytest
+
+from backend.app.traci.scenario import DENSITY_CONFIG, MAX_DURATION, MAX_VEHICLES, resolve_size
+
+
+def test_presets():
+    for density, cfg in DENSITY_CONFIG.items():
+        assert resolve_size(density) == (cfg["count"], cfg["duration"])
+
+
+def test_rate_sets_count_or_duration():
+    assert resolve_size("low", duration=100, rate=0.5) == (50, 100)
+    assert resolve_size("low", count=100, rate=0.3) == (100, 334)
+    assert resolve_size("low", rate=1.0) == (DENSITY_CONFIG["low"]["duration"], DENSITY_CONFIG["low"]["duration"])
+
+
+def test_at_most_two_of_three():
+    with pytest.raises(ValueError):
+        resolve_size("low", count=10, duration=10, rate=1.0)
+
+
+@pytest.mark.parametrize("rate", [0, -1.0, math.inf, -math.inf, math.nan])
+def test_rate_must_be_finite_and_positive(rate):
+    with pytest.raises(ValueError):
+        resolve_size("low", count=100, rate=rate)
+    with pytest.raises(ValueError):
+        resolve_size("low", duration=100, rate=rate)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"count": 100, "rate": 1e-320},              # count / rate overflows to inf
+    {"count": 100, "rate": 100 / (MAX_DURATION + 1)},
+    {"duration": 100, "rate": 1e308},            # rate * duration overflows to inf
+    {"duration": MAX_DURATION, "rate": MAX_VEHICLES},
+])
+def test_derived_size_out_of_bounds(kwargs):
+    with pytest.raises(ValueError):
+        resolve_size("low", **kwargs)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"count": 0},
+    {"count": MAX_VEHICLES + 1},
+    {"duration": 0},
+    {"duration": MAX_DURATION + 1},
+])
+def test_overrides_out_of_bounds(kwargs):
+    with pytest.raises(ValueError):
+        resolve_size("low", **kwargs)
+
+
+def test_bounds_are_inclusive():
+    assert resolve_size("low", count=MAX_VEHICLES, duration=MAX_DURATION) == (MAX_VEHICLES, MAX_DURATION)
+    assert resolve_size("low", count=1, duration=1) == (1, 1)
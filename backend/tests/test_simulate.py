@@ -0,0 +1,47 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from backend.app import main
+
+SCENARIO = {"density": "low", "vehicle_mix": "mixed", "pattern": "uniform", "seed": 9, "count": 40, "duration": 120}
+
+
+@pytest.fixture
+def collect_calls(monkeypatch):
+    calls = []
+    collect_options = main._collect_options
+
+    def counted(req):
+        calls.append(req)
+        return collect_options(req)
+    monkeypatch.setattr(main, "_collect_options", counted)
+    return calls
+
+
+def test_options_are_built_once_per_request(collect_calls):
+    req = main.SimulateRequest(**SCENARIO, stride=10, sections=["edges"], edges=["J1_J2"])
+    body = json.loads(main.run_simulation(req).body)
+    assert len(collect_calls) == 1
+    assert body["collect"] == {"stride": 10, "sections": ["edges", "stats"], "edges": ["J1_J2"]}
+    assert body["run_id"] is None
+    assert all(set(s) == {"time", "edges", "stats"} for s in body["steps"])
+    assert all([e["id"] for e in s["edges"]] == ["J1_J2"] for s in body["steps"])
+
+
+@pytest.mark.parametrize("options", [
+    {"sections": ["boats"]},
+    {"edges": ["nowhere"]},
+    {"stride": 0},
+])
+def test_invalid_options(options):
+    with pytest.raises(HTTPException) as raised:
+        main.run_simulation(main.SimulateRequest(**SCENARIO, **options))
+    assert raised.value.status_code == 400
+
+
+def test_columnar_needs_complete_collection():
+    with pytest.raises(HTTPException) as raised:
+        main.run_simulation(main.SimulateRequest(**SCENARIO, sections=["edges"]), format="columnar")
+    assert raised.value.status_code == 400
@@ -0,0 +1,70 @@
+import os
+import threading
+
+import pytest
+
+from backend.app.traci.fake import FakeSession
+from backend.app.traci.scenario import generate_scenario
+from backend.app.traci.snapshot import SnapshotStore, run_what_if, save_snapshots
+
+ROUTE_XML, DURATION = generate_scenario("low", "mixed", "uniform", 9, count=40, duration=120)
+
+
+class CountingSession(FakeSession):
+    started = 0
+
+    def start(self):
+        type(self).started += 1
+        return super().start()
+
+
+class FailingSaveSession(FakeSession):
+    def start(self):
+        super().start()
+        def fail(path):
+            raise OSError("disk full")
+        self.conn.simulation.saveState = fail
+        return self
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(root=str(tmp_path), max_entries=2)
+
+
+def test_concurrent_what_ifs_save_once(store):
+    CountingSession.started = 0
+    results = []
+
+    def what_if():
+        results.append(run_what_if(store, "run", 30, route_xml=ROUTE_XML, duration=DURATION,
+                                   session_cls=CountingSession))
+
+    threads = [threading.Thread(target=what_if) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 6 and len({len(steps) for steps in results}) == 1
+    assert CountingSession.started == 1 + 6  # one save, six forks
+    assert store._save_locks == {}
+    assert sorted(os.listdir(store.root)) == ["run.30.state.xml.gz"]
+
+
+def test_evicted_file_is_kept_while_checked_out(store):
+    save_snapshots(store, "run", [10], ROUTE_XML, DURATION, session_cls=FakeSession)
+    path = store.checkout("run", 10)
+    save_snapshots(store, "run", [20, 30, 40], ROUTE_XML, DURATION, session_cls=FakeSession)
+    assert store.get("run", 10) is None
+    assert os.path.exists(path)
+    store.release(path)
+    assert not os.path.exists(path)
+    assert len(os.listdir(store.root)) == 2
+
+
+def test_failed_save_leaves_no_lock_or_file(store):
+    with pytest.raises(OSError):
+        save_snapshots(store, "run", [10, 20], ROUTE_XML, DURATION, session_cls=FailingSaveSession)
+    assert store._save_locks == {}
+    assert os.listdir(store.root) == []
+    assert store.get("run", 10) is None
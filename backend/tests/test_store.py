@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from backend.app.store import RunStore
+from backend.app.traci.fake import FakeSession
+from backend.app.traci.main import run_full_simulation
+from backend.app.traci.scenario import generate_scenario
+
+RUNS = ("a", "b", "c")
+
+
+@pytest.fixture(scope="module")
+def runs(tmp_path_factory):
+    """A store directory holding three runs, and each run's steps."""
+    root = str(tmp_path_factory.mktemp("runs"))
+    store = RunStore(root)
+    steps = {}
+    for seed, run_id in enumerate(RUNS):
+        route_xml, duration = generate_scenario("low", "mixed", "uniform", seed, count=30, duration=60)
+        steps[run_id] = run_full_simulation(route_xml, duration, session_cls=FakeSession)
+        with store.writer(run_id) as writer:
+            for step in steps[run_id]:
+                writer.write(step)
+    return root, steps
+
+
+def test_round_trip(runs):
+    root, steps = runs
+    run = RunStore(root).open("a")
+    assert run.steps == len(steps["a"])
+    assert run.step(0)["stats"] == steps["a"][0]["stats"]
+    assert [s["time"] for s in run.iter_steps()] == [s["time"] for s in steps["a"]]
+
+
+def test_open_runs_are_bounded(runs):
+    root, _ = runs
+    store = RunStore(root, max_open=2)
+    opened = [store.open(run_id) for run_id in RUNS]
+    assert list(store._open) == ["b", "c"]
+    assert opened[0]._mapped is None
+    assert store.open("c") is opened[2]
+
+
+def test_evicted_run_can_still_be_read(runs):
+    root, steps = runs
+    store = RunStore(root, max_open=1)
+    run = store.open("a")
+    column = run.column("steps.time")
+    reader = run.iter_steps()
+    first = next(reader)
+    store.open("b")  # evicts and closes "a"
+    assert list(column) == [s["time"] for s in steps["a"]]
+    assert [first["time"]] + [s["time"] for s in reader] == [s["time"] for s in steps["a"]]
+
+
+def test_close_waits_for_reads_in_progress(runs):
+    root, steps = runs
+    run = RunStore(root).open("a")
+    with run._reading() as columns:
+        run.close()
+        assert run._mapped is columns
+        assert columns["steps.time"][0] == steps["a"][0]["time"]
+    assert run._mapped is None
+
+
+def test_eviction_while_reading_from_threads(runs):
+    root, steps = runs
+    store = RunStore(root, max_open=1)
+    errors = []
+    stop = threading.Event()
+
+    def read(run_id):
+        try:
+            while not stop.is_set():
+                run = store.open(run_id)
+                assert [s["stats"] for s in run.iter_steps()] == [s["stats"] for s in steps[run_id]]
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=read, args=(run_id,)) for run_id in RUNS for _ in range(2)]
+    for t in threads:
+        t.start()
+    stop.wait(1.0)
+    stop.set()
+    for t in threads:
+        t.join()
+    store.close()
+    assert errors == []
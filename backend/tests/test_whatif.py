@@ -0,0 +1,87 @@
+import pytest
+from fastapi import HTTPException
+
+from backend.app import main
+from backend.app.traci.network import load_network
+from backend.app.traci import snapshot
+from backend.app.traci.snapshot import ALL_ROUTES, check_modifications, modification
+
+ROUTE = ALL_ROUTES[0][0]
+SCENARIO = {"density": "low", "vehicle_mix": "mixed", "pattern": "uniform", "seed": 5, "count": 40, "duration": 120}
+
+
+def add_vehicle(vehicle_id="extra", **spec):
+    return dict({"type": "add_vehicle", "vehicle_id": vehicle_id, "route": ROUTE}, **spec)
+
+
+def what_if(modifications, at=30):
+    return main.what_if(main.WhatIfRequest(**SCENARIO, at=at, modifications=modifications))
+
+
+@pytest.mark.parametrize("spec", [
+    {"type": "teleport"},
+    {"type": "close_edge"},
+    {"type": "close_edge", "edge_id": ["J4_J5"]},
+    {"type": "close_edge", "edge_id": 5},
+    add_vehicle(5),
+    add_vehicle(""),
+    add_vehicle("   "),
+    add_vehicle("v12"),
+    add_vehicle(route="nowhere"),
+    add_vehicle(route=["r"]),
+    add_vehicle(route=None),
+    add_vehicle(edges=["J4_J5"]),
+    add_vehicle(route=None, edges=[]),
+    add_vehicle(route=None, edges="J4_J5"),
+    add_vehicle(route=None, edges=[["x"]]),
+    add_vehicle(vehicle_type="spaceship"),
+    add_vehicle(vehicle_type=["car"]),
+])
+def test_invalid_modification(spec):
+    with pytest.raises(ValueError):
+        check_modifications([modification(spec)], load_network())
+
+
+def test_unknown_edge():
+    with pytest.raises(ValueError):
+        check_modifications([modification({"type": "close_edge", "edge_id": "nowhere"})], load_network())
+    with pytest.raises(ValueError):
+        check_modifications([modification(add_vehicle(route=None, edges=["nowhere"]))], load_network())
+
+
+def test_duplicate_vehicle_ids():
+    mods = [modification(add_vehicle("x")), modification(add_vehicle("x"))]
+    with pytest.raises(ValueError):
+        check_modifications(mods, load_network())
+    check_modifications([modification(add_vehicle("x")), modification(add_vehicle("y"))], load_network())
+
+
+@pytest.mark.parametrize("modifications, at", [
+    ([{"type": "close_edge", "edge_id": ["J4_J5"]}], 30),
+    ([add_vehicle(route=None, edges=[["x"]])], 30),
+    ([add_vehicle("v3")], 30),
+    ([], 0),
+    ([], SCENARIO["duration"]),
+])
+def test_bad_request_is_400(modifications, at):
+    with pytest.raises(HTTPException) as e:
+        what_if(modifications, at)
+    assert e.value.status_code == 400
+
+
+def test_rejected_by_traci_is_400(monkeypatch):
+    # The fake backend rejects a second route with the same ID, as SUMO does
+    def add_twice(self, conn, network):
+        conn.route.add("r", self.edges)
+        conn.route.add("r", self.edges)
+    monkeypatch.setattr(snapshot.AddVehicle, "apply", add_twice)
+    with pytest.raises(HTTPException) as e:
+        what_if([add_vehicle()])
+    assert e.value.status_code == 400
+
+
+def test_what_if_runs_the_rest_of_the_scenario():
+    body = what_if([add_vehicle("extra"), {"type": "close_edge", "edge_id": "J4_J5"}])
+    assert body["what_if"]["at"] == 30
+    assert [m["type"] for m in body["what_if"]["modifications"]] == ["add_vehicle", "close_edge"]
+    assert body["what_if"]["steps"] > 0
@@ -16,6 +16,43 @@ export async function runSimulation({ density, vehicle_mix, pattern, seed }) {
   return res.json();
 }
 
+// Streams /simulate/stream (NDJSON). Calls onStep(step) for every step as it
+// arrives and resolves with { scenario, summary } once the run is finished.
+export async function streamSimulation({ density, vehicle_mix, pattern, seed }, onStep) {
+  const res = await fetch(`${API_BASE}/simulate/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ density, vehicle_mix, pattern, seed }),
+  });
+  if (!res.ok) throw new Error("Simulation failed");
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let scenario = null;
+  let summary = null;
+
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const record = JSON.parse(line);
+    if (record.type === "scenario") scenario = record.scenario;
+    else if (record.type === "step") onStep(record.step);
+    else if (record.type === "summary") summary = record.summary;
+  };
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop();
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer);
+
+  return { scenario, summary };
+}
+
 export async function fetchPrediction({ density, vehicle_mix, pattern, seed, vehicle_type, objective }) {
   const res = await fetch(`${API_BASE}/predict`, {
     method: "POST",
@@ -25,3 +62,15 @@ export async function fetchPrediction({ density, vehicle_mix, pattern, seed, veh
   if (!res.ok) throw new Error("Prediction failed");
   return res.json();
 }
+
+// Several /predict combinations in one call; items are the same objects
+// fetchPrediction takes. Resolves with { results, summary }, results in order.
+export async function fetchPredictionBatch(items) {
+  const res = await fetch(`${API_BASE}/predict/batch`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ items }),
+  });
+  if (!res.ok) throw new Error("Prediction failed");
+  return res.json();
+}
@@ -89,7 +89,7 @@ export default function RouteCard({ label, stats, isRecommended, allStats }) {
 
       <div className="mt-4 pt-3 border-t border-border flex justify-between text-xs text-text-muted">
         <span>{stats.edge_count} edges</span>
-        <span>~{Math.round((stats.edge_count * 150) / Math.max(stats.avg_speed, 1))}s travel</span>
+        <span>~{Math.round((stats.length || stats.edge_count * 150) / Math.max(stats.avg_speed, 1))}s travel</span>
       </div>
     </div>
   );